@@ -0,0 +1,292 @@
+"""
+Performance analytics for backtest equity curves and the live journal.
+
+The metric functions work on NumPy arrays along the last axis, so a (runs, bars)
+matrix of equity curves is scored in one call. analyze() collects them into a
+flat report dict of plain floats that can be written as JSON (write_report) and
+compared across many runs (load_reports) without matplotlib or log parsing.
+"""
+from indicators import rolling_std
+import pandas as pd
+import numpy as np
+import argparse
+import json
+
+TRADING_DAYS = 252
+MINUTES_PER_SESSION = 390
+
+# --- Return metrics ---
+
+def simple_returns(equity):
+    """
+    Bar-to-bar returns along the last axis (one element shorter than equity).
+    """
+    equity = np.asarray(equity, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.diff(equity, axis=-1) / equity[..., :-1]
+
+def sharpe_ratio(returns, periods_per_year=TRADING_DAYS, risk_free=0.0):
+    """
+    Annualized Sharpe ratio (sample std); 0 where the returns have no variance.
+    """
+    returns = np.asarray(returns, dtype=float) - risk_free / periods_per_year
+    if returns.shape[-1] < 2:
+        return np.zeros(returns.shape[:-1]) if returns.ndim > 1 else 0.0
+    std = returns.std(axis=-1, ddof=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(std > 0, returns.mean(axis=-1) / std * np.sqrt(periods_per_year), 0.0)
+
+def sortino_ratio(returns, periods_per_year=TRADING_DAYS, risk_free=0.0):
+    """
+    Annualized Sortino ratio: mean excess return over the downside deviation (target 0).
+    """
+    returns = np.asarray(returns, dtype=float) - risk_free / periods_per_year
+    if returns.shape[-1] < 1:
+        return np.zeros(returns.shape[:-1]) if returns.ndim > 1 else 0.0
+    downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2, axis=-1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(downside > 0, returns.mean(axis=-1) / downside * np.sqrt(periods_per_year), 0.0)
+
+def annual_volatility(returns, periods_per_year=TRADING_DAYS):
+    returns = np.asarray(returns, dtype=float)
+    if returns.shape[-1] < 2:
+        return np.zeros(returns.shape[:-1]) if returns.ndim > 1 else 0.0
+    return returns.std(axis=-1, ddof=1) * np.sqrt(periods_per_year)
+
+def rolling_volatility(returns, window=20, periods_per_year=TRADING_DAYS):
+    """
+    Annualized rolling volatility of a 1-D return series (NaN until the window fills).
+    """
+    return rolling_std(np.asarray(returns, dtype=float), window, cache=False) * np.sqrt(periods_per_year)
+
+def cagr(equity, periods_per_year=TRADING_DAYS, initial_capital=None):
+    equity = np.asarray(equity, dtype=float)
+    start = equity[..., 0] if initial_capital is None else initial_capital
+    years = equity.shape[-1] / periods_per_year
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (equity[..., -1] / start) ** (1.0 / years) - 1 if years > 0 else np.zeros(equity.shape[:-1])
+
+# --- Drawdowns ---
+
+def drawdown(equity):
+    """
+    Fractional distance below the running peak (0 at new highs, negative below).
+    """
+    equity = np.asarray(equity, dtype=float)
+    return equity / np.maximum.accumulate(equity, axis=-1) - 1
+
+def max_drawdown(equity):
+    equity = np.asarray(equity, dtype=float)
+    if equity.shape[-1] == 0:
+        return 0.0
+    return drawdown(equity).min(axis=-1)
+
+def max_drawdown_duration(equity):
+    """
+    Longest run of bars spent below a previous peak (until recovery or the end).
+    """
+    equity = np.asarray(equity, dtype=float)
+    if equity.shape[-1] == 0:
+        return 0
+    bars = np.arange(equity.shape[-1])
+    at_peak = equity >= np.maximum.accumulate(equity, axis=-1)
+    last_peak = np.maximum.accumulate(np.where(at_peak, bars, 0), axis=-1)
+    return (bars - last_peak).max(axis=-1)
+
+# --- Positions and trades ---
+
+def exposure(holdings):
+    """
+    Fraction of bars with a position. holdings is (bars,) or (bars, symbols).
+    """
+    holdings = np.asarray(holdings, dtype=float)
+    if len(holdings) == 0:
+        return 0.0
+    held = holdings != 0
+    return float((held.any(axis=1) if held.ndim > 1 else held).mean())
+
+def turnover(holdings, price, equity, periods_per_year=TRADING_DAYS):
+    """
+    Annualized turnover: traded notional (buys and sells) over the average equity,
+    scaled to one year. holdings and price are (bars,) or (bars, symbols).
+    """
+    holdings = np.asarray(holdings, dtype=float)
+    price = np.asarray(price, dtype=float)
+    equity = np.asarray(equity, dtype=float)
+    if len(equity) == 0 or equity.mean() <= 0:
+        return 0.0
+    traded = np.abs(np.diff(holdings, axis=0, prepend=0.0)) * price
+    return float(np.nansum(traded) / equity.mean() * periods_per_year / len(equity))
+
+def trade_pnl(trades, last_price=None):
+    """
+    P&L of simulate_arrays trades ((entry_idx, exit_idx, shares, entry_fill, exit_fill)).
+    Open trades are marked to last_price, or left out if it is not given.
+    Returns (pnl, return per trade) arrays.
+    """
+    trades = [t for t in trades if t[4] is not None or last_price is not None]
+    if not trades:
+        return np.array([]), np.array([])
+    shares = np.array([t[2] for t in trades], dtype=float)
+    entry = np.array([t[3] for t in trades], dtype=float)
+    exit_ = np.array([t[4] if t[4] is not None else last_price for t in trades], dtype=float)
+    return shares * (exit_ - entry), exit_ / entry - 1
+
+def fills_trade_pnl(symbols, sides, qty, price):
+    """
+    P&L of round trips reconstructed from fills (in time order): a trade runs from
+    the first fill after a flat position until the position is flat again. Trades
+    still open at the end are not included. Returns a pnl array.
+    """
+    symbols = np.asarray(symbols, dtype=object)
+    signed = np.where(np.asarray(sides, dtype=object) == "buy", 1.0, -1.0) * np.asarray(qty, dtype=float)
+    cash_flow = -signed * np.asarray(price, dtype=float)
+    pnl = []
+    for symbol in pd.unique(symbols):
+        mask = symbols == symbol
+        position = np.cumsum(signed[mask])
+        flat = np.isclose(position, 0.0)
+        # Fills up to and including the one that flattens the position form one trade
+        trade_id = np.concatenate(([0], np.cumsum(flat)[:-1]))
+        sums = np.bincount(trade_id, weights=cash_flow[mask])
+        pnl.append(sums[:int(flat.sum())])
+    return np.concatenate(pnl) if pnl else np.array([])
+
+# --- Reports ---
+
+def infer_periods_per_year(index):
+    """
+    Bars per year from the median spacing of a DatetimeIndex: 252 for daily data,
+    trading minutes (252 sessions of 390) for intraday data, calendar time for sparser logs.
+    """
+    if len(index) < 2:
+        return TRADING_DAYS
+    spacing = pd.Series(index).diff().median()
+    minutes = spacing.total_seconds() / 60
+    days = minutes / 1440
+    if days >= 1.5:
+        # Weekly or sparser logs: calendar spacing
+        return 365.25 / days
+    if minutes >= 20 * 60:
+        return TRADING_DAYS
+    return TRADING_DAYS * MINUTES_PER_SESSION / max(minutes, 1.0)
+
+def analyze(equity, holdings=None, price=None, pnl=None, periods_per_year=TRADING_DAYS, initial_capital=None,
+            vol_window=20):
+    """
+    Report dict for one equity curve. holdings/price (per bar) add exposure and
+    turnover; pnl (per closed trade) adds trade statistics.
+    """
+    equity = np.asarray(equity, dtype=float)
+    returns = simple_returns(equity)
+    start = equity[0] if initial_capital is None and len(equity) else initial_capital
+    report = {
+        "bars": int(len(equity)),
+        "periods_per_year": float(periods_per_year),
+        "start_equity": _float(start),
+        "end_equity": _float(equity[-1]) if len(equity) else None,
+        "total_return": _float(equity[-1] / start - 1) if len(equity) else 0.0,
+        "cagr": _float(cagr(equity, periods_per_year, start)) if len(equity) else 0.0,
+        "annual_volatility": _float(annual_volatility(returns, periods_per_year)),
+        "sharpe": _float(sharpe_ratio(returns, periods_per_year)),
+        "sortino": _float(sortino_ratio(returns, periods_per_year)),
+        "max_drawdown": _float(max_drawdown(equity)),
+        "max_drawdown_duration": int(max_drawdown_duration(equity)),
+    }
+    rolling = rolling_volatility(returns, vol_window, periods_per_year) if len(returns) >= vol_window else np.array([])
+    report["rolling_volatility_window"] = vol_window
+    report["rolling_volatility_last"] = _float(rolling[-1]) if len(rolling) else None
+    report["rolling_volatility_max"] = _float(np.nanmax(rolling)) if len(rolling) else None
+
+    if holdings is not None:
+        report["exposure"] = exposure(holdings)
+        if price is not None:
+            report["turnover"] = turnover(holdings, price, equity, periods_per_year)
+    if pnl is not None:
+        pnl = np.asarray(pnl, dtype=float)
+        wins, losses = pnl[pnl > 0], pnl[pnl < 0]
+        report["trades"] = int(len(pnl))
+        report["win_rate"] = _float(len(wins) / len(pnl)) if len(pnl) else None
+        report["avg_trade_pnl"] = _float(pnl.mean()) if len(pnl) else None
+        report["avg_win"] = _float(wins.mean()) if len(wins) else None
+        report["avg_loss"] = _float(losses.mean()) if len(losses) else None
+        report["profit_factor"] = _float(wins.sum() / -losses.sum()) if len(losses) else None
+    return report
+
+def analyze_simulation(result, close, periods_per_year=TRADING_DAYS, initial_capital=None):
+    """
+    Report for a simulator.simulate_arrays result on the given close prices.
+    """
+    close = np.asarray(close, dtype=float)
+    pnl, _ = trade_pnl(result["trades"], close[-1] if len(close) else None)
+    return analyze(result["equity"], result["holdings"], close, pnl, periods_per_year, initial_capital)
+
+def analyze_journal(journal, start=None, end=None):
+    """
+    Report for the live account from a journal.Journal: equity from the snapshots,
+    exposure from the logged position quantity, trade P&L from the recorded fills.
+    """
+    snapshots = journal.snapshots(start, end)
+    fills = journal.fills(start, end)
+    pnl = fills_trade_pnl(fills["symbol"], fills["side"], fills["qty"], fills["price"])
+    report = analyze(snapshots["Equity"].to_numpy(), snapshots["Position_Qty"].fillna(0).to_numpy(), pnl=pnl,
+                     periods_per_year=infer_periods_per_year(snapshots.index))
+    if len(snapshots):
+        report["start"] = snapshots.index[0].isoformat()
+        report["end"] = snapshots.index[-1].isoformat()
+    return report
+
+def _float(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+def write_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+def load_reports(paths):
+    """
+    DataFrame with one row per JSON report file, indexed by path.
+    """
+    rows = {}
+    for path in paths:
+        with open(path) as f:
+            rows[path] = json.load(f)
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+def print_report(report):
+    for key, value in report.items():
+        if isinstance(value, float):
+            print(f"{key:<28}{value:>16.4f}")
+        else:
+            print(f"{key:<28}{str(value):>16}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Performance report for the live journal, or compare saved reports")
+    parser.add_argument("--journal", default="performance_journal.db")
+    parser.add_argument("--start", help="Only records at or after this time (UTC)")
+    parser.add_argument("--end", help="Only records at or before this time (UTC)")
+    parser.add_argument("--out", help="Write the report as JSON to this path")
+    parser.add_argument("--compare", nargs="+", metavar="REPORT", help="Tabulate saved JSON reports instead")
+    parser.add_argument("--sort", default="sharpe", help="Column to sort compared reports by")
+    args = parser.parse_args()
+
+    if args.compare:
+        table = load_reports(args.compare)
+        if args.sort in table.columns:
+            table = table.sort_values(args.sort, ascending=False)
+        columns = [c for c in ("total_return", "sharpe", "sortino", "max_drawdown", "max_drawdown_duration",
+                               "win_rate", "exposure", "turnover", "trades") if c in table.columns]
+        print(table[columns].to_string())
+    else:
+        from journal import open_journal
+        try:
+            journal = open_journal(args.journal, create=False)
+        except FileNotFoundError as e:
+            raise SystemExit(str(e))
+        with journal:
+            report = analyze_journal(journal, args.start, args.end)
+        print_report(report)
+        if args.out:
+            write_report(report, args.out)
+            print(f"Report saved to {args.out}")
@@ -1,53 +1,38 @@
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.requests import StockBarsRequest
-from alpaca.data.timeframe import TimeFrame
-from alpaca.data.enums import DataFeed
-from utils import load_alpaca_credentials
-from strategy import BollingerRSIStrategy
-import matplotlib.pyplot as plt
+from utils import load_alpaca_credentials, load_pyplot
+from simulator import simulate_arrays
+from risk import StopModel
+from analytics import analyze_simulation, infer_periods_per_year, print_report, write_report
 import pandas as pd
+import argparse
 import os
 from datetime import datetime, timedelta
 
-def run_backtest():
-    # 1. Load Credentials
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    creds_path = os.path.join(current_dir, "paper_account_api_key.txt")
-    creds = load_alpaca_credentials(creds_path)
-    
-    # 2. Fetch Historical Data
-    print("Fetching historical data...")
-    data_client = StockHistoricalDataClient(creds["api_key"], creds["secret_key"])
-    
-    symbol = "AVGO" # Updated symbol to AVGO
-    end_time = datetime.now() - timedelta(minutes=16) 
-    start_time = end_time - timedelta(days=365) # 1 year of data
-    
-    request_params = StockBarsRequest(
-        symbol_or_symbols=[symbol],
-        timeframe=TimeFrame.Day,
-        start=start_time,
-        end=end_time,
-        feed=DataFeed.IEX 
-    )
-    
-    try:
-        bars = data_client.get_stock_bars(request_params)
-        if bars.df.empty:
-            print("No data found for the specified period.")
-            return
-        df = bars.df.loc[symbol]
-    except Exception as e:
-        print(f"Error fetching data: {e}")
-        return
-    
-    # 3. Apply Strategy
-    print(f"Running Bollinger+RSI Strategy on {len(df)} bars for {symbol}...")
-    strategy = BollingerRSIStrategy(symbol)
-    signals = strategy.generate_signals(df)
-    
-    # 4. Simulate Portfolio with $1,000,000
-    initial_capital = 1000000.0
+def simulate(df, signals, strategy, initial_capital=1000000.0, vectorized=True, slippage=None, commission=None,
+             details=False, stops=None):
+    """
+    Replays target positions against the close prices with dynamic position sizing.
+    Returns the portfolio value after each bar as a Series, or with details=True the
+    full simulate_arrays result (equity, cash, holdings, trades) for analytics.
+    stops (a risk.StopModel) adds stop-loss / take-profit exits from the bar highs and lows.
+    vectorized=False runs the original per-bar loop (no slippage/commission/stop support),
+    kept as a reference implementation.
+    """
+    if vectorized:
+        volatility = signals['volatility'].to_numpy() if 'volatility' in signals.columns else None
+        target = signals['target_position'].to_numpy()
+        exit_prices = None
+        # Per-bar inputs the sizer needs beyond volatility (e.g. ATR)
+        atr = strategy.sizer.prepare(df).get("atr") if hasattr(strategy, "sizer") else None
+        if stops is not None:
+            target, exit_prices = stops.apply(target, df['open'].to_numpy(), df['high'].to_numpy(),
+                                              df['low'].to_numpy(), df['close'].to_numpy())
+        result = simulate_arrays(df['close'].to_numpy(), target, strategy,
+                                 volatility=volatility, initial_capital=initial_capital,
+                                 slippage=slippage, commission=commission, exit_prices=exit_prices, atr=atr)
+        if details:
+            return result
+        return pd.Series(result['equity'], index=df.index)
+
     cash = initial_capital
     holdings = 0
     portfolio_value = []
@@ -80,7 +65,71 @@ def run_backtest():
             
         portfolio_value.append(cash + (holdings * price))
         
-    portfolio_series = pd.Series(portfolio_value, index=df.index)
+    return pd.Series(portfolio_value, index=df.index)
+
+def plot_backtest(cumulative_returns, cumulative_buy_hold, symbol, output_img="backtest_result.png"):
+    """
+    Saves the strategy vs buy & hold chart (the only stage that needs matplotlib).
+    """
+    plt = load_pyplot()
+    plt.figure(figsize=(12,6))
+    plt.plot(cumulative_returns, label='Bollinger+RSI Strategy')
+    plt.plot(cumulative_buy_hold, label=f'Buy & Hold ({symbol})')
+    plt.title(f'Backtest Result: {symbol} (BB+RSI)')
+    plt.legend()
+    plt.grid(True)
+    plt.savefig(output_img)
+    print(f"\nChart saved to {output_img}")
+
+def run_backtest(offline=False, timeframe=None, report_file="backtest_report.json", plot=True, stops=None):
+    """
+    timeframe is a TimeFrame or text like "5Min" (default daily bars).
+    plot=False skips the chart, so matplotlib is never imported.
+    stops is an optional risk.StopModel.
+    """
+    # alpaca-py is imported here rather than at module level: optimizer and
+    # walk_forward import simulate() from this module and do not need it
+    from alpaca.data.enums import DataFeed
+    from strategy import BollingerRSIStrategy
+    from bar_store import BarStore
+    from resample import as_timeframe
+    timeframe = as_timeframe(timeframe)
+
+    # 1. Load Credentials (not needed when reading only from the local bar cache)
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    data_client = None
+    if not offline:
+        from alpaca.data.historical import StockHistoricalDataClient
+        creds_path = os.path.join(current_dir, "paper_account_api_key.txt")
+        creds = load_alpaca_credentials(creds_path)
+        data_client = StockHistoricalDataClient(creds["api_key"], creds["secret_key"])
+    
+    # 2. Fetch Historical Data (only ranges missing from the local cache are downloaded)
+    print("Fetching historical data...")
+    bar_store = BarStore(data_client, cache_dir=os.path.join(current_dir, "bar_cache"), offline=offline)
+    
+    symbol = "AVGO" # Updated symbol to AVGO
+    end_time = datetime.now() - timedelta(minutes=16) 
+    start_time = end_time - timedelta(days=365) # 1 year of data
+    
+    try:
+        df = bar_store.get_bars(symbol, start_time, end_time, timeframe=timeframe, feed=DataFeed.IEX)
+        if df.empty:
+            print("No data found for the specified period.")
+            return
+    except Exception as e:
+        print(f"Error fetching data: {e}")
+        return
+    
+    # 3. Apply Strategy
+    print(f"Running Bollinger+RSI Strategy on {len(df)} {timeframe.value} bars for {symbol}...")
+    strategy = BollingerRSIStrategy(symbol)
+    signals = strategy.generate_signals(df)
+    
+    # 4. Simulate Portfolio with $1,000,000
+    initial_capital = 1000000.0
+    result = simulate(df, signals, strategy, initial_capital, details=True, stops=stops)
+    portfolio_series = pd.Series(result['equity'], index=df.index)
     
     # Calculate Benchmarks
     cumulative_returns = portfolio_series / initial_capital
@@ -92,18 +141,30 @@ def run_backtest():
     print(f"Strategy Total Return: {(cumulative_returns.iloc[-1] - 1)*100:.2f}%")
     print(f"Buy & Hold Return: {(cumulative_buy_hold.iloc[-1] - 1)*100:.2f}%")
     print(f"Final Portfolio Value: ${portfolio_series.iloc[-1]:,.2f}")
+
+    # Full metrics as JSON, so runs can be compared with analytics.py --compare
+    periods_per_year = infer_periods_per_year(df.index)
+    report = analyze_simulation(result, df['close'].to_numpy(), periods_per_year, initial_capital)
+    report.update({"symbol": symbol, "timeframe": timeframe.value, "start": str(df.index[0]), "end": str(df.index[-1])})
+    print("\n--- Analytics ---")
+    print_report(report)
+    if report_file:
+        write_report(report, report_file)
+        print(f"Report saved to {report_file}")
     
     # 6. Plot
-    plt.figure(figsize=(12,6))
-    plt.plot(cumulative_returns, label='Bollinger+RSI Strategy')
-    plt.plot(cumulative_buy_hold, label='Buy & Hold (AVGO)')
-    plt.title(f'Backtest Result: {symbol} (BB+RSI)')
-    plt.legend()
-    plt.grid(True)
-    
-    output_img = "backtest_result.png"
-    plt.savefig(output_img)
-    print(f"\nChart saved to {output_img}")
+    if plot:
+        plot_backtest(cumulative_returns, cumulative_buy_hold, symbol)
 
 if __name__ == "__main__":
-    run_backtest()
+    parser = argparse.ArgumentParser(description="Backtest the Bollinger+RSI strategy")
+    parser.add_argument("--offline", action="store_true", help="Use only cached bars, no network access")
+    parser.add_argument("--timeframe", default="1Day", help="Bar size: 1Min, 5Min, 15Min, 1Hour or 1Day")
+    parser.add_argument("--report", default="backtest_report.json", help="Where to write the JSON analytics report")
+    parser.add_argument("--no-plot", action="store_true", help="Headless run: skip the chart (matplotlib is not loaded)")
+    parser.add_argument("--stop-loss", type=float, help="Exit when the low falls this fraction below the entry (e.g. 0.05)")
+    parser.add_argument("--take-profit", type=float, help="Exit when the high rises this fraction above the entry")
+    args = parser.parse_args()
+    stops = StopModel(args.stop_loss, args.take_profit) if args.stop_loss or args.take_profit else None
+    run_backtest(offline=args.offline, timeframe=args.timeframe, report_file=args.report, plot=not args.no_plot,
+                 stops=stops)
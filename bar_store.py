@@ -0,0 +1,325 @@
+from alpaca.data.requests import StockBarsRequest
+from alpaca.data.timeframe import TimeFrame
+from alpaca.data.enums import DataFeed
+from resample import REGULAR_SESSION, is_intraday, is_minute_bars, resample_bars, compact_bars
+import pandas as pd
+import numpy as np
+import json
+import os
+import re
+
+DEFAULT_CACHE_DIR = "bar_cache"
+
+def _to_utc(ts):
+    # Alpaca treats naive datetimes as UTC, so do the same for cache bookkeeping
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is None:
+        return ts.tz_localize("UTC")
+    return ts.tz_convert("UTC")
+
+def _feed_key(feed):
+    return feed.value if hasattr(feed, "value") else str(feed)
+
+class BarStore:
+    """
+    Local columnar cache in front of StockHistoricalDataClient.get_stock_bars.
+
+    Bars are stored per (feed, timeframe, symbol) as one .npy file per column plus
+    a meta.json recording the covered time range. Requests only download the part
+    of the range that is not cached yet. With offline=True nothing is fetched and
+    whatever is on disk is returned.
+
+    Intraday timeframes above one minute are built from the cached 1-minute bars
+    (see resample.py) instead of being downloaded separately.
+
+    compact_intraday=True stores intraday bars compactly (float32 prices, integer
+    volumes; see resample.compact_bars), which roughly halves their size but is
+    lossy: prices keep about 7 significant digits, so cached bars no longer equal
+    the downloaded frame and indicators / backtests on them differ slightly from
+    uncached runs. Off by default. Bars already cached as float32 stay rounded.
+    """
+
+    def __init__(self, client=None, cache_dir=DEFAULT_CACHE_DIR, offline=False, resample_intraday=True,
+                 compact_intraday=False):
+        self.client = client
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self.resample_intraday = resample_intraday
+        self.compact_intraday = compact_intraday
+
+    # --- Public API ---
+
+    def get_bars(self, symbol, start, end, timeframe=TimeFrame.Day, feed=DataFeed.IEX) -> pd.DataFrame:
+        """
+        Returns bars for one symbol in the same shape as bars.df.loc[symbol].
+        """
+        return self.get_many([symbol], start, end, timeframe, feed)[symbol]
+
+    def get_many(self, symbols, start, end, timeframe=TimeFrame.Day, feed=DataFeed.IEX) -> dict:
+        """
+        Returns {symbol: DataFrame} for several symbols. Missing ranges are grouped
+        so symbols that need the same range are fetched in one batched request.
+        """
+        if self.resample_intraday and is_intraday(timeframe) and not is_minute_bars(timeframe):
+            return self.get_resampled(symbols, start, end, timeframe, feed)
+        start, end = _to_utc(start), _to_utc(end)
+        self._ensure_cached(symbols, start, end, timeframe, feed)
+        return {symbol: self._load(symbol, timeframe, feed, start, end) for symbol in symbols}
+
+    def get_matrix(self, symbols, start, end, timeframe=TimeFrame.Day, feed=DataFeed.IEX, column="close"):
+        """
+        One column for many symbols as a (time x symbol) float matrix, NaN where a
+        symbol has no bar. Returns (index, symbols with data, matrix). Reads the
+        cached .npy columns directly, without building a DataFrame per symbol.
+        """
+        if self.resample_intraday and is_intraday(timeframe) and not is_minute_bars(timeframe):
+            return frames_to_matrix(self.get_resampled(symbols, start, end, timeframe, feed), column)
+        start, end = _to_utc(start), _to_utc(end)
+        self._ensure_cached(symbols, start, end, timeframe, feed)
+
+        found, stamps, values = [], [], []
+        lo, hi = start.tz_localize(None).as_unit("ns").value, end.tz_localize(None).as_unit("ns").value
+        for symbol in symbols:
+            directory = self._series_dir(symbol, timeframe, feed)
+            try:
+                ts = _read_column(os.path.join(directory, "timestamp.npy"))
+                column_values = _read_column(os.path.join(directory, f"{column}.npy"))
+            except FileNotFoundError:
+                continue
+            i, j = np.searchsorted(ts, lo), np.searchsorted(ts, hi, side="right")
+            if i == j:
+                continue
+            found.append(symbol)
+            stamps.append(ts[i:j])
+            values.append(column_values[i:j])
+        return _stack_columns(found, stamps, values)
+
+    def get_columns(self, symbol, start, end, timeframe=TimeFrame.Day, feed=DataFeed.IEX):
+        """
+        (timestamps, {column: values}) for one symbol as memory-mapped views of the
+        cached .npy files (timestamps as int64 UTC nanoseconds), so a long history
+        can be read piece by piece without loading it (see chunked_backtest.py).
+        Only stored timeframes: resampled intraday bars exist in memory only.
+        """
+        if self.resample_intraday and is_intraday(timeframe) and not is_minute_bars(timeframe):
+            raise ValueError(f"{timeframe.value} bars are resampled from 1-minute bars in memory; "
+                             "read 1-minute or daily bars instead")
+        start, end = _to_utc(start), _to_utc(end)
+        self._ensure_cached([symbol], start, end, timeframe, feed)
+        meta = self._read_meta(symbol, timeframe, feed)
+        if meta is None:
+            return np.array([], dtype=np.int64), {}
+        directory = self._series_dir(symbol, timeframe, feed)
+        ts = np.load(os.path.join(directory, "timestamp.npy"), mmap_mode="r")
+        lo, hi = start.tz_localize(None).as_unit("ns").value, end.tz_localize(None).as_unit("ns").value
+        i, j = np.searchsorted(ts, lo), np.searchsorted(ts, hi, side="right")
+        columns = {col: np.load(os.path.join(directory, f"{col}.npy"), mmap_mode="r")[i:j] for col in meta["columns"]}
+        return ts[i:j], columns
+
+    def get_resampled(self, symbols, start, end, timeframe, feed=DataFeed.IEX, session=REGULAR_SESSION) -> dict:
+        """
+        {symbol: DataFrame} of timeframe bars aggregated from cached 1-minute bars,
+        restricted to the given New York session (see resample.resample_bars).
+        """
+        minutes = self.get_many(symbols, start, end, TimeFrame.Minute, feed)
+        return {symbol: resample_bars(df, timeframe, session) for symbol, df in minutes.items()}
+
+    def cached_range(self, symbol, timeframe=TimeFrame.Day, feed=DataFeed.IEX):
+        """
+        (start, end) covered by the cache for a symbol, or None.
+        """
+        meta = self._read_meta(symbol, timeframe, feed)
+        if meta is None:
+            return None
+        return pd.Timestamp(meta["start"], tz="UTC"), pd.Timestamp(meta["end"], tz="UTC")
+
+    # --- Storage ---
+
+    def _series_dir(self, symbol, timeframe, feed):
+        return os.path.join(self.cache_dir, _feed_key(feed), str(timeframe), symbol)
+
+    def _read_meta(self, symbol, timeframe, feed):
+        path = os.path.join(self._series_dir(symbol, timeframe, feed), "meta.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _read_frame(self, symbol, timeframe, feed, meta, mmap=True):
+        directory = self._series_dir(symbol, timeframe, feed)
+        mode = "r" if mmap else None
+        timestamps = np.load(os.path.join(directory, "timestamp.npy"), mmap_mode=mode)
+        data = {col: np.load(os.path.join(directory, f"{col}.npy"), mmap_mode=mode) for col in meta["columns"]}
+        index = pd.DatetimeIndex(np.asarray(timestamps).astype("datetime64[ns]"), name="timestamp").tz_localize("UTC")
+        index = index.as_unit(meta.get("unit", "ns"))
+        return pd.DataFrame(data, index=index, columns=meta["columns"])
+
+    def _write_frame(self, symbol, timeframe, feed, df, start, end):
+        directory = self._series_dir(symbol, timeframe, feed)
+        os.makedirs(directory, exist_ok=True)
+        if self.compact_intraday and is_intraday(timeframe):
+            df = compact_bars(df)
+        timestamps = df.index.tz_convert("UTC").tz_localize(None).as_unit("ns").asi8
+        np.save(os.path.join(directory, "timestamp.npy"), timestamps)
+        for col in df.columns:
+            np.save(os.path.join(directory, f"{col}.npy"), df[col].to_numpy())
+        # Keep the index resolution so cached frames compare equal to fresh downloads
+        meta = {"columns": list(df.columns), "unit": df.index.unit, "start": start.value, "end": end.value}
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    def _load(self, symbol, timeframe, feed, start, end):
+        meta = self._read_meta(symbol, timeframe, feed)
+        if meta is None:
+            return pd.DataFrame()
+        df = self._read_frame(symbol, timeframe, feed, meta)
+        return df.loc[(df.index >= start) & (df.index <= end)].copy()
+
+    # --- Fetching ---
+
+    def _ensure_cached(self, symbols, start, end, timeframe, feed):
+        """
+        Downloads the missing ranges, grouped so symbols that need the same range
+        are fetched in one batched request.
+        """
+        if self.offline:
+            return
+        groups = {}
+        for symbol in symbols:
+            for rng in self._missing_ranges(symbol, start, end, timeframe, feed):
+                groups.setdefault(rng, []).append(symbol)
+        for (fetch_start, fetch_end), group in groups.items():
+            self._fetch_and_store(group, fetch_start, fetch_end, timeframe, feed)
+
+    def _missing_ranges(self, symbol, start, end, timeframe, feed):
+        """
+        The cache keeps one contiguous range per series, so at most a head and a
+        tail piece are missing. The tail is re-fetched from the last cached bar
+        because that bar may have been incomplete when it was stored.
+        """
+        meta = self._read_meta(symbol, timeframe, feed)
+        if meta is None:
+            return [(start, end)]
+        lo = pd.Timestamp(meta["start"], tz="UTC")
+        hi = pd.Timestamp(meta["end"], tz="UTC")
+        missing = []
+        if start < lo:
+            missing.append((start, lo))
+        if end > hi:
+            df = self._read_frame(symbol, timeframe, feed, meta)
+            tail_start = min(hi, df.index[-1]) if len(df) else hi
+            missing.append((tail_start, end))
+        return missing
+
+    def _fetch_and_store(self, symbols, start, end, timeframe, feed):
+        if self.client is None:
+            raise RuntimeError("BarStore has no data client; use offline=True to read the cache only")
+
+        request_params = StockBarsRequest(
+            symbol_or_symbols=list(symbols),
+            timeframe=timeframe,
+            start=start.to_pydatetime(),
+            end=end.to_pydatetime(),
+            feed=feed
+        )
+        bars = self.client.get_stock_bars(request_params)
+        fetched = bars.df
+
+        for symbol in symbols:
+            if not fetched.empty and symbol in fetched.index.get_level_values(0):
+                new = fetched.loc[symbol]
+            else:
+                new = pd.DataFrame()
+            self._merge(symbol, timeframe, feed, new, start, end)
+
+    def _merge(self, symbol, timeframe, feed, new, start, end):
+        meta = self._read_meta(symbol, timeframe, feed)
+        if meta is None:
+            combined = new
+            lo, hi = start, end
+        else:
+            old = self._read_frame(symbol, timeframe, feed, meta, mmap=False)
+            combined = pd.concat([old, new]) if not new.empty else old
+            lo = min(start, pd.Timestamp(meta["start"], tz="UTC"))
+            hi = max(end, pd.Timestamp(meta["end"], tz="UTC"))
+
+        if combined.empty:
+            combined = pd.DataFrame(columns=["open", "high", "low", "close", "volume", "trade_count", "vwap"],
+                                    index=pd.DatetimeIndex([], tz="UTC", name="timestamp").as_unit("ns"), dtype=float)
+        # Newer downloads win for bars that were still forming when first cached
+        combined = combined[~combined.index.duplicated(keep="last")].sort_index()
+        self._write_frame(symbol, timeframe, feed, combined, lo, hi)
+
+_NPY_HEADER = re.compile(r"'descr':\s*'([^']+)',\s*'fortran_order':\s*False,\s*'shape':\s*\((\d+),\)")
+
+def _read_column(path):
+    """
+    Reads a 1-D .npy column as written by _write_frame. The header is parsed with a
+    regex: np.load's generic header parsing costs more than the data itself for
+    thousands of short series.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    size = 2 if data[6] == 1 else 4
+    header_end = 8 + size + int.from_bytes(data[8:8 + size], "little")
+    match = _NPY_HEADER.search(data[8 + size:header_end].decode("latin1"))
+    if match is None or match.group(1).startswith("|O"):
+        return np.load(path)
+    return np.frombuffer(data, dtype=match.group(1), count=int(match.group(2)), offset=header_end)
+
+def _stack_columns(symbols, stamps, values):
+    """
+    Aligns per-symbol (int64 ns timestamps, values) pairs on the union of their timestamps.
+    """
+    index = np.unique(np.concatenate(stamps)) if stamps else np.array([], dtype=np.int64)
+    matrix = np.full((len(index), len(symbols)), np.nan)
+    for k, (ts, vals) in enumerate(zip(stamps, values)):
+        matrix[np.searchsorted(index, ts), k] = vals
+    index = pd.DatetimeIndex(index.astype("datetime64[ns]"), name="timestamp").tz_localize("UTC")
+    return index, list(symbols), matrix
+
+def frames_to_matrix(frames, column="close"):
+    """
+    (index, symbols, matrix) from {symbol: DataFrame}, like BarStore.get_matrix.
+    """
+    frames = {s: df for s, df in frames.items() if not df.empty}
+    stamps = [df.index.tz_convert("UTC").tz_localize(None).as_unit("ns").asi8 for df in frames.values()]
+    values = [df[column].to_numpy(dtype=float) for df in frames.values()]
+    return _stack_columns(list(frames), stamps, values)
+
+class _FakeBarSet:
+    def __init__(self, df):
+        self.df = df
+
+class FakeStockDataClient:
+    """
+    Drop-in stand-in for StockHistoricalDataClient serving bars from in-memory
+    DataFrames ({symbol: df indexed by timestamp}). Records every request so
+    callers can check what would have been downloaded.
+    """
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.requests = []
+
+    def get_stock_bars(self, request_params):
+        self.requests.append(request_params)
+        symbols = request_params.symbol_or_symbols
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        start = _to_utc(request_params.start)
+        end = _to_utc(request_params.end) if request_params.end is not None else None
+
+        pieces = {}
+        for symbol in symbols:
+            df = self.frames.get(symbol)
+            if df is None:
+                continue
+            mask = df.index >= start
+            if end is not None:
+                mask &= df.index <= end
+            if mask.any():
+                pieces[symbol] = df.loc[mask]
+        if not pieces:
+            return _FakeBarSet(pd.DataFrame())
+        return _FakeBarSet(pd.concat(pieces, names=["symbol", "timestamp"]))
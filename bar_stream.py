@@ -0,0 +1,208 @@
+from alpaca.data.live import StockDataStream
+from alpaca.data.enums import DataFeed
+from alpaca.data.timeframe import TimeFrame
+from websockets.asyncio.server import serve
+from bar_store import BarStore
+from strategy import BollingerRSIStrategy
+from datetime import datetime, timedelta
+import pandas as pd
+import numpy as np
+import argparse
+import asyncio
+import msgpack
+import threading
+import time
+import os
+
+class BarIngestor:
+    """
+    Feeds streamed bars into strategies incrementally via strategy.update(bar).
+    strategies maps symbol -> list of strategies; on_signal(symbol, strategy, bar, row)
+    is called for every strategy after each bar.
+    """
+
+    def __init__(self, strategies, on_signal=None):
+        self.strategies = strategies
+        self.on_signal = on_signal
+        self.bars_processed = 0
+        self.processing_seconds = 0.0
+
+    def warm_up(self, bar_store, end_time, days=100, timeframe=TimeFrame.Day, feed=DataFeed.IEX):
+        """
+        Builds the rolling state from cached history so the first streamed bar
+        already has full indicator windows.
+        """
+        frames = bar_store.get_many(list(self.strategies), end_time - timedelta(days=days), end_time, timeframe, feed)
+        for symbol, strategies in self.strategies.items():
+            if frames[symbol].empty:
+                continue
+            for strategy in strategies:
+                strategy.warm_up(frames[symbol])
+
+    def attach(self, stream):
+        stream.subscribe_bars(self.handle_bar, *self.strategies)
+
+    async def handle_bar(self, bar):
+        started = time.perf_counter()
+        symbol = bar.symbol if hasattr(bar, 'symbol') else bar['S']
+        for strategy in self.strategies.get(symbol, []):
+            row = strategy.update(bar if hasattr(bar, 'close') else {'close': bar['c']})
+            if self.on_signal is not None:
+                self.on_signal(symbol, strategy, bar, row)
+        self.bars_processed += 1
+        self.processing_seconds += time.perf_counter() - started
+
+def create_stream(api_key, secret_key, feed=DataFeed.IEX, url_override=None):
+    """
+    Alpaca's live bar stream, or the same client pointed at a ReplayServer via url_override.
+    """
+    return StockDataStream(api_key, secret_key, feed=feed, url_override=url_override)
+
+class ReplayServer:
+    """
+    Local stand-in for Alpaca's market-data websocket. Speaks the same msgpack
+    protocol (connect / auth / subscribe / "b" bar messages), so an unmodified
+    StockDataStream can connect to it and receive cached bars.
+
+    frames maps symbol -> bars DataFrame (as returned by BarStore). speed is the
+    replay rate relative to the bar timestamps (60 = one hour of data per minute);
+    None replays as fast as possible, which is useful for load tests.
+    """
+
+    def __init__(self, frames, speed=None, host="127.0.0.1", port=0):
+        self.frames = frames
+        self.speed = speed
+        self.host = host
+        self.port = port
+        self.finished = threading.Event()
+        self.bars_sent = 0
+        self._server = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    def _timeline(self, symbols):
+        """
+        All bars of the subscribed symbols merged in time order, grouped by timestamp.
+        """
+        pieces = []
+        for symbol, df in self.frames.items():
+            if df.empty or ("*" not in symbols and symbol not in symbols):
+                continue
+            piece = df[['open', 'high', 'low', 'close', 'volume']].copy()
+            for col in ('trade_count', 'vwap'):
+                piece[col] = df[col] if col in df.columns else 0.0
+            piece['symbol'] = symbol
+            pieces.append(piece)
+        if not pieces:
+            return []
+        merged = pd.concat(pieces).sort_index(kind='stable')
+        nanos = merged.index.as_unit('ns').asi8
+        cols = {c: merged[c].to_numpy() for c in ('open', 'high', 'low', 'close', 'volume', 'trade_count', 'vwap', 'symbol')}
+        batches = []
+        bounds = np.flatnonzero(np.diff(nanos)) + 1
+        for lo, hi in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(nanos)]))):
+            ts = msgpack.Timestamp.from_unix_nano(int(nanos[lo]))
+            batches.append((int(nanos[lo]), [{
+                "T": "b", "S": cols['symbol'][i], "t": ts,
+                "o": float(cols['open'][i]), "h": float(cols['high'][i]), "l": float(cols['low'][i]),
+                "c": float(cols['close'][i]), "v": float(cols['volume'][i]),
+                "n": int(cols['trade_count'][i]), "vw": float(cols['vwap'][i]),
+            } for i in range(lo, hi)]))
+        return batches
+
+    async def _handle(self, ws):
+        await ws.send(msgpack.packb([{"T": "success", "msg": "connected"}]))
+        await ws.recv()  # auth: any key is accepted
+        await ws.send(msgpack.packb([{"T": "success", "msg": "authenticated"}]))
+        request = msgpack.unpackb(await ws.recv())
+        symbols = set(request.get("bars", []))
+        await ws.send(msgpack.packb([{"T": "subscription", "bars": sorted(symbols)}]))
+
+        previous = None
+        for nanos, batch in self._timeline(symbols):
+            if self.speed and previous is not None:
+                await asyncio.sleep((nanos - previous) / 1e9 / self.speed)
+            previous = nanos
+            await ws.send(msgpack.packb(batch))
+            self.bars_sent += len(batch)
+        self.finished.set()
+        # Stay connected: closing would make the client reconnect and replay again
+        await ws.wait_closed()
+
+    async def start(self):
+        self._server = await serve(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def start_in_thread(self):
+        """
+        Runs the server on its own event loop in a daemon thread (StockDataStream.run()
+        owns the main thread's loop). Returns once the port is bound.
+        """
+        ready = threading.Event()
+
+        def _serve():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=_serve, daemon=True).start()
+        ready.wait()
+
+def replay(symbols, days=365, speed=None, cache_dir="bar_cache", timeframe=TimeFrame.Day, verbose=True):
+    """
+    Plays cached bars through ReplayServer -> StockDataStream -> BarIngestor, fully offline.
+    """
+    bar_store = BarStore(cache_dir=cache_dir, offline=True)
+    end_time = datetime.now()
+    frames = bar_store.get_many(symbols, end_time - timedelta(days=days), end_time, timeframe)
+
+    def on_signal(symbol, strategy, bar, row):
+        if verbose and row.get('signal_type'):
+            print(f"{bar.timestamp} {symbol}: {row['signal_type']} @ {bar.close:.2f}")
+
+    ingestor = BarIngestor({s: [BollingerRSIStrategy(s)] for s in symbols}, on_signal=on_signal)
+    server = ReplayServer(frames, speed=speed)
+    server.start_in_thread()
+
+    stream = create_stream("replay", "replay", url_override=server.url)
+    ingestor.attach(stream)
+
+    timing = {}
+
+    def _stop_when_done():
+        server.finished.wait()
+        # Let the client drain the last frames before shutting down
+        while ingestor.bars_processed < server.bars_sent:
+            time.sleep(0.001)
+        timing['done'] = time.perf_counter()
+        # The stream only notices a stop request between receive timeouts (up to 5s)
+        stream.stop()
+
+    threading.Thread(target=_stop_when_done, daemon=True).start()
+    started = time.perf_counter()
+    stream.run()
+    elapsed = timing.get('done', time.perf_counter()) - started
+
+    print(f"\nReplayed {ingestor.bars_processed} bars in {elapsed:.2f}s "
+          f"({ingestor.bars_processed / max(elapsed, 1e-9):,.0f} bars/s, "
+          f"{ingestor.processing_seconds / max(ingestor.bars_processed, 1) * 1e6:.1f} us strategy time per bar)")
+    return ingestor
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay cached bars through the live streaming pipeline")
+    parser.add_argument("--symbols", nargs="+", default=["AVGO"])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--speed", type=float, default=None, help="Replay speed multiplier (default: as fast as possible)")
+    parser.add_argument("--quiet", action="store_true", help="Do not print individual signals")
+    args = parser.parse_args()
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    replay(args.symbols, args.days, args.speed, os.path.join(current_dir, "bar_cache"), verbose=not args.quiet)
@@ -0,0 +1,218 @@
+from strategy import BollingerRSIStrategy, SimpleMovingAverageStrategy
+from simulator import simulate_arrays
+from portfolio_backtest import simulate_portfolio
+from bar_store import BarStore, FakeStockDataClient
+from indicators import IndicatorCache
+from track_performance import load_performance_log
+from journal import Journal
+from screener import Screener
+from alpaca.data.timeframe import TimeFrame
+from alpaca.data.enums import DataFeed
+import pandas as pd
+import numpy as np
+import argparse
+import tempfile
+import tracemalloc
+import subprocess
+import json
+import time
+import sys
+import os
+import gc
+
+BASELINE_FILE = "benchmark_baseline.json"
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds for a fresh interpreter to import each entry point, as a cron run does.
+# main.py defers alpaca-py/pandas until credentials are loaded; the others need
+# pandas but never load matplotlib or the alpaca client stack at import time.
+STARTUP_TARGETS = {"main": 0.15, "backtest": 0.6, "track_performance": 0.6}
+
+# --- Synthetic data ---
+
+def synthetic_bars(n_bars, seed=0, start="2000-01-03", freq="min"):
+    """
+    Geometric random-walk OHLCV bars in the same shape as bars.df.loc[symbol].
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n_bars)))
+    spread = np.abs(rng.normal(0, 0.005, n_bars)) * close
+    index = pd.date_range(start, periods=n_bars, freq=freq, tz="UTC", name="timestamp")
+    return pd.DataFrame({
+        "open": close + rng.normal(0, 0.002, n_bars) * close,
+        "high": close + spread,
+        "low": close - spread,
+        "close": close,
+        "volume": rng.integers(100, 100000, n_bars).astype(float),
+        "trade_count": rng.integers(1, 1000, n_bars).astype(float),
+        "vwap": close,
+    }, index=index)
+
+def synthetic_universe(n_symbols, n_bars, seed=0, freq="D"):
+    return {f"S{i:04d}": synthetic_bars(n_bars, seed + i, freq=freq) for i in range(n_symbols)}
+
+def synthetic_performance_log(path, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    equity = 1000000 * np.exp(np.cumsum(rng.normal(0, 0.01, n_rows)))
+    pd.DataFrame({
+        "Timestamp": pd.date_range("2020-01-01", periods=n_rows, freq="min").strftime("%Y-%m-%d %H:%M:%S"),
+        "Equity": equity, "Cash": equity * 0.1, "Buying_Power": equity * 0.1,
+        "Symbol": "AVGO", "Position_Qty": rng.integers(0, 100, n_rows),
+    }).to_csv(path, index=False)
+
+# --- Cases ---
+# Each case is (name, setup, run): setup builds the inputs outside the timed region.
+
+def _cases(full):
+    sizes = [1000, 100000] + ([10000000] if full else [])
+    cases = []
+    for n in sizes:
+        # A fresh IndicatorCache per run, otherwise repeats would only measure cache hits
+        cases.append((f"signals_bbrsi_{n}", lambda n=n: synthetic_bars(n),
+                      lambda df: BollingerRSIStrategy("X").generate_signals(df, indicator_cache=IndicatorCache())))
+        cases.append((f"signals_sma_{n}", lambda n=n: synthetic_bars(n),
+                      lambda df: SimpleMovingAverageStrategy("X").generate_signals(df, indicator_cache=IndicatorCache())))
+
+        def shared_cache_run(df):
+            # Ten configurations over the same windows: indicators are computed once
+            cache = IndicatorCache()
+            for bb_std in np.linspace(1.0, 3.0, 10):
+                BollingerRSIStrategy("X", bb_std=bb_std).generate_signals(df, indicator_cache=cache)
+        cases.append((f"signals_bbrsi_x10_{n}", lambda n=n: synthetic_bars(n), shared_cache_run))
+
+        def sim_setup(n=n):
+            df = synthetic_bars(n)
+            return df, BollingerRSIStrategy("X").generate_signals(df)
+        cases.append((f"simulate_{n}", sim_setup,
+                      lambda a: simulate_arrays(a[0]['close'].to_numpy(), a[1]['target_position'].to_numpy(),
+                                                BollingerRSIStrategy("X"), a[1]['volatility'].to_numpy())))
+
+    for n_symbols in [1, 100] + ([1000] if full else []):
+        def portfolio_setup(n_symbols=n_symbols):
+            frames = synthetic_universe(n_symbols, 252)
+            signals = {s: BollingerRSIStrategy(s).generate_signals(df) for s, df in frames.items()}
+            return frames, signals
+        cases.append((f"portfolio_{n_symbols}x252", portfolio_setup,
+                      lambda a: simulate_portfolio(a[0], a[1], BollingerRSIStrategy(None))))
+
+    def store_setup(n_symbols=100 if not full else 1000):
+        frames = synthetic_universe(n_symbols, 2520)
+        directory = tempfile.mkdtemp()
+        store = BarStore(FakeStockDataClient(frames), cache_dir=directory)
+        index = next(iter(frames.values())).index
+        store.get_many(list(frames), index[0], index[-1])
+        return BarStore(cache_dir=directory, offline=True), list(frames), index[0], index[-1]
+    cases.append(("bar_store_read", store_setup, lambda a: a[0].get_many(a[1], a[2], a[3])))
+
+    def screen_setup(n_symbols=500 if not full else 3000):
+        # Cache files written directly: going through the fake client is slow for thousands of symbols
+        frames = synthetic_universe(n_symbols, 100)
+        store = BarStore(cache_dir=tempfile.mkdtemp(), offline=True)
+        for symbol, df in frames.items():
+            store._write_frame(symbol, TimeFrame.Day, DataFeed.IEX, df, df.index[0], df.index[-1])
+        index = next(iter(frames.values())).index
+        return store, list(frames), index[-1].tz_convert(None)
+    cases.append(("screener_universe", screen_setup,
+                  lambda a: Screener(top_n=20).screen(a[0], a[1], a[2], lookback_days=150)))
+
+    def log_setup(n_rows=100000 if not full else 1000000):
+        path = os.path.join(tempfile.mkdtemp(), "performance_log.csv")
+        synthetic_performance_log(path, n_rows)
+        return path
+    cases.append(("performance_log_read", log_setup, load_performance_log))
+
+    def journal_setup():
+        path = log_setup()
+        with Journal(path[:-len(".csv")] + ".db") as journal:
+            journal.import_csv(path)
+        return journal.path
+    cases.append(("performance_journal_read", journal_setup, load_performance_log))
+    # One day of minute snapshots: only the indexed range is read
+    cases.append(("performance_journal_range", journal_setup,
+                  lambda path: load_performance_log(path, "2020-02-01", "2020-02-02")))
+
+    for module in STARTUP_TARGETS:
+        cases.append((f"startup_{module}", lambda module=module: [sys.executable, "-c", f"import {module}"],
+                      lambda command: subprocess.run(command, cwd=REPO_DIR, check=True)))
+    return cases
+
+def measure(setup, run, repeat=3):
+    """
+    Best wall time over `repeat` runs and peak traced memory of one run.
+    """
+    args = setup()
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        run(args)
+        times.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    run(args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak
+
+def run_benchmarks(full=False, only=None, repeat=3):
+    results = {}
+    for name, setup, run in _cases(full):
+        if only and only not in name:
+            continue
+        seconds, peak = measure(setup, run, repeat)
+        results[name] = {"seconds": seconds, "peak_mb": peak / 1e6}
+        print(f"{name:<28} {seconds * 1000:>10.1f} ms {peak / 1e6:>10.1f} MB")
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    Names of cases slower than baseline * threshold.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name in baseline and result["seconds"] > baseline[name]["seconds"] * threshold:
+            regressions.append(name)
+            print(f"REGRESSION {name}: {result['seconds'] * 1000:.1f} ms vs baseline "
+                  f"{baseline[name]['seconds'] * 1000:.1f} ms")
+    return regressions
+
+def check_startup(results, targets=STARTUP_TARGETS):
+    """
+    Names of startup cases over their target time.
+    """
+    slow = []
+    for module, target in targets.items():
+        result = results.get(f"startup_{module}")
+        if result is not None and result["seconds"] > target:
+            slow.append(module)
+            print(f"STARTUP {module}: {result['seconds'] * 1000:.1f} ms vs target {target * 1000:.0f} ms")
+    return slow
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for signals, simulation and data loading")
+    parser.add_argument("--full", action="store_true", help="Include the 10M-bar and 1000-symbol cases")
+    parser.add_argument("--only", help="Run only cases whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Record these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Fail when a case is this many times slower than baseline")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.full, args.only, args.repeat)
+    slow_startup = check_startup(results)
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            if compare(results, json.load(f), args.threshold):
+                sys.exit(1)
+    if slow_startup:
+        sys.exit(1)
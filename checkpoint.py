@@ -0,0 +1,151 @@
+"""
+Strategy checkpoints for live runs.
+
+After each run the strategy's incremental state (BaseStrategy.get_state) and the
+timestamp of the bar it covers are saved to a local JSON file. The next run
+restores that state and only feeds the bars since then through update(), instead
+of refetching ~100 days of history and replaying it.
+
+The newest bar of a run may still be forming (a daily bar fetched during the
+session), so the checkpoint always stops one bar short: the next run fetches that
+bar again and processes its final values.
+"""
+from datetime import datetime, timezone
+import pandas as pd
+import json
+import os
+
+CHECKPOINT_FILE = "strategy_checkpoint.json"
+
+def strategy_fingerprint(strategy):
+    """
+    Class name and scalar parameters; a checkpoint is only reused by an identical strategy.
+    """
+    params = {k: v for k, v in sorted(vars(strategy).items())
+              if not k.startswith('_') and isinstance(v, (bool, int, float, str))}
+    return {"class": type(strategy).__name__, "params": params}
+
+class StrategyCheckpoint:
+    """
+    JSON file of {"SYMBOL:timeframe": {fingerprint, last_bar, state, saved_at}} entries.
+    path=None keeps the entries in memory only (still round-tripped through JSON),
+    e.g. for live_replay.py.
+    """
+
+    def __init__(self, path=CHECKPOINT_FILE):
+        self.path = path
+        # Parsed entries and the (inode, mtime, size) of the file they were read from,
+        # so repeated runs in one process only re-parse the file when it changed
+        self._entries = {}
+        self._stamp = None
+
+    @staticmethod
+    def _file_stamp(path):
+        stat = os.stat(path)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _read(self):
+        if self.path is None:
+            return dict(self._entries)
+        try:
+            stamp = self._file_stamp(self.path)
+        except OSError:
+            return {}
+        if stamp != self._stamp:
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable checkpoint {self.path}: {e}")
+                return {}
+            self._stamp = stamp
+        return dict(self._entries)
+
+    def _write(self, entries):
+        if self.path is None:
+            self._entries = json.loads(json.dumps(entries))
+            return
+        # Atomic replace, so a crash never leaves half a checkpoint; compact JSON
+        # keeps the per-run cost low (json's C encoder is only used without indent)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps(entries))
+        os.replace(tmp_path, self.path)
+        self._entries, self._stamp = entries, self._file_stamp(self.path)
+
+    @staticmethod
+    def _key(strategy, timeframe):
+        return f"{strategy.symbol}:{getattr(timeframe, 'value', timeframe)}"
+
+    def restore(self, strategy, timeframe):
+        """
+        Loads the saved state into strategy. Returns the timestamp of the last bar
+        the state covers, or None (state untouched) when there is no usable checkpoint.
+        """
+        entry = self._read().get(self._key(strategy, timeframe))
+        if entry is None:
+            return None
+        if entry.get("fingerprint") != strategy_fingerprint(strategy):
+            print("Checkpoint was saved with different strategy parameters; rebuilding state.")
+            return None
+        try:
+            strategy.set_state(entry["state"])
+        except (KeyError, TypeError, NotImplementedError) as e:
+            print(f"Checkpoint state not usable ({e}); rebuilding state.")
+            strategy.reset_state()
+            return None
+        return pd.Timestamp(entry["last_bar"])
+
+    def save(self, strategy, timeframe, last_bar, state=None):
+        """
+        Stores state (default: strategy.get_state()) as covering bars up to last_bar.
+        """
+        entries = self._read()
+        entries[self._key(strategy, timeframe)] = {
+            "fingerprint": strategy_fingerprint(strategy),
+            "last_bar": pd.Timestamp(last_bar).isoformat(),
+            "state": state if state is not None else strategy.get_state(),
+            "saved_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self._write(entries)
+
+    def clear(self, strategy=None, timeframe=None):
+        """
+        Removes one strategy's entry, or the whole file when no strategy is given.
+        """
+        if strategy is None:
+            if self.path is not None and os.path.exists(self.path):
+                os.remove(self.path)
+            self._entries, self._stamp = {}, None
+            return
+        entries = self._read()
+        if entries.pop(self._key(strategy, timeframe), None) is not None:
+            self._write(entries)
+
+def reconcile_position(strategy, held_qty):
+    """
+    Makes the strategy's position state agree with the broker position (the broker
+    wins: orders may have been rejected, filled late or placed by hand).
+    Returns True if the state had to be changed.
+    """
+    held = float(held_qty or 0) > 0
+    if strategy.position_state() is None or strategy.position_state() == held:
+        return False
+    print(f"Checkpoint position ({'long' if strategy.position_state() else 'flat'}) disagrees with the broker "
+          f"({held_qty} shares); using the broker position.")
+    strategy.set_position_state(held)
+    return True
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect or clear strategy checkpoints")
+    parser.add_argument("--file", default=CHECKPOINT_FILE, help="Checkpoint file")
+    parser.add_argument("--clear", action="store_true", help="Delete the checkpoint (next run replays history)")
+    args = parser.parse_args()
+    checkpoint = StrategyCheckpoint(args.file)
+    if args.clear:
+        checkpoint.clear()
+        print(f"Removed {args.file}")
+    else:
+        for key, entry in checkpoint._read().items():
+            print(f"{key}: {entry['fingerprint']['class']} up to {entry['last_bar']} (saved {entry['saved_at']})")
@@ -0,0 +1,226 @@
+"""
+Chunked (out-of-core) backtest of BollingerRSIStrategy.
+
+backtest.run_backtest holds the whole bar history in memory several times over:
+the DataFrame, the signals frame with its indicator columns and the simulator's
+arrays. Here the bars stay in the BarStore cache files and are read through
+memory maps (BarStore.get_columns) in time-ordered chunks of chunk_bars:
+
+    1. each chunk's indicators are computed over the chunk plus a short lead-in
+       of earlier bars (indicators.aligned_start), which reproduces the values of
+       the whole-history computation exactly
+    2. the long/flat latch continues from the previous chunk's last target
+    3. the simulator continues from the previous chunk's cash and open position
+
+so equity, cash, holdings and trades are identical to the in-memory run, while
+the working set is one chunk. Only the per-bar outputs grow with the history
+(24 bytes a bar), and with output_dir even those go to .npy files.
+Stops (risk.StopModel) are not supported in chunked mode.
+"""
+from alpaca.data.timeframe import TimeFrame
+from alpaca.data.enums import DataFeed
+from strategy import BollingerRSIStrategy
+from simulator import simulate_arrays
+from resample import is_minute_bars
+from analytics import analyze_simulation, infer_periods_per_year, print_report, write_report
+import indicators as ind
+import pandas as pd
+import numpy as np
+import argparse
+import tracemalloc
+import tempfile
+import time
+import os
+from datetime import datetime, timedelta
+
+DEFAULT_CHUNK_BARS = 100000
+
+class ChunkedBacktest:
+    """
+    Backtests strategy (BollingerRSIStrategy by default) on symbol's cached bars
+    between start and end, chunk_bars at a time.
+    """
+
+    def __init__(self, bar_store, symbol, start, end, timeframe=TimeFrame.Day, feed=DataFeed.IEX, strategy=None,
+                 initial_capital=1000000.0, chunk_bars=DEFAULT_CHUNK_BARS, slippage=None, commission=None):
+        self.bar_store = bar_store
+        self.symbol = symbol
+        self.start = start
+        self.end = end
+        self.timeframe = timeframe
+        self.feed = feed
+        self.strategy = strategy or BollingerRSIStrategy(symbol)
+        self.initial_capital = initial_capital
+        self.chunk_bars = chunk_bars
+        self.slippage = slippage
+        self.commission = commission
+
+    def windows(self):
+        """
+        Rolling windows whose indicators need a lead-in: the strategy's and the sizer's (ATR).
+        """
+        windows = tuple(self.strategy.indicator_windows())
+        sizer_window = getattr(getattr(self.strategy, "sizer", None), "window", None)
+        return windows + ((sizer_window,) if sizer_window else ())
+
+    def run(self, output_dir=None):
+        """
+        Runs all chunks. Returns a dict like simulator.simulate_arrays ('equity',
+        'cash', 'holdings', 'trades' with whole-history bar indices) plus the
+        memory-mapped 'timestamps' (int64 ns) and 'close' of the history and
+        'chunks'. With output_dir the per-bar arrays are .npy files there (memory-mapped).
+        """
+        timestamps, columns = self.bar_store.get_columns(self.symbol, self.start, self.end, self.timeframe, self.feed)
+        n = len(timestamps)
+        equity, cash, holdings = (self._output(output_dir, name, n) for name in ("equity", "cash", "holdings"))
+        windows = self.windows()
+        # Only the bar columns the sizer reads (ATR: high/low/close), none for the default sizers
+        sizer = getattr(self.strategy, "sizer", None)
+        sizer_columns = [col for col in getattr(sizer, "columns", ()) if col in columns]
+        trades = []
+        target_before, cash_before, shares_before = 0.0, self.initial_capital, 0
+        chunks = 0
+        for lo in range(0, n, self.chunk_bars):
+            hi = min(lo + self.chunk_bars, n)
+            # 1. Lead-in bars so the rolling windows match the whole-history values
+            first = ind.aligned_start(lo, windows)
+            skip = lo - first
+            target, volatility = self.strategy.chunk_signals(columns['close'][first:hi], skip, first, target_before)
+            atr = None
+            if sizer_columns:
+                frame = pd.DataFrame({col: columns[col][first:hi] for col in sizer_columns})
+                atr = sizer.prepare(frame, cache=False).get("atr")
+                atr = atr[skip:] if atr is not None else None
+
+            # 2. Simulate the chunk from the carried cash and position
+            result = simulate_arrays(columns['close'][lo:hi], target, self.strategy, volatility=volatility,
+                                     initial_capital=cash_before, slippage=self.slippage, commission=self.commission,
+                                     atr=atr, initial_holdings=shares_before)
+            equity[lo:hi] = result['equity']
+            cash[lo:hi] = result['cash']
+            holdings[lo:hi] = result['holdings']
+
+            # 3. Trades in whole-history bar indices; a carried position's exit completes its trade
+            for entry, exit_, shares, entry_fill, exit_fill in result['trades']:
+                exit_ = exit_ + lo if exit_ is not None else None
+                if entry is None:
+                    entry, _, shares, entry_fill, _ = trades.pop()
+                else:
+                    entry += lo
+                trades.append((entry, exit_, shares, entry_fill, exit_fill))
+
+            target_before = target[-1]
+            cash_before = result['cash'][-1]
+            open_trade = result['trades'] and result['trades'][-1][1] is None
+            shares_before = result['trades'][-1][2] if open_trade else 0
+            chunks += 1
+
+        for values in (equity, cash, holdings):
+            if isinstance(values, np.memmap):
+                values.flush()
+        return {"equity": equity, "cash": cash, "holdings": holdings, "trades": trades,
+                "timestamps": timestamps, "close": columns.get('close', np.array([])), "chunks": chunks}
+
+    @staticmethod
+    def _output(output_dir, name, n):
+        if output_dir is None:
+            return np.empty(n)
+        os.makedirs(output_dir, exist_ok=True)
+        return np.lib.format.open_memmap(os.path.join(output_dir, f"{name}.npy"), mode="w+", dtype=float, shape=(n,))
+
+def in_memory_backtest(bar_store, symbol, start, end, timeframe=TimeFrame.Day, feed=DataFeed.IEX, strategy=None,
+                     initial_capital=1000000.0):
+    """
+    The same backtest the way backtest.run_backtest does it (whole history in memory), for comparison.
+    """
+    from backtest import simulate
+    strategy = strategy or BollingerRSIStrategy(symbol)
+    df = bar_store.get_bars(symbol, start, end, timeframe=timeframe, feed=feed)
+    signals = strategy.generate_signals(df)
+    return simulate(df, signals, strategy, initial_capital, details=True)
+
+def synthetic_store(n_bars, symbol, cache_dir, timeframe=TimeFrame.Minute):
+    """
+    BarStore in cache_dir holding n_bars synthetic bars for symbol. Returns (bar_store, start, end).
+    """
+    from bar_store import BarStore, FakeStockDataClient
+    from benchmark import synthetic_bars
+    bars = synthetic_bars(n_bars, freq="min" if is_minute_bars(timeframe) else "D")
+    start, end = bars.index[0], bars.index[-1]
+    bar_store = BarStore(FakeStockDataClient({symbol: bars}), cache_dir=cache_dir)
+    bar_store.get_columns(symbol, start, end, timeframe)
+    bar_store.client, bar_store.offline = None, True
+    return bar_store, start, end
+
+def peak_memory(fn):
+    """
+    (fn(), peak MB allocated while it ran). Tracing slows fn down severalfold.
+    """
+    tracemalloc.start()
+    try:
+        result = fn()
+        return result, tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the Bollinger+RSI strategy over a long history in chunks")
+    parser.add_argument("--symbol", default="AVGO")
+    parser.add_argument("--days", type=int, default=3650, help="History to backtest (calendar days)")
+    parser.add_argument("--timeframe", default="1Day", choices=["1Min", "1Day"], help="Stored bar size")
+    parser.add_argument("--synthetic", type=int, metavar="BARS", help="Use this many synthetic bars (temporary cache)")
+    parser.add_argument("--chunk-bars", type=int, default=DEFAULT_CHUNK_BARS)
+    parser.add_argument("--output-dir", help="Write equity/cash/holdings .npy files here instead of keeping them in memory")
+    parser.add_argument("--check", action="store_true", help="Also run the in-memory backtest and compare (peak memory too)")
+    parser.add_argument("--offline", action="store_true", help="Use only cached bars, no network access")
+    parser.add_argument("--report", default="chunked_backtest_report.json", help="Where to write the JSON analytics report")
+    args = parser.parse_args()
+    timeframe = TimeFrame.Minute if args.timeframe == "1Min" else TimeFrame.Day
+
+    if args.synthetic:
+        bar_store, start_time, end_time = synthetic_store(args.synthetic, args.symbol,
+                                                          os.path.join(tempfile.mkdtemp(prefix="chunked_"), "bar_cache"),
+                                                          timeframe)
+    else:
+        from bar_store import BarStore
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        data_client = None
+        if not args.offline:
+            from alpaca.data.historical import StockHistoricalDataClient
+            from utils import load_alpaca_credentials
+            creds = load_alpaca_credentials(os.path.join(current_dir, "paper_account_api_key.txt"))
+            data_client = StockHistoricalDataClient(creds["api_key"], creds["secret_key"])
+        bar_store = BarStore(data_client, cache_dir=os.path.join(current_dir, "bar_cache"), offline=args.offline)
+        end_time = datetime.now() - timedelta(minutes=16)
+        start_time = end_time - timedelta(days=args.days)
+
+    backtest = ChunkedBacktest(bar_store, args.symbol, start_time, end_time, timeframe, chunk_bars=args.chunk_bars)
+    started = time.perf_counter()
+    result = backtest.run(args.output_dir)
+    elapsed = time.perf_counter() - started
+    n = len(result['equity'])
+    if n == 0:
+        print("No data found for the specified period.")
+        raise SystemExit(1)
+    print(f"{n} {args.timeframe} bars ({result['chunks']} chunks) in {elapsed:.2f}s")
+    print(f"Final Portfolio Value: ${result['equity'][-1]:,.2f}")
+
+    index = pd.DatetimeIndex(np.asarray(result['timestamps']).astype("datetime64[ns]")).tz_localize("UTC")
+    report = analyze_simulation(result, result['close'], infer_periods_per_year(index), backtest.initial_capital)
+    report.update({"symbol": "SYNTHETIC" if args.synthetic else args.symbol, "timeframe": args.timeframe,
+                   "start": str(index[0]), "end": str(index[-1]), "chunk_bars": args.chunk_bars})
+    print("\n--- Analytics ---")
+    print_report(report)
+    if args.report:
+        write_report(report, args.report)
+        print(f"Report saved to {args.report}")
+
+    if args.check:
+        # A second output directory: the first run's arrays may still map the files in args.output_dir
+        scratch = tempfile.mkdtemp(prefix="chunked_check_") if args.output_dir else None
+        _, peak = peak_memory(lambda: backtest.run(scratch))
+        expected, full_peak = peak_memory(
+            lambda: in_memory_backtest(bar_store, args.symbol, start_time, end_time, timeframe))
+        same = np.array_equal(expected['equity'], result['equity']) and expected['trades'] == result['trades']
+        print(f"\nPeak memory: {peak:.0f} MB chunked, {full_peak:.0f} MB in memory")
+        print(f"Identical to the in-memory backtest: {'yes' if same else 'NO'}")
@@ -0,0 +1,263 @@
+from alpaca.data.timeframe import TimeFrame
+from alpaca.data.enums import DataFeed
+from strategy import STRATEGIES
+from bar_store import BarStore
+from indicators import IndicatorCache
+from execution import OrderExecutor
+from risk import RiskManager, symbols_opened_today
+from screener import Screener, load_universe
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import argparse
+import json
+import math
+import os
+from datetime import datetime, timedelta
+
+MODES = ("vote", "weighted", "sleeve")
+
+# Used when no configuration file is given
+DEFAULT_MEMBERS = [
+    {"name": "bbrsi", "strategy": "bbrsi", "params": {}},
+    {"name": "bbrsi_fast", "strategy": "bbrsi", "params": {"bb_window": 10, "rsi_window": 7}},
+    {"name": "sma", "strategy": "sma", "params": {}},
+]
+
+def normalize_members(members):
+    """
+    Fills in defaults for ensemble members ({"strategy", "params", "name", "weight",
+    "allocation", "sizer"}): weights default to 1 and sleeve allocations to equal shares.
+    "sizer" is a sizing.make_sizer config (default: the fixed-fraction rule).
+    """
+    normalized = []
+    for i, member in enumerate(members):
+        if member["strategy"] not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{member['strategy']}' (choose from {', '.join(STRATEGIES)})")
+        normalized.append({
+            "name": member.get("name") or f"{member['strategy']}_{i}",
+            "strategy": member["strategy"],
+            "params": dict(member.get("params") or {}),
+            "weight": float(member.get("weight", 1.0)),
+            "allocation": member.get("allocation"),
+            "sizer": member.get("sizer"),
+        })
+    unallocated = [m for m in normalized if m["allocation"] is None]
+    if unallocated:
+        remaining = max(0.0, 1.0 - sum(m["allocation"] for m in normalized if m["allocation"] is not None))
+        for m in unallocated:
+            m["allocation"] = remaining / len(unallocated)
+    return normalized
+
+def build_strategy(member, symbol):
+    return STRATEGIES[member["strategy"]](symbol, sizer=member.get("sizer"), **member["params"])
+
+def _evaluate_symbol(job):
+    """
+    Worker: runs every member on one symbol's bars and returns the latest decision
+    per member. Members share one IndicatorCache, so equal windows are computed once.
+    """
+    symbol, df, members = job
+    cache = IndicatorCache()
+    close = df['close'].to_numpy(dtype=float)
+    decisions = {}
+    for member in members:
+        strategy = build_strategy(member, symbol)
+        signals = strategy.generate_signals(df, indicator_cache=cache)
+        volatility = signals['volatility'].iloc[-1] if 'volatility' in signals.columns else float('nan')
+        decisions[member["name"]] = {
+            "signal": float(signals['target_position'].iloc[-1]),
+            "price": float(close[-1]),
+            "volatility": float(volatility),
+            "reason": signals['signal_type'].iloc[-1] if 'signal_type' in signals.columns else '',
+        }
+        for name, values in strategy.sizer.prepare(df, cache).items():
+            decisions[member["name"]][name] = float(values[-1])
+    return symbol, decisions
+
+def evaluate_members(frames, members, max_workers=None):
+    """
+    Latest decision of every member for every symbol with data, across a process pool.
+    Returns {symbol: {member name: decision}}.
+    """
+    jobs = [(symbol, df, members) for symbol, df in frames.items() if not df.empty]
+    if max_workers == 1 or len(jobs) <= 1:
+        return dict(map(_evaluate_symbol, jobs))
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return dict(pool.map(_evaluate_symbol, jobs, chunksize=max(1, len(jobs) // 64)))
+
+def aggregate_targets(decisions, members, capital, mode="vote", threshold=0.5):
+    """
+    Turns per-member decisions into one net share target per symbol.
+
+    vote: long the full symbol sleeve when at least `threshold` of the members are long.
+    weighted: hold the weight-averaged exposure of the members (fractional sizing).
+    sleeve: each member trades its own allocation of the symbol sleeve; the
+    member positions are summed, so opposing members net out before any order is sent.
+    Capital is split equally across the symbols that have decisions.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}' (choose from {', '.join(MODES)})")
+    targets = {}
+    if not decisions:
+        return targets
+    symbol_capital = capital / len(decisions)
+    for symbol, by_member in decisions.items():
+        if mode == "sleeve":
+            qty = 0
+            for member in members:
+                decision = by_member[member["name"]]
+                if decision["signal"] > 0:
+                    qty += _size(build_strategy(member, symbol), decision, symbol_capital * member["allocation"])
+            targets[symbol] = qty
+            continue
+
+        signals = np.array([by_member[m["name"]]["signal"] for m in members])
+        if mode == "vote":
+            exposure = 1.0 if signals.mean() >= threshold else 0.0
+        else:
+            weights = np.array([m["weight"] for m in members])
+            exposure = float(np.dot(weights, signals) / weights.sum()) if weights.sum() > 0 else 0.0
+        # The first member's sizing rules (and volatility estimate) size the combined position
+        lead = members[0]
+        full = _size(build_strategy(lead, symbol), by_member[lead["name"]], symbol_capital)
+        targets[symbol] = int(math.floor(exposure * full))
+    return targets
+
+def _size(strategy, decision, capital):
+    volatility = decision["volatility"] if not math.isnan(decision["volatility"]) else None
+    atr = decision.get("atr")
+    atr = atr if atr is not None and not math.isnan(atr) else None
+    return strategy.calculate_position_size(decision["price"], capital, volatility=volatility, atr=atr)
+
+class EnsembleRunner:
+    """
+    Runs several strategies over a symbol list against one account. Bars come from
+    a shared BarStore (one download per symbol for all members), members are
+    evaluated in parallel, their targets are combined per symbol, and only the net
+    difference to the current positions is sent through an OrderExecutor.
+    """
+
+    def __init__(self, members, symbols, mode="vote", threshold=0.5, bar_store=None, max_workers=None,
+                 lookback_days=100, timeframe=TimeFrame.Day, feed=DataFeed.IEX, tolerance=0.1, screener=None):
+        self.members = normalize_members(members)
+        self.symbols = list(symbols)
+        # With a screener.Screener, symbols is the universe and each evaluation trades its top N
+        self.screener = screener
+        self.universe = list(symbols)
+        self.mode = mode
+        self.threshold = threshold
+        # Held positions within this fraction of their target are not resized
+        self.tolerance = tolerance
+        self.bar_store = bar_store or BarStore()
+        self.max_workers = max_workers
+        self.lookback_days = lookback_days
+        self.timeframe = timeframe
+        self.feed = feed
+
+    @classmethod
+    def from_config(cls, path, bar_store=None, **kwargs):
+        """
+        Builds a runner from a JSON file:
+        {"symbols": [...], "mode": "vote", "threshold": 0.5, "tolerance": 0.1, "members": [...]}.
+        An optional "screener" entry ({"top_n": 10, "scores": {...}, ...}, see screener.Screener)
+        turns "symbols" (or the symbols listed in "universe_file") into a universe to screen.
+        """
+        with open(path) as f:
+            config = json.load(f)
+        for key in ("mode", "threshold", "max_workers", "lookback_days", "tolerance"):
+            if key in config:
+                kwargs.setdefault(key, config[key])
+        symbols = config.get("symbols", [])
+        if "universe_file" in config:
+            symbols = symbols + load_universe(config["universe_file"])
+        if "screener" in config:
+            kwargs.setdefault("screener", Screener(**config["screener"]))
+        return cls(config.get("members", DEFAULT_MEMBERS), symbols, bar_store=bar_store, **kwargs)
+
+    def evaluate(self, end_time=None, held=()):
+        """
+        Fetches bars and returns {symbol: {member name: decision}}. Does not touch the account,
+        so it can run ahead of the trigger.
+        With a screener only the top N of the universe are evaluated, plus the held
+        symbols so positions that dropped out of the top N still get their exit signals.
+        """
+        end_time = end_time or datetime.now() - timedelta(minutes=16)
+        if self.screener is not None:
+            picks = self.screener.screen(self.bar_store, self.universe, end_time, self.lookback_days,
+                                         self.timeframe, self.feed)
+            print("Screened top symbols: " + ", ".join(f"{symbol} ({score:.2f})" for symbol, score in picks))
+            top = [symbol for symbol, _ in picks]
+            self.symbols = top + [symbol for symbol in held if symbol not in top]
+        frames = self.bar_store.get_many(self.symbols, end_time - timedelta(days=self.lookback_days), end_time,
+                                         self.timeframe, self.feed)
+        return evaluate_members(frames, self.members, self.max_workers)
+
+    def targets(self, decisions, capital):
+        return aggregate_targets(decisions, self.members, capital, self.mode, self.threshold)
+
+    def execute(self, trading_client, account, decisions, executor=None, risk=None):
+        """
+        Sizes the combined targets against the account equity, applies the risk checks
+        (risk.RiskManager; default limits if None) and sends the net orders.
+        Returns (targets, per-order results).
+        """
+        executor = executor or OrderExecutor(trading_client)
+        risk = risk or RiskManager()
+        targets = self.targets(decisions, float(account.portfolio_value))
+        # Held symbols no member evaluated still count, at their current price
+        positions, prices = executor.current_book()
+        for symbol, target in targets.items():
+            held = positions.get(symbol, 0)
+            # Avoid small daily resizes of positions that are already on
+            if held > 0 and target > 0 and abs(target - held) <= self.tolerance * held:
+                targets[symbol] = held
+        prices.update({symbol: next(iter(by_member.values()))["price"] for symbol, by_member in decisions.items()})
+        opened_today = symbols_opened_today() if risk.pdt_restricted(account) else ()
+        targets, notes = risk.approve(account, targets, positions, prices, opened_today)
+        for note in notes:
+            print(f"Risk: {note}")
+        results = executor.rebalance(targets, positions)
+        for result in results:
+            status = f"error: {result['error']}" if result["error"] else "submitted"
+            print(f"{result['side'].upper():<4} {result['qty']:>8} {result['symbol']:<6} {status}")
+        if not results:
+            print("No action required: positions already match the ensemble targets.")
+        return targets, results
+
+def print_decisions(decisions, members, targets=None):
+    names = [m["name"] for m in members]
+    print(f"{'Symbol':<8}" + "".join(f"{n:>14}" for n in names) + ("   Target" if targets is not None else ""))
+    for symbol, by_member in decisions.items():
+        line = f"{symbol:<8}" + "".join(f"{by_member[n]['signal']:>14.0f}" for n in names)
+        if targets is not None:
+            line += f"{targets.get(symbol, 0):>9}"
+        print(line)
+
+if __name__ == "__main__":
+    # Dry run on cached bars: prints each member's signal and the combined targets, no orders
+    parser = argparse.ArgumentParser(description="Evaluate a strategy ensemble over a symbol list")
+    parser.add_argument("--config", help="JSON ensemble configuration (default: built-in members)")
+    parser.add_argument("--symbols", nargs="+", default=["AVGO"])
+    parser.add_argument("--mode", choices=MODES, default="vote")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Vote share needed to go long (vote mode)")
+    parser.add_argument("--capital", type=float, default=1000000.0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--offline", action="store_true", help="Use only cached bars, no network access")
+    args = parser.parse_args()
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    client = None
+    if not args.offline:
+        from alpaca.data.historical import StockHistoricalDataClient
+        from utils import load_alpaca_credentials
+        creds = load_alpaca_credentials(os.path.join(current_dir, "paper_account_api_key.txt"))
+        client = StockHistoricalDataClient(creds.get("api_key"), creds.get("secret_key"))
+    bar_store = BarStore(client, cache_dir=os.path.join(current_dir, "bar_cache"), offline=args.offline)
+
+    if args.config:
+        overrides = {} if args.workers is None else {"max_workers": args.workers}
+        runner = EnsembleRunner.from_config(args.config, bar_store, **overrides)
+    else:
+        runner = EnsembleRunner(DEFAULT_MEMBERS, args.symbols, args.mode, args.threshold, bar_store, args.workers)
+    decisions = runner.evaluate()
+    print_decisions(decisions, runner.members, runner.targets(decisions, args.capital))
@@ -0,0 +1,151 @@
+from alpaca.trading.requests import MarketOrderRequest
+from alpaca.trading.enums import OrderSide, TimeInForce
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import random
+import threading
+import time
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def book_from_positions(all_positions):
+    """
+    ({symbol: qty}, {symbol: current price}) from get_all_positions() results; the
+    price falls back to market_value / qty when current_price is missing.
+    """
+    positions, prices = {}, {}
+    for p in all_positions:
+        qty = float(p.qty)
+        positions[p.symbol] = qty
+        if getattr(p, "current_price", None):
+            prices[p.symbol] = float(p.current_price)
+        elif qty:
+            prices[p.symbol] = abs(float(p.market_value or 0) / qty)
+    return positions, prices
+
+def compute_order_deltas(targets, positions):
+    """
+    targets / positions: {symbol: qty}. Returns [(symbol, side, qty, close_all)] for
+    every symbol whose position has to change; close_all marks exits to zero.
+    Symbols held but missing from targets are left untouched.
+    """
+    orders = []
+    for symbol, target in targets.items():
+        held = positions.get(symbol, 0)
+        delta = target - held
+        if delta > 0:
+            orders.append((symbol, OrderSide.BUY, delta, False))
+        elif delta < 0:
+            orders.append((symbol, OrderSide.SELL, -delta, target == 0))
+    return orders
+
+class OrderExecutor:
+    """
+    Rebalances many symbols at once: one get_all_positions call, then orders sent
+    concurrently through a bounded thread pool. Every API call goes through a token
+    bucket holding one minute of budget (Alpaca allows 200 requests/minute), so a
+    rebalance can burst while the per-minute limit still holds; HTTP 429 responses
+    are retried with exponential backoff and jitter.
+    """
+
+    def __init__(self, trading_client, max_workers=8, requests_per_minute=200, max_retries=5, backoff=0.5):
+        self.trading_client = trading_client
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(requests_per_minute / 60.0, capacity=requests_per_minute)
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def current_positions(self):
+        return self.current_book()[0]
+
+    def current_book(self):
+        """
+        ({symbol: qty}, {symbol: current price}) of the open positions, from one API call.
+        """
+        self.bucket.acquire()
+        return book_from_positions(self.trading_client.get_all_positions())
+
+    def _call_with_retry(self, fn, *args):
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                return fn(*args)
+            except Exception as e:
+                if getattr(e, 'status_code', None) != 429 or attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    def _submit(self, order):
+        symbol, side, qty, close_all = order
+        try:
+            if close_all:
+                result = self._call_with_retry(self.trading_client.close_position, symbol)
+            else:
+                request = MarketOrderRequest(symbol=symbol, qty=qty, side=side, time_in_force=TimeInForce.DAY)
+                result = self._call_with_retry(self.trading_client.submit_order, request)
+            return {"symbol": symbol, "side": side.value, "qty": qty, "order": result, "error": None}
+        except Exception as e:
+            return {"symbol": symbol, "side": side.value, "qty": qty, "order": None, "error": str(e)}
+
+    def submit_orders(self, orders):
+        """
+        Sends orders concurrently; sells go out before buys so they free up buying power.
+        Returns one result dict per order (order or error).
+        """
+        sells = [o for o in orders if o[1] == OrderSide.SELL]
+        buys = [o for o in orders if o[1] == OrderSide.BUY]
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for batch in (sells, buys):
+                results.extend(pool.map(self._submit, batch))
+        return results
+
+    def rebalance(self, targets, positions=None):
+        """
+        Brings the account to targets ({symbol: qty}). Returns the per-order results.
+        """
+        if positions is None:
+            positions = self.current_positions()
+        return self.submit_orders(compute_order_deltas(targets, positions))
+
+if __name__ == "__main__":
+    # Offline demo against the mock broker: how long does an N-symbol rebalance take?
+    from mock_broker import MockTradingClient
+
+    parser = argparse.ArgumentParser(description="Rebalance demo against a mock broker")
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.15, help="Simulated seconds per API call")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--rpm", type=int, default=200, help="Rate limit in requests per minute")
+    args = parser.parse_args()
+
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    client = MockTradingClient(prices={s: 100.0 for s in symbols}, latency=args.latency, rate_limit_every=50)
+    executor = OrderExecutor(client, max_workers=args.workers, requests_per_minute=args.rpm)
+    started = time.perf_counter()
+    results = executor.rebalance({s: 10 for s in symbols})
+    elapsed = time.perf_counter() - started
+    errors = [r for r in results if r["error"]]
+    print(f"Submitted {len(results)} orders in {elapsed:.2f}s ({len(errors)} errors)")
@@ -0,0 +1,353 @@
+"""
+Technical indicators on raw NumPy arrays, with a memoization cache.
+
+All rolling windows follow pandas' defaults (a value needs `window` non-NaN inputs,
+sample std uses ddof=1), so results match the pandas expressions previously
+used in strategy.py to floating-point precision. Rolling sums are O(n): they use
+cumulative sums restarted every block and taken relative to a per-block
+reference value, which keeps the cancellation error at the level of local
+price moves instead of the whole history. The rolling functions (and rsi /
+volatility built on them) also take 2-D (time x symbol) arrays and work on every
+column at once along axis 0.
+
+Results can be cached per input array in an IndicatorCache (LRU, bounded by
+entry count and by bytes, which include the input arrays the entries keep alive),
+passed as cache=; without one nothing is cached. The cache key is the array's
+memory (address, shape, strides, dtype), so the same column read twice from a
+DataFrame hits the cache. Cached arrays are returned read-only; inputs must not
+be modified in place while a cache that has seen them is in use.
+"""
+from collections import OrderedDict
+import numpy as np
+import math
+
+class IndicatorCache:
+    """
+    LRU cache of indicator results keyed by (series identity, indicator, params).
+    """
+
+    def __init__(self, maxsize=256, max_bytes=256 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # id(owning array) -> [array, entries using it], see _hold
+        self._owners = {}
+
+    @staticmethod
+    def series_key(series):
+        interface = series.__array_interface__
+        return (interface['data'][0], series.shape, series.strides, series.dtype.str)
+
+    def get(self, series, name, params, compute, others=()):
+        """
+        Cached compute() for series; others are further input arrays (e.g. atr's high
+        and low), keyed and kept alive the same way.
+        """
+        inputs = (series,) + tuple(others)
+        key = (tuple(self.series_key(arr) for arr in inputs), name, params)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        result = compute()
+        for arr in (result if isinstance(result, tuple) else (result,)):
+            arr.setflags(write=False)
+        # Keeping references to the inputs keeps their buffers (and thus the key) from being reused
+        self._entries[key] = (inputs, result)
+        self.nbytes += _nbytes(result)
+        for arr in inputs:
+            self._hold(arr)
+        while self._entries and (len(self._entries) > self.maxsize or self.nbytes > self.max_bytes):
+            _, (evicted_inputs, evicted) = self._entries.popitem(last=False)
+            self.nbytes -= _nbytes(evicted)
+            for arr in evicted_inputs:
+                self._release(arr)
+        return result
+
+    def _hold(self, series):
+        """
+        Counts the memory an entry's input keeps alive: the array owning its buffer
+        (e.g. a whole DataFrame block behind a column view), once however many
+        entries share it.
+        """
+        owner = _owner(series)
+        held = self._owners.get(id(owner))
+        if held is None:
+            self._owners[id(owner)] = [owner, 1]
+            self.nbytes += owner.nbytes
+        else:
+            held[1] += 1
+
+    def _release(self, series):
+        owner = _owner(series)
+        held = self._owners[id(owner)]
+        held[1] -= 1
+        if held[1] == 0:
+            del self._owners[id(owner)]
+            self.nbytes -= owner.nbytes
+
+    def clear(self):
+        self._entries.clear()
+        self._owners.clear()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+def _owner(series):
+    while isinstance(series.base, np.ndarray):
+        series = series.base
+    return series
+
+def _nbytes(result):
+    return sum(a.nbytes for a in result) if isinstance(result, tuple) else result.nbytes
+
+def _memo(cache, series, name, params, compute, others=()):
+    if cache is None or cache is False:
+        return compute()
+    return cache.get(series, name, params, compute, others)
+
+def _as_array(x):
+    return np.asarray(x, dtype=np.float64)
+
+def _source(x):
+    # The cache keys on the caller's array (e.g. a float32 column), not on a converted copy
+    return x if isinstance(x, np.ndarray) else np.asarray(x)
+
+# --- Rolling primitives ---
+
+def _block_size(window):
+    return max(2 * window, 64)
+
+def aligned_start(position, windows):
+    """
+    Index from which the rolling indicators (rolling_mean / rolling_std / bollinger,
+    rsi, volatility, atr) for bars >= position can be computed on x[start:] with
+    exactly the same floating-point results as on all of x: a multiple of every
+    window's block size, two blocks before position (not for ema / macd, which
+    carry from the first bar).
+    """
+    align = 1
+    for window in windows:
+        align = math.lcm(align, _block_size(window))
+    return max(0, (position // align - 2) * align)
+
+def _rolling_moments(x, window, min_periods, second=True):
+    """
+    Rolling count, sum and (optionally) sum of squares of the non-NaN values in each
+    window, taken relative to a reference value per position. Returns
+    (count, s1, s2, ref, enough), with s1 = sum(x - ref) and s2 = sum((x - ref)**2),
+    laid out as (blocks, block) arrays; callers ravel and trim to len(x).
+    A 2-D x (time x symbol) gives (blocks, block, symbol) arrays: every column is
+    processed at once along axis 0.
+    """
+    n = len(x)
+    rest = x.shape[1:]
+    block = _block_size(window)
+    n_blocks = -(-n // block)
+    padded = np.full((n_blocks * block,) + rest, np.nan)
+    padded[:n] = x
+    blocks = padded.reshape((n_blocks, block) + rest)
+    has_nan = bool(np.isnan(x).any())
+
+    # Reference per block: its first valid value (0 for all-NaN blocks)
+    if has_nan:
+        valid = ~np.isnan(blocks)
+        first = np.argmax(valid, axis=1)
+        ref = np.where(valid.any(axis=1), np.take_along_axis(blocks, first[:, None], axis=1)[:, 0], 0.0)[:, None]
+        dev = np.where(valid, blocks - ref, 0.0)
+    else:
+        ref = blocks[:, :1].copy()
+        dev = blocks - ref
+        # Padding after the last bar is NaN and must not leak into the sums
+        dev.reshape((-1,) + rest)[n:] = 0.0
+    # Shift from the previous block's reference to this block's (0 for the first block)
+    shift = np.concatenate((ref[:1], ref[:-1])) - ref
+
+    k = window - 1
+
+    def window_sums(values):
+        """
+        (inside, spill): the part of each window within its own block, and for the
+        first k offsets of each block the part that falls in the previous block
+        (windows are never longer than a block).
+        """
+        prefix = np.zeros((n_blocks + 1, block + 1) + rest)
+        np.cumsum(values, axis=1, out=prefix[1:, 1:])
+        inside = np.empty((n_blocks, block) + rest)
+        np.subtract(prefix[1:, window:], prefix[1:, :block + 1 - window], out=inside[:, k:])
+        inside[:, :k] = prefix[1:, 1:window]
+        spill = prefix[:-1, -1:] - prefix[:-1, block + 1 - window:block]
+        return inside, spill
+
+    if has_nan:
+        count, n1 = window_sums(valid)
+        count[:, :k] += n1
+    else:
+        # Without NaNs the counts are known: windows are full except at the start
+        n1 = np.zeros((n_blocks, k))
+        n1[1:] = k - np.arange(k)
+        count = np.full((n_blocks, block), float(window))
+        head = count.reshape(-1)[:k]
+        head[:] = np.arange(1, len(head) + 1)
+        # Same counts for every column
+        n1 = n1.reshape(n1.shape + (1,) * len(rest))
+        count = count.reshape(count.shape + (1,) * len(rest))
+    s1, p1 = window_sums(dev)
+    head_shift = shift * n1
+    s2 = None
+    if second:
+        s2, q1 = window_sums(dev * dev)
+        s2[:, :k] += q1 + 2 * shift * p1 + head_shift * shift
+    s1[:, :k] += p1 + head_shift
+
+    enough = count >= (min_periods if min_periods is not None else window)
+    return count, s1, s2, ref, enough
+
+def _flat(values, n):
+    return values.reshape((-1,) + values.shape[2:])[:n]
+
+def rolling_mean(x, window, min_periods=None, cache=None):
+    """
+    pandas: Series(x).rolling(window, min_periods).mean()
+    """
+    source = _source(x)
+
+    def compute():
+        count, s1, _, ref, enough = _rolling_moments(_as_array(source), window, min_periods, second=False)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return _flat(np.where(enough, ref + s1 / count, np.nan), len(source))
+    return _memo(cache, source, 'mean', (window, min_periods), compute)
+
+sma = rolling_mean
+
+def rolling_std(x, window, cache=None):
+    """
+    pandas: Series(x).rolling(window).std() (sample std, ddof=1)
+    """
+    source = _source(x)
+
+    def compute():
+        count, s1, s2, _, enough = _rolling_moments(_as_array(source), window, None)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # var = (s2 - s1**2 / count) / (count - 1), in place
+            s1 *= s1
+            s1 /= count
+            s2 -= s1
+            count -= 1
+            s2 /= count
+            var = s2
+        return _flat(np.where(enough & (count > 0), np.sqrt(np.maximum(var, 0.0)), np.nan), len(source))
+    return _memo(cache, source, 'std', (window,), compute)
+
+def bollinger(x, window=20, num_std=2.0, cache=None):
+    """
+    (middle, upper, lower) Bollinger Bands.
+    """
+    middle = rolling_mean(x, window, cache=cache)
+    std = rolling_std(x, window, cache=cache)
+    return middle, middle + num_std * std, middle - num_std * std
+
+def diff(x):
+    x = _as_array(x)
+    out = np.empty_like(x)
+    out[:1] = np.nan
+    out[1:] = x[1:] - x[:-1]
+    return out
+
+def pct_change(x):
+    x = _as_array(x)
+    out = np.empty_like(x)
+    out[:1] = np.nan
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out[1:] = x[1:] / x[:-1] - 1
+    return out
+
+def rsi(x, window=14, cache=None):
+    """
+    RSI from simple rolling means of gains and losses (the formulation used by
+    BollingerRSIStrategy, not Wilder smoothing).
+    """
+    source = _source(x)
+
+    def compute():
+        delta = diff(source)
+        # As with pandas' where(), the NaN first delta counts as 0
+        gain = rolling_mean(np.where(delta > 0, delta, 0.0), window, cache=False)
+        loss = rolling_mean(np.where(delta < 0, -delta, 0.0), window, cache=False)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return 100 - (100 / (1 + gain / loss))
+    return _memo(cache, source, 'rsi', (window,), compute)
+
+def volatility(x, window=20, cache=None):
+    """
+    Rolling sample std of simple returns.
+    """
+    source = _source(x)
+    return _memo(cache, source, 'volatility', (window,), lambda: rolling_std(pct_change(source), window, cache=False))
+
+def ema(x, span, cache=None):
+    """
+    pandas: Series(x).ewm(span=span, adjust=False).mean(), for inputs without NaN.
+    Evaluated blockwise in closed form; only the carry between blocks is sequential.
+    """
+    source = _source(x)
+
+    def compute():
+        x = _as_array(source)
+        n = len(x)
+        if n == 0:
+            return x.copy()
+        alpha = 2.0 / (span + 1)
+        beta = 1 - alpha
+        # Block length keeps beta**-k below ~1e8 so the scaled cumsum stays accurate
+        block = max(1, min(n, int(np.log(1e8) / -np.log(beta)))) if beta > 0 else 1
+        n_blocks = -(-n // block)
+        padded = np.zeros(n_blocks * block)
+        padded[:n] = x
+        blocks = padded.reshape(n_blocks, block)
+        k = np.arange(block)
+        grow = beta ** -k
+        decay = beta ** k
+        # Zero-carry EMA within each block: alpha * sum_j beta**(k-j) x_j
+        local = alpha * decay * np.cumsum(blocks * grow, axis=1)
+        carried = beta * decay
+        # adjust=False starts from y_0 = x_0, i.e. a carry of x_0 into the first bar
+        carry = x[0]
+        for b in range(n_blocks):
+            local[b] += carried * carry
+            carry = local[b, -1]
+        return local.ravel()[:n]
+    return _memo(cache, source, 'ema', (span,), compute)
+
+def macd(x, fast=12, slow=26, signal=9, cache=None):
+    """
+    (macd, signal, histogram).
+    """
+    source = _source(x)
+
+    def compute():
+        line = ema(source, fast, cache=cache) - ema(source, slow, cache=cache)
+        sig = ema(line, signal, cache=False)
+        return line, sig, line - sig
+    return _memo(cache, source, 'macd', (fast, slow, signal), compute)
+
+def true_range(high, low, close):
+    high, low, close = _as_array(high), _as_array(low), _as_array(close)
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    # fmax ignores the NaN previous close on the first bar, like pandas' max(axis=1)
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+def atr(high, low, close, window=14, cache=None):
+    """
+    Average True Range as a simple rolling mean of the true range.
+    """
+    close, high, low = _source(close), _source(high), _source(low)
+    return _memo(cache, close, 'atr', (window,), lambda: rolling_mean(true_range(high, low, close), window, cache=False),
+                 others=(high, low))
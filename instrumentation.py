@@ -0,0 +1,382 @@
+"""
+Latency instrumentation for the trading pipeline.
+
+Stages are timed with span("name") blocks (or the @timed("name") decorator) and
+trading / data API calls with instrument_client(). Recording is off by default:
+span() then returns a shared no-op object and instrument_client() returns the
+client itself, so an uninstrumented run pays one flag check per span.
+
+enable() turns recording on. Every span adds its duration to a per-stage
+histogram (fixed buckets, like a Prometheus histogram). save() merges them into
+a JSON file, so one-shot runs of main.py accumulate; prometheus_text() renders
+the Prometheus text format, written next to the JSON file (.prom, for
+node_exporter's textfile collector) or served over HTTP by serve().
+
+From the environment (configure_from_env; main.py also has --metrics / --profile):
+    TRADING_METRICS=path        record and merge into path at exit ("1": METRICS_FILE)
+    TRADING_METRICS_PORT=9108   also serve the histograms at http://127.0.0.1:9108/metrics
+    TRADING_METRICS_HOST=addr   interface to serve on instead (e.g. 0.0.0.0 for all)
+    TRADING_PROFILE=path        run under cProfile and dump pstats to path at exit
+"""
+from bisect import bisect_left
+import threading
+import argparse
+import atexit
+import json
+import time
+import os
+
+METRICS_FILE = "latency_metrics.json"
+
+# Upper bounds in seconds: sub-millisecond cache hits up to slow API calls and cold imports
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """
+    Counts of observations per bucket (the last one is +Inf), plus sum, max and errors.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def observe(self, seconds, error=False):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if error:
+            self.errors += 1
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.errors += other.errors
+
+    def copy(self):
+        h = Histogram()
+        h.merge(self)
+        return h
+
+    def since(self, earlier):
+        """
+        Observations added after earlier (a copy of this histogram); max stays the overall max.
+        """
+        h = self.copy()
+        h.counts = [a - b for a, b in zip(self.counts, earlier.counts)]
+        h.total -= earlier.total
+        h.errors -= earlier.errors
+        return h
+
+    def quantile(self, q):
+        """
+        Estimated q-quantile, interpolating within the bucket (capped at the observed max).
+        """
+        count = self.count
+        if count == 0:
+            return float('nan')
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def to_dict(self):
+        return {"counts": self.counts, "sum": self.total, "max": self.max, "errors": self.errors}
+
+    @classmethod
+    def from_dict(cls, data):
+        h = cls()
+        if len(data["counts"]) == len(h.counts):
+            h.counts = list(data["counts"])
+            h.total, h.max, h.errors = data["sum"], data["max"], data.get("errors", 0)
+        return h
+
+_enabled = False
+_histograms = {}
+# Part of _histograms already added to a metrics file by save()
+_saved = {}
+# File configure() saves to (flush())
+_metrics_file = None
+_lock = threading.Lock()
+
+def enabled():
+    return _enabled
+
+def enable():
+    global _enabled
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _saved.clear()
+
+def observe(stage, seconds, error=False):
+    if not _enabled:
+        return
+    with _lock:
+        h = _histograms.get(stage)
+        if h is None:
+            h = _histograms[stage] = Histogram()
+        h.observe(seconds, error)
+
+def histograms():
+    """
+    Copy of this process's {stage: Histogram}.
+    """
+    with _lock:
+        return {stage: h.copy() for stage, h in _histograms.items()}
+
+class _Span:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, time.perf_counter() - self.started, exc_type is not None)
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+_NULL_SPAN = _NullSpan()
+
+def span(stage):
+    """
+    Context manager timing one stage (a no-op while recording is off).
+    A span that raises still counts, as an error.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(stage)
+
+def timed(stage):
+    """
+    Decorator form of span().
+    """
+    def decorator(fn):
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(stage):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        return wrapper
+    return decorator
+
+class InstrumentedClient:
+    """
+    Proxy timing every method call of an API client as "<prefix>.<method>".
+    Other attributes pass through unchanged.
+    """
+
+    def __init__(self, client, prefix):
+        self._client = client
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+        stage = f"{self._prefix}.{name}"
+
+        def call(*args, **kwargs):
+            with span(stage):
+                return attr(*args, **kwargs)
+        return call
+
+def instrument_client(client, prefix):
+    """
+    client wrapped in InstrumentedClient while recording is on, else client itself.
+    """
+    return InstrumentedClient(client, prefix) if _enabled and client is not None else client
+
+# --- Output ---
+
+def load(path=METRICS_FILE):
+    """
+    {stage: Histogram} saved in path ({} if missing or unreadable).
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {stage: Histogram.from_dict(h) for stage, h in data.get("stages", {}).items()}
+
+def save(path=METRICS_FILE, prometheus=True):
+    """
+    Adds what this process recorded since its last save() to the histograms in path,
+    so the file accumulates across runs (like Prometheus counters). With
+    prometheus=True the totals are also written in the text format to path with a
+    .prom extension. Returns the totals.
+    """
+    with _lock:
+        current = {}
+        for stage, h in _histograms.items():
+            current[stage] = h.since(_saved[stage]) if stage in _saved else h.copy()
+            _saved[stage] = h.copy()
+    totals = load(path)
+    for stage, h in current.items():
+        totals.setdefault(stage, Histogram()).merge(h)
+    data = {"buckets": list(BUCKETS), "updated": time.time(),
+            "stages": {stage: h.to_dict() for stage, h in sorted(totals.items())}}
+    _replace(path, json.dumps(data))
+    if prometheus:
+        _replace(os.path.splitext(path)[0] + ".prom", prometheus_text(totals))
+    return totals
+
+def flush():
+    """
+    save() to the file given to configure(), if any (e.g. after each service session).
+    """
+    if _metrics_file:
+        save(_metrics_file)
+
+def _replace(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def _le(bound):
+    return f"{bound:g}"
+
+def prometheus_text(stages=None):
+    """
+    Histograms (default: this process's) in the Prometheus text exposition format.
+    """
+    stages = histograms() if stages is None else stages
+    lines = ["# HELP trading_stage_latency_seconds Latency of trading pipeline stages.",
+             "# TYPE trading_stage_latency_seconds histogram"]
+    for stage, h in sorted(stages.items()):
+        cumulative = 0
+        for bound, n in zip(BUCKETS, h.counts):
+            cumulative += n
+            lines.append(f'trading_stage_latency_seconds_bucket{{stage="{stage}",le="{_le(bound)}"}} {cumulative}')
+        lines.append(f'trading_stage_latency_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+        lines.append(f'trading_stage_latency_seconds_sum{{stage="{stage}"}} {h.total!r}')
+        lines.append(f'trading_stage_latency_seconds_count{{stage="{stage}"}} {h.count}')
+    lines += ["# HELP trading_stage_errors_total Stage runs that raised an exception.",
+              "# TYPE trading_stage_errors_total counter"]
+    for stage, h in sorted(stages.items()):
+        lines.append(f'trading_stage_errors_total{{stage="{stage}"}} {h.errors}')
+    return "\n".join(lines) + "\n"
+
+def serve(port, host="127.0.0.1"):
+    """
+    Serves prometheus_text() at http://host:port/metrics from a daemon thread.
+    Local connections only unless host widens it (e.g. "0.0.0.0").
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def print_summary(stages):
+    print(f"{'stage':<32}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+    for stage, h in sorted(stages.items(), key=lambda item: -item[1].total):
+        if h.count == 0:
+            continue
+        print(f"{stage:<32}{h.count:>8}{h.total / h.count * 1000:>10.1f}{h.quantile(0.5) * 1000:>10.1f}"
+              f"{h.quantile(0.95) * 1000:>10.1f}{h.quantile(0.99) * 1000:>10.1f}{h.max * 1000:>10.1f}{h.errors:>8}")
+
+# --- Profiling ---
+
+def start_profile(path):
+    """
+    Runs the rest of the process under cProfile and dumps the stats to path at exit
+    (inspect with: python -m pstats path).
+    """
+    import cProfile
+    profiler = cProfile.Profile()
+
+    def dump():
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Profile written to {path}")
+    atexit.register(dump)
+    profiler.enable()
+    return profiler
+
+def configure(metrics=None, port=None, profile=None, host=None):
+    """
+    Turns on recording when metrics (file, "1" for METRICS_FILE) or port is given,
+    saving to the file at exit / serving on the port (on host, default 127.0.0.1),
+    and profiling to profile.
+    """
+    global _metrics_file
+    if metrics or port:
+        enable()
+    if metrics:
+        _metrics_file = METRICS_FILE if metrics == "1" else metrics
+        atexit.register(flush)
+    if port:
+        host = host or "127.0.0.1"
+        serve(int(port), host)
+        print(f"Serving latency metrics on {host}:{port}")
+    if profile:
+        start_profile(profile)
+
+def configure_from_env(environ=None):
+    """
+    configure() from TRADING_METRICS / TRADING_METRICS_PORT / TRADING_PROFILE / TRADING_METRICS_HOST.
+    """
+    environ = os.environ if environ is None else environ
+    configure(environ.get("TRADING_METRICS"), environ.get("TRADING_METRICS_PORT"), environ.get("TRADING_PROFILE"),
+              environ.get("TRADING_METRICS_HOST"))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the recorded per-stage latencies")
+    parser.add_argument("--file", default=METRICS_FILE, help="Metrics file written by TRADING_METRICS runs")
+    parser.add_argument("--prometheus", action="store_true", help="Print the Prometheus text format instead")
+    args = parser.parse_args()
+    stages = load(args.file)
+    if not stages:
+        print(f"No metrics in {args.file}; run with TRADING_METRICS={args.file} to record some.")
+    elif args.prometheus:
+        print(prometheus_text(stages), end="")
+    else:
+        print_summary(stages)
@@ -0,0 +1,259 @@
+"""
+Performance journal: account snapshots, per-symbol positions, orders and fills
+in one SQLite file, replacing the append-only performance_log.csv.
+
+Timestamps are stored as integer nanoseconds since the epoch (UTC) and every
+table is indexed on them, so time-range queries read only the rows they need.
+The database runs in WAL mode, so track_performance.py can read while the
+trading service writes.
+"""
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+import pandas as pd
+import numpy as np
+import argparse
+import sqlite3
+import os
+
+JOURNAL_FILE = "performance_journal.db"
+LEGACY_LOG_FILE = "performance_log.csv"
+
+# Column names of the legacy CSV, kept for snapshots() and export_csv()
+LEGACY_COLUMNS = ["Equity", "Cash", "Buying_Power", "Symbol", "Position_Qty"]
+
+TEXT_COLUMNS = {"symbol", "side", "status", "error", "order_id"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    ts INTEGER NOT NULL, equity REAL, cash REAL, buying_power REAL, symbol TEXT, position_qty REAL
+);
+CREATE INDEX IF NOT EXISTS snapshots_ts ON snapshots (ts);
+CREATE TABLE IF NOT EXISTS positions (
+    ts INTEGER NOT NULL, symbol TEXT NOT NULL, qty REAL, market_value REAL
+);
+CREATE INDEX IF NOT EXISTS positions_ts ON positions (ts);
+CREATE INDEX IF NOT EXISTS positions_symbol_ts ON positions (symbol, ts);
+CREATE TABLE IF NOT EXISTS orders (
+    ts INTEGER NOT NULL, order_id TEXT, symbol TEXT, side TEXT, qty REAL, status TEXT, error TEXT
+);
+CREATE INDEX IF NOT EXISTS orders_ts ON orders (ts);
+CREATE TABLE IF NOT EXISTS fills (
+    ts INTEGER NOT NULL, order_id TEXT, symbol TEXT, side TEXT, qty REAL, price REAL
+);
+CREATE INDEX IF NOT EXISTS fills_ts ON fills (ts);
+"""
+
+def _to_ns(ts):
+    # Naive timestamps are taken as UTC, as in bar_store
+    if ts is None:
+        return None
+    ts = pd.Timestamp(ts)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+    return int(ts.value)
+
+def _local_to_utc(values, tz=None):
+    # Naive local datetimes in tz (None: this machine's zone, DST rules included) to UTC
+    zone = ZoneInfo(tz) if tz else None
+    local = [value.replace(tzinfo=zone) if zone else value.astimezone() for value in values.dt.to_pydatetime()]
+    return pd.to_datetime(pd.Series(local, index=values.index), utc=True)
+
+def _utc_to_local(index, tz=None):
+    zone = ZoneInfo(tz) if tz else None
+    return pd.Index([value.astimezone(zone).replace(tzinfo=None) for value in index.to_pydatetime()])
+
+def now_utc():
+    """
+    Time stamped on rows recorded without one. live_replay.py swaps it for the
+    simulated clock (see journal_at there).
+    """
+    return datetime.now(timezone.utc)
+
+def _now_ns():
+    return _to_ns(now_utc())
+
+def _float(value):
+    return None if value is None or value == "" else float(value)
+
+def _column(name, values):
+    # REAL columns become float64 (NumPy maps NULL to NaN); text columns stay objects
+    return np.array(values, dtype=object if name in TEXT_COLUMNS else np.float64)
+
+def _enum_value(value):
+    return getattr(value, "value", value)
+
+class Journal:
+    """
+    Append-only SQLite journal. Use as a context manager (commits and closes on exit)
+    or call close() explicitly.
+    """
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        # "file:" URIs allow e.g. a shared in-memory journal (live_replay.py)
+        self.conn = sqlite3.connect(path, uri=str(path).startswith("file:"))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    # --- Writing ---
+
+    def record_snapshot(self, equity, cash, buying_power, symbol=None, position_qty=None, positions=None,
+                        timestamp=None):
+        """
+        One account snapshot. positions is an optional {symbol: qty} or
+        {symbol: (qty, market_value)} mapping stored alongside it.
+        """
+        ts = _to_ns(timestamp) if timestamp is not None else _now_ns()
+        self.conn.execute("INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?)",
+                          (ts, _float(equity), _float(cash), _float(buying_power), symbol, _float(position_qty)))
+        if positions:
+            rows = []
+            for sym, value in positions.items():
+                qty, market_value = value if isinstance(value, (tuple, list)) else (value, None)
+                rows.append((ts, sym, _float(qty), _float(market_value)))
+            self.conn.executemany("INSERT INTO positions VALUES (?, ?, ?, ?)", rows)
+        self.conn.commit()
+
+    def record_order(self, order=None, symbol=None, side=None, qty=None, error=None, timestamp=None):
+        """
+        An order as returned by submit_order / close_position (alpaca Order or the mock's
+        equivalent). Orders that are already filled also produce a fill row. Rejected
+        submissions can be recorded with error and no order.
+        """
+        ts = _to_ns(timestamp) if timestamp is not None else _now_ns()
+        order_id = str(getattr(order, "id", "")) or None
+        symbol = getattr(order, "symbol", None) or symbol
+        side = _enum_value(getattr(order, "side", None)) or _enum_value(side)
+        qty = _float(getattr(order, "qty", None)) if getattr(order, "qty", None) is not None else _float(qty)
+        status = _enum_value(getattr(order, "status", None)) if order is not None else "rejected"
+        self.conn.execute("INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?)",
+                          (ts, order_id, symbol, side, qty, status, error))
+        filled_qty = getattr(order, "filled_qty", None) or (qty if status == "filled" else None)
+        price = getattr(order, "filled_avg_price", None)
+        if order is not None and filled_qty and price is not None:
+            self.record_fill(order_id, symbol, side, filled_qty, price, timestamp=timestamp, commit=False)
+        self.conn.commit()
+
+    def record_fill(self, order_id, symbol, side, qty, price, timestamp=None, commit=True):
+        ts = _to_ns(timestamp) if timestamp is not None else _now_ns()
+        self.conn.execute("INSERT INTO fills VALUES (?, ?, ?, ?, ?, ?)",
+                          (ts, order_id, symbol, _enum_value(side), _float(qty), _float(price)))
+        if commit:
+            self.conn.commit()
+
+    # --- Queries ---
+
+    def _query(self, table, columns, start=None, end=None, symbol=None):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(_to_ns(start))
+        if end is not None:
+            clauses.append("ts <= ?")
+            params.append(_to_ns(end))
+        if symbol is not None:
+            clauses.append("symbol = ?")
+            params.append(symbol)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.conn.execute(f"SELECT ts, {', '.join(columns)} FROM {table}{where} ORDER BY ts", params).fetchall()
+        # Transpose once and build each column as an array, no per-row objects
+        values = list(zip(*rows)) if rows else [()] * (len(columns) + 1)
+        index = pd.DatetimeIndex(np.array(values[0], dtype=np.int64).astype("datetime64[ns]"), name="Timestamp")
+        data = {col: _column(col, col_values) for col, col_values in zip(columns, values[1:])}
+        return pd.DataFrame(data, index=index.tz_localize("UTC"), columns=columns)
+
+    def snapshots(self, start=None, end=None):
+        """
+        Account snapshots in [start, end], shaped like the legacy performance_log.csv
+        (Equity, Cash, Buying_Power, Symbol, Position_Qty indexed by Timestamp, UTC).
+        """
+        df = self._query("snapshots", ["equity", "cash", "buying_power", "symbol", "position_qty"], start, end)
+        df.columns = LEGACY_COLUMNS
+        return df
+
+    def positions(self, start=None, end=None, symbol=None):
+        return self._query("positions", ["symbol", "qty", "market_value"], start, end, symbol)
+
+    def orders(self, start=None, end=None, symbol=None):
+        return self._query("orders", ["order_id", "symbol", "side", "qty", "status", "error"], start, end, symbol)
+
+    def fills(self, start=None, end=None, symbol=None):
+        return self._query("fills", ["order_id", "symbol", "side", "qty", "price"], start, end, symbol)
+
+    # --- CSV compatibility ---
+
+    def export_csv(self, path=LEGACY_LOG_FILE, start=None, end=None, tz=None):
+        """
+        Writes snapshots in the legacy performance_log.csv format: naive local time
+        in tz (default this machine's zone), as main.py used to write it.
+        """
+        df = self.snapshots(start, end)
+        df.index = _utc_to_local(df.index, tz).strftime("%Y-%m-%d %H:%M:%S")
+        df.index.name = "Timestamp"
+        df.to_csv(path)
+        return len(df)
+
+    def import_csv(self, path=LEGACY_LOG_FILE, tz=None):
+        """
+        Loads a legacy performance_log.csv into the snapshots table. Returns the row count.
+        The legacy log stamped rows with the naive local datetime.now(), so naive
+        timestamps are taken as local time in tz (default this machine's zone).
+        """
+        df = pd.read_csv(path)
+        ts = pd.to_datetime(df["Timestamp"])
+        ts = _local_to_utc(ts, tz) if ts.dt.tz is None else ts.dt.tz_convert("UTC")
+        rows = zip(ts.dt.as_unit("ns").astype("int64").tolist(), df["Equity"].tolist(), df["Cash"].tolist(),
+                   df["Buying_Power"].tolist(), df["Symbol"].tolist(), df["Position_Qty"].tolist())
+        self.conn.executemany("INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.conn.commit()
+        return len(df)
+
+def open_journal(path=JOURNAL_FILE, legacy_csv=None, create=True):
+    """
+    Opens the journal; the first time it is created, an existing legacy CSV log
+    (default LEGACY_LOG_FILE, "" to skip) is imported so the history carries over.
+    Readers pass create=False so a mistyped path raises FileNotFoundError instead
+    of creating an empty journal.
+    """
+    legacy_csv = LEGACY_LOG_FILE if legacy_csv is None else legacy_csv
+    created = not str(path).startswith("file:") and not os.path.exists(path)
+    if created and not create:
+        raise FileNotFoundError(f"No performance journal at {path}")
+    journal = Journal(path)
+    if created and legacy_csv and os.path.exists(legacy_csv):
+        count = journal.import_csv(legacy_csv)
+        print(f"Imported {count} rows from {legacy_csv} into {path}")
+    return journal
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query or export the performance journal")
+    parser.add_argument("--journal", default=JOURNAL_FILE)
+    parser.add_argument("--table", choices=["snapshots", "positions", "orders", "fills"], default="snapshots")
+    parser.add_argument("--start", help="Only rows at or after this time (UTC)")
+    parser.add_argument("--end", help="Only rows at or before this time (UTC)")
+    parser.add_argument("--export", metavar="CSV", help="Write snapshots in the legacy performance_log.csv format")
+    parser.add_argument("--import-csv", metavar="CSV", help="Append rows from a legacy performance_log.csv")
+    parser.add_argument("--tz", help="Time zone of the CSV timestamps, e.g. America/New_York (default: local)")
+    args = parser.parse_args()
+
+    # Only an import may create the journal
+    try:
+        journal = open_journal(args.journal, legacy_csv="", create=bool(args.import_csv))
+    except FileNotFoundError as e:
+        raise SystemExit(str(e))
+    with journal:
+        if args.import_csv:
+            print(f"Imported {journal.import_csv(args.import_csv, args.tz)} rows from {args.import_csv}")
+        elif args.export:
+            print(f"Exported {journal.export_csv(args.export, args.start, args.end, args.tz)} rows to {args.export}")
+        else:
+            print(getattr(journal, args.table)(args.start, args.end).to_string())
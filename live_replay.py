@@ -0,0 +1,272 @@
+"""
+Deterministic replay of the live trading path over cached history.
+
+Every bar of the history is one session: the driver sets the mock broker's clock
+and prices to the bar, then runs the real main.py stages against it:
+get_account_status -> compute_signal -> execute_signal -> log_performance
+(with the same sizing, risk checks, checkpoint and journal code as a live run).
+Orders fill through MockTradingClient at the bar's close, subject to its fill
+latency and partial fills; the clock is then stepped through the rest of the bar
+so delayed parts can fill, and DAY orders expire at the end of the trading day.
+
+Bars are served from memory (ReplayBarStore) by default. through_bar_store=True
+puts the real BarStore in front of a MockDataClient instead, which exercises the
+cache code as well but is slower (its cache goes to a scratch directory). The
+checkpoint and journal are kept in memory unless checkpoint_file / journal_file
+are given; the live ones are never touched.
+
+With the default fills and the checkpoint on, the replay equity matches the
+vectorized simulator on the same signals (expected_equity), which the command
+line reports as a consistency check.
+"""
+from mock_broker import MockTradingClient, MockDataClient
+from bar_store import BarStore, frames_to_matrix, _to_utc
+from strategy import BollingerRSIStrategy
+from checkpoint import StrategyCheckpoint
+from analytics import analyze, infer_periods_per_year, print_report
+from contextlib import contextmanager, redirect_stdout
+import main as live
+import journal
+import pandas as pd
+import numpy as np
+import argparse
+import tempfile
+import time
+import sys
+import os
+from datetime import timedelta
+
+class ReplayBarStore:
+    """
+    In-memory BarStore stand-in: get_bars / get_many / get_matrix over
+    {symbol: DataFrame}, never returning bars after its clock (now).
+    """
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.now = None
+
+    def _slice(self, symbol, start, end):
+        df = self.frames.get(symbol)
+        if df is None:
+            return pd.DataFrame()
+        end = _to_utc(end)
+        if self.now is not None:
+            end = min(end, _to_utc(self.now))
+        i = df.index.searchsorted(_to_utc(start), side="left")
+        j = df.index.searchsorted(end, side="right")
+        return df.iloc[i:j]
+
+    def get_bars(self, symbol, start, end, timeframe=None, feed=None):
+        return self._slice(symbol, start, end)
+
+    def get_many(self, symbols, start, end, timeframe=None, feed=None):
+        return {symbol: self._slice(symbol, start, end) for symbol in symbols}
+
+    def get_matrix(self, symbols, start, end, timeframe=None, feed=None, column="close"):
+        return frames_to_matrix(self.get_many(symbols, start, end), column)
+
+@contextmanager
+def journal_at(path, clock=None):
+    """
+    Points the journal (main.log_performance / log_orders, risk.symbols_opened_today)
+    at path, stamping rows with clock() (e.g. the mock broker's time) if given.
+    The live legacy CSV log is never imported into it.
+    """
+    previous = journal.JOURNAL_FILE, journal.LEGACY_LOG_FILE, journal.now_utc
+    journal.JOURNAL_FILE, journal.LEGACY_LOG_FILE = path, ""
+    if clock is not None:
+        journal.now_utc = clock
+    try:
+        yield path
+    finally:
+        journal.JOURNAL_FILE, journal.LEGACY_LOG_FILE, journal.now_utc = previous
+
+class LiveReplay:
+    """
+    Runs the live single-symbol path (main.py) once per bar of frames[symbol].
+    strategy_factory builds the strategy from the symbol (BollingerRSIStrategy by default).
+    """
+
+    def __init__(self, frames, symbol, strategy_factory=None, initial_cash=1000000.0, fill_latency=0.0,
+                 partial_fill=1.0, fill_step=60.0, use_checkpoint=True, risk=None, through_bar_store=False,
+                 timeframe=None, warmup_days=100, workdir=None, journal_file=None,
+                 checkpoint_file=None):
+        self.frames = frames
+        self.symbol = symbol
+        self.strategy_factory = strategy_factory or BollingerRSIStrategy
+        self.initial_cash = initial_cash
+        self.fill_latency = fill_latency
+        self.partial_fill = partial_fill
+        # Seconds between fill checks while orders are open
+        self.fill_step = fill_step
+        self.use_checkpoint = use_checkpoint
+        self.risk = risk
+        self.through_bar_store = through_bar_store
+        self.timeframe = timeframe
+        # The first session needs this much history before it, like compute_signal's window
+        self.warmup_days = warmup_days
+        # Bar cache directory for through_bar_store (a fresh temporary one by default)
+        self.workdir = workdir
+        # Journal database for the run; None keeps it in memory (shared by the live
+        # code's connections for as long as the run holds one open), which is far
+        # cheaper than committing to a file every session
+        self.journal_file = journal_file
+        # Likewise for the strategy checkpoint (None: in memory, still JSON round-tripped)
+        self.checkpoint_file = checkpoint_file
+
+    def sessions(self):
+        index = self.frames[self.symbol].index
+        return index[index >= index[0] + timedelta(days=self.warmup_days)]
+
+    def _data_source(self):
+        if not self.through_bar_store:
+            return ReplayBarStore(self.frames), None
+        data_client = MockDataClient(self.frames)
+        self.workdir = self.workdir or tempfile.mkdtemp(prefix="replay_")
+        return BarStore(data_client, cache_dir=os.path.join(self.workdir, "bar_cache")), data_client
+
+    def run(self, verbose=False):
+        """
+        Replays every session. Returns a dict with the per-session 'index', 'equity',
+        'cash' and 'holdings', the broker's 'orders', the orders the live code journaled
+        ('journal_orders' DataFrame), 'elapsed' seconds and 'sessions_per_second'.
+        """
+        df = self.frames[self.symbol]
+        sessions = self.sessions()
+        closes = df['close'].reindex(sessions).to_numpy(dtype=float)
+        client = MockTradingClient(cash=self.initial_cash, fill_latency=self.fill_latency,
+                                   partial_fill=self.partial_fill)
+        store, data_client = self._data_source()
+        strategy = self.strategy_factory(self.symbol)
+        checkpoint = StrategyCheckpoint(self.checkpoint_file) if self.use_checkpoint else None
+        timeframe = self.timeframe
+        if timeframe is None:
+            from alpaca.data.timeframe import TimeFrame
+            timeframe = TimeFrame.Day
+
+        n = len(sessions)
+        end_times = sessions.tz_convert("UTC").tz_localize(None).to_pydatetime()
+        # DAY orders expire after the last session of each New York trading day
+        dates = sessions.tz_convert("America/New_York").date
+        day_ends = np.append(dates[1:] != dates[:-1], True)
+        equity, cash, holdings = np.empty(n), np.empty(n), np.empty(n)
+        out = sys.stdout if verbose else open(os.devnull, "w")
+        started = time.perf_counter()
+        journal_path = self.journal_file or f"file:replay_{id(self)}?mode=memory&cache=shared"
+        keep_open = journal.Journal(journal_path)
+        with journal_at(journal_path, clock=lambda: client.now.to_pydatetime()), redirect_stdout(out):
+            for k, ts in enumerate(sessions):
+                # 1. Clock and prices move to the bar; bars after it stay invisible
+                client.set_time(ts, {self.symbol: closes[k]})
+                store_clock = data_client if data_client is not None else store
+                store_clock.now = ts
+
+                # 2. The live stages, unchanged
+                account = live.get_account_status(client)
+                if account is not None:
+                    decision = live.compute_signal(store, strategy, end_times[k], timeframe, checkpoint=checkpoint,
+                                                   held_qty=live.get_position_qty(client, self.symbol))
+                    if decision is not None:
+                        current_qty = live.execute_signal(client, account, strategy, decision, self.risk)
+                        live.log_performance(account.portfolio_value, account.cash, account.buying_power,
+                                             current_qty, self.symbol)
+
+                # 3. Delayed / partial fills during the rest of the bar, then DAY orders expire
+                next_ts = sessions[k + 1] if k + 1 < n else ts + timedelta(days=1)
+                t = ts
+                while client.open_orders():
+                    t = t + timedelta(seconds=self.fill_step)
+                    if t >= next_ts:
+                        break
+                    client.set_time(t)
+                if day_ends[k]:
+                    client.end_of_day()
+
+                equity[k] = client.cash + client.positions.get(self.symbol, 0) * closes[k]
+                cash[k] = client.cash
+                holdings[k] = client.positions.get(self.symbol, 0)
+        elapsed = time.perf_counter() - started
+        if not verbose:
+            out.close()
+        journal_orders = keep_open.orders()
+        keep_open.close()
+        return {
+            "index": sessions,
+            "equity": equity,
+            "cash": cash,
+            "holdings": holdings,
+            "orders": client.orders,
+            "journal_orders": journal_orders,
+            "elapsed": elapsed,
+            "sessions_per_second": n / elapsed if elapsed > 0 else float("inf"),
+        }
+
+    def expected_equity(self):
+        """
+        simulator.simulate_arrays on the strategy's own streamed signals: what the
+        replay should reproduce with immediate full fills and the checkpoint on.
+        The strategy starts flat at the first session, as the broker does (the
+        checkpoint reconciliation makes the broker position win), so an entry
+        latched during the warm-up bars waits for the next breakout.
+        """
+        from simulator import simulate_arrays
+        df = self.frames[self.symbol]
+        sessions = self.sessions()
+        strategy = self.strategy_factory(self.symbol)
+        strategy.warm_up(df[df.index < sessions[0]])
+        strategy.set_position_state(False)
+        closes = df['close'].reindex(sessions).to_numpy(dtype=float)
+        rows = [strategy.update({'close': close}) for close in closes]
+        target = np.array([row['target_position'] for row in rows])
+        volatility = np.array([row['volatility'] for row in rows])
+        result = simulate_arrays(closes, target, strategy, volatility=volatility, initial_capital=self.initial_cash)
+        return result['equity']
+
+def load_frames(symbols, cache_dir="bar_cache", days=3650, timeframe=None):
+    """
+    Cached bars for symbols from the local BarStore (no network access).
+    """
+    from alpaca.data.timeframe import TimeFrame
+    from datetime import datetime
+    store = BarStore(cache_dir=cache_dir, offline=True)
+    end = datetime.now()
+    frames = store.get_many(symbols, end - timedelta(days=days), end, timeframe=timeframe or TimeFrame.Day)
+    return {s: df for s, df in frames.items() if not df.empty}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the live trading path over cached history against a mock broker")
+    parser.add_argument("--symbol", default="AVGO")
+    parser.add_argument("--days", type=int, default=3650, help="History to load from the bar cache (calendar days)")
+    parser.add_argument("--synthetic", type=int, metavar="BARS", help="Replay this many synthetic daily bars instead")
+    parser.add_argument("--fill-latency", type=float, default=0.0, help="Seconds from order to first fill")
+    parser.add_argument("--partial-fill", type=float, default=1.0, help="Fraction of the open quantity per fill")
+    parser.add_argument("--no-checkpoint", action="store_true", help="Rebuild strategy state from history every session")
+    parser.add_argument("--through-bar-store", action="store_true", help="Serve bars through BarStore + MockDataClient")
+    parser.add_argument("--checkpoint", help="Write the strategy checkpoint to this file (default: in memory)")
+    parser.add_argument("--journal", help="Write the run's journal to this SQLite file (default: in memory)")
+    parser.add_argument("--verbose", action="store_true", help="Show the live code's output for every session")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        from benchmark import synthetic_bars
+        frames = {args.symbol: synthetic_bars(args.synthetic, freq="D")}
+    else:
+        frames = load_frames([args.symbol], days=args.days)
+    if args.symbol not in frames:
+        print(f"No cached bars for {args.symbol}; run backtest.py first or use --synthetic.")
+        raise SystemExit(1)
+
+    replay = LiveReplay(frames, args.symbol, fill_latency=args.fill_latency, partial_fill=args.partial_fill,
+                        use_checkpoint=not args.no_checkpoint, through_bar_store=args.through_bar_store,
+                        journal_file=args.journal, checkpoint_file=args.checkpoint)
+    result = replay.run(verbose=args.verbose)
+    print(f"Replayed {len(result['index'])} sessions in {result['elapsed']:.2f}s "
+          f"({result['sessions_per_second']:,.0f} sessions/s), {len(result['orders'])} orders")
+    print(f"Final equity: ${result['equity'][-1]:,.2f}")
+    report = analyze(result['equity'], result['holdings'], periods_per_year=infer_periods_per_year(result['index']),
+                     initial_capital=replay.initial_cash)
+    print_report(report)
+    if args.fill_latency == 0 and args.partial_fill >= 1.0 and not args.no_checkpoint:
+        expected = replay.expected_equity()
+        print(f"Matches the simulator on the same signals: {'yes' if np.allclose(result['equity'], expected) else 'NO'}")
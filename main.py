@@ -1,64 +1,73 @@
-from alpaca.trading.client import TradingClient
-from alpaca.trading.requests import MarketOrderRequest
-from alpaca.trading.enums import OrderSide, TimeInForce
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.requests import StockBarsRequest
-from alpaca.data.timeframe import TimeFrame
-from alpaca.data.enums import DataFeed
+# alpaca-py, pandas and the strategy stack take most of a second to import, so they
+# are imported inside the functions that need them: a run that stops at the
+# credentials check never loads them.
 from utils import load_alpaca_credentials
-from strategy import BollingerRSIStrategy
+from instrumentation import span, instrument_client
 from datetime import datetime, timedelta
+import argparse
 import os
 import warnings
-import pandas as pd
-import csv
 
 # Suppress the OpenSSL warning common on macOS
 warnings.filterwarnings("ignore", category=UserWarning, module='urllib3')
 
-def log_performance(equity, cash, buying_power, position_qty, symbol):
+def log_performance(equity, cash, buying_power, position_qty, symbol, positions=None):
     """
-    Logs the daily performance to a CSV file.
+    Records an account snapshot in the performance journal (journal.py).
+    positions is an optional {symbol: qty} mapping for multi-symbol runs.
     """
-    log_file = "performance_log.csv"
-    today = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Check if file exists to write header
-    file_exists = os.path.isfile(log_file)
-    
-    with open(log_file, mode='a', newline='') as file:
-        writer = csv.writer(file)
-        if not file_exists:
-            writer.writerow(["Timestamp", "Equity", "Cash", "Buying_Power", "Symbol", "Position_Qty"])
-        
-        writer.writerow([today, equity, cash, buying_power, symbol, position_qty])
-    
-    print(f"Performance logged to {log_file}")
+    from journal import JOURNAL_FILE, open_journal
+    with span("journal"), open_journal(JOURNAL_FILE) as journal:
+        journal.record_snapshot(equity, cash, buying_power, symbol, position_qty,
+                                positions if positions is not None else {symbol: position_qty})
+    print(f"Performance logged to {JOURNAL_FILE}")
 
-def main():
-    # Define path to credentials file
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    creds_path = os.path.join(current_dir, "paper_account_api_key.txt")
-    
+def log_orders(results):
+    """
+    Records submitted orders ({symbol, side, qty, order, error} dicts as returned by
+    OrderExecutor) in the performance journal.
+    """
+    if not results:
+        return
+    from journal import JOURNAL_FILE, open_journal
+    with span("journal"), open_journal(JOURNAL_FILE) as journal:
+        for r in results:
+            journal.record_order(r["order"], r["symbol"], r["side"], r["qty"], r["error"])
+
+def create_clients(creds_path):
+    """
+    Loads credentials and builds the trading and data clients.
+    Returns (trading_client, data_client), or (None, None) if credentials are unusable.
+    """
     print(f"Loading credentials from {creds_path}...")
     try:
-        creds = load_alpaca_credentials(creds_path)
+        with span("credentials"):
+            creds = load_alpaca_credentials(creds_path)
     except Exception as e:
         print(f"Error loading credentials: {e}")
-        return
+        return None, None
 
     api_key = creds.get("api_key")
     secret_key = creds.get("secret_key")
     
     if not api_key or not secret_key:
         print("Error: API Key or Secret Key missing in credentials file.")
-        return
+        return None, None
 
     print("Initializing Clients...")
-    trading_client = TradingClient(api_key, secret_key, paper=True)
-    data_client = StockHistoricalDataClient(api_key, secret_key)
+    with span("imports"):
+        from alpaca.trading.client import TradingClient
+        from alpaca.data.historical import StockHistoricalDataClient
+    with span("clients"):
+        trading_client = TradingClient(api_key, secret_key, paper=True)
+        data_client = StockHistoricalDataClient(api_key, secret_key)
+    # API calls are timed per method ("trading.submit_order", "data.get_stock_bars") when metrics are on
+    return instrument_client(trading_client, "trading"), instrument_client(data_client, "data")
 
-    # Get Account Info
+def get_account_status(trading_client):
+    """
+    Fetches and prints the account. Returns None if trading should not proceed.
+    """
     try:
         account = trading_client.get_account()
         print(f"\n--- Account Status ---")
@@ -67,60 +76,153 @@ def main():
         
         if float(account.buying_power) <= 0:
             print("⚠️ Insufficient buying power. Please add funds in Alpaca Dashboard.")
-            return
+            return None
+        return account
             
     except Exception as e:
         print(f"Error getting account info: {e}")
-        return
+        return None
 
-    # --- Strategy Execution ---
-    symbol = "AVGO"
+def compute_signal(bar_store, strategy, end_time=None, timeframe=None, checkpoint=None, held_qty=None):
+    """
+    Fetches recent bars and returns the latest decision as a dict
+    (signal, price, volatility, reason), or None if no data is available.
+    timeframe defaults to daily bars; intraday timeframes are built from cached
+    minute bars by the BarStore.
+    With a checkpoint (checkpoint.StrategyCheckpoint) the saved strategy state is
+    restored, reconciled with held_qty (the broker position, if known) and only the
+    bars since the checkpoint are fetched and fed through strategy.update().
+    """
+    from alpaca.data.timeframe import TimeFrame
+    from alpaca.data.enums import DataFeed
+    timeframe = timeframe or TimeFrame.Day
+    symbol = strategy.symbol
     print(f"\n--- Running Bollinger+RSI Strategy for {symbol} ---")
+    if checkpoint is not None:
+        from sizing import Sizer
+        if type(strategy.sizer).prepare is not Sizer.prepare:
+            # The sizer needs a full history of bars (e.g. ATR), which the incremental path does not fetch
+            checkpoint = None
     
-    # 1. Fetch recent data (enough for the strategy window)
-    end_time = datetime.now() - timedelta(minutes=16) # Delay to avoid realtime restrictions
+    # 1. Fetch recent data (enough for the strategy window, or only what is newer than the checkpoint)
+    end_time = end_time or datetime.now() - timedelta(minutes=16) # Delay to avoid realtime restrictions
     start_time = end_time - timedelta(days=100) # Fetch 100 days to ensure we cover the windows
+    with span("checkpoint.restore"):
+        last_bar = checkpoint.restore(strategy, timeframe) if checkpoint is not None else None
+    if last_bar is not None and last_bar.tz_convert(None) >= end_time:
+        # Checkpoint is newer than the requested bars (e.g. an earlier end_time); replay instead
+        last_bar = None
+    if last_bar is not None:
+        start_time = last_bar
+        print(f"Resuming from checkpoint at {last_bar}")
     
-    request_params = StockBarsRequest(
-        symbol_or_symbols=[symbol],
-        timeframe=TimeFrame.Day,
-        start=start_time,
-        end=end_time,
-        feed=DataFeed.IEX # Use IEX for free/paper tier
-    )
-    
-    bars = data_client.get_stock_bars(request_params)
-    if bars.df.empty:
+    # Bars already in the local cache are not downloaded again
+    with span("bars"):
+        df = bar_store.get_bars(symbol, start_time, end_time, timeframe=timeframe, feed=DataFeed.IEX) # Use IEX for free/paper tier
+    if last_bar is not None:
+        # Bars come back sorted, so a slice avoids a boolean mask over the frame
+        df = df.iloc[df.index.searchsorted(last_bar, side="right"):]
+    if df.empty:
         print("No data found for strategy calculation.")
-        return
-    df = bars.df.loc[symbol]
+        return None
     
     # 2. Run Strategy Logic
-    strategy = BollingerRSIStrategy(symbol)
-    signals = strategy.generate_signals(df)
+    with span("signal"):
+        if checkpoint is not None:
+            if last_bar is None:
+                strategy.reset_state()
+            closes = df['close'].to_numpy(dtype=float)
+            for close in closes[:-1]:
+                strategy.update({'close': close})
+            if held_qty is not None:
+                # The broker position is what is actually held going into the newest bar
+                from checkpoint import reconcile_position
+                reconcile_position(strategy, held_qty)
+            # The newest bar may still be forming, so the checkpoint stops one bar short of it
+            covered = df.index[-2] if len(df) > 1 else last_bar
+            if covered is not None:
+                with span("checkpoint.save"):
+                    checkpoint.save(strategy, timeframe, covered)
+            row = strategy.update({'close': closes[-1]})
+            decision = {
+                "signal": row['target_position'],
+                "price": df['close'].iloc[-1],
+                "volatility": row.get('volatility', float('nan')),
+                "reason": row.get('signal_type', ''),
+            }
+        else:
+            signals = strategy.generate_signals(df)
     
-    # 3. Check latest signal
-    latest_signal = signals['target_position'].iloc[-1]
-    latest_price = df['close'].iloc[-1]
-    current_volatility = signals['volatility'].iloc[-1]
+            # 3. Check latest signal
+            decision = {
+                "signal": signals['target_position'].iloc[-1],
+                "price": df['close'].iloc[-1],
+                "volatility": signals['volatility'].iloc[-1],
+                "reason": signals['signal_type'].iloc[-1],
+            }
+            # Latest ATR etc. for sizers that need more than volatility
+            for name, values in strategy.sizer.prepare(df).items():
+                decision[name] = values[-1]
     
-    print(f"Latest Close Price: ${latest_price:.2f}")
-    print(f"Latest Signal (1=Long, 0=Cash): {latest_signal}")
-    print(f"Signal Reason: {signals['signal_type'].iloc[-1]}")
+    print(f"Latest Close Price: ${decision['price']:.2f}")
+    print(f"Latest Signal (1=Long, 0=Cash): {decision['signal']}")
+    print(f"Signal Reason: {decision['reason']}")
+    return decision
+
+def get_position_qty(trading_client, symbol):
+    """
+    Shares currently held in symbol (0 when there is no open position).
+    """
+    try:
+        return float(trading_client.get_open_position(symbol).qty)
+    except Exception:
+        return 0.0
+
+def get_held_symbols(trading_client):
+    """
+    Symbols with an open position.
+    """
+    try:
+        return [p.symbol for p in trading_client.get_all_positions()]
+    except Exception as e:
+        print(f"Error fetching positions: {e}")
+        return []
+
+def get_positions(trading_client):
+    """
+    ({symbol: qty}, {symbol: current price}) for every open position, from one API call.
+    """
+    from execution import book_from_positions
+    return book_from_positions(trading_client.get_all_positions())
+
+def execute_signal(trading_client, account, strategy, decision, risk=None):
+    """
+    Compares the decision with the open position and submits the order, if any,
+    after the risk checks (risk.RiskManager; default limits if None).
+    Returns the position quantity held before acting.
+    """
+    from alpaca.trading.requests import MarketOrderRequest
+    from alpaca.trading.enums import OrderSide, TimeInForce
+    from risk import RiskManager, symbols_opened_today
+    risk = risk or RiskManager()
+    symbol = strategy.symbol
+    latest_signal = decision["signal"]
+    latest_price = decision["price"]
+    current_volatility = decision["volatility"]
+    current_qty = 0
     
-    # 4. PDT Protection Check (Simplified)
-    # In a real bot, you would check trading_client.get_account().daytrade_count
-    # or track your own trades for the day.
+    # 4. Risk checks (position/exposure limits, daily loss limit, PDT) run on every order below
     
     try:
-        # Check current position
+        # Check current position; the whole book feeds the exposure and position caps
         try:
-            position = trading_client.get_open_position(symbol)
-            current_qty = float(position.qty)
-            print(f"Current Position: {current_qty} shares")
-        except:
-            current_qty = 0
-            print(f"Current Position: 0 shares")
+            positions, prices = get_positions(trading_client)
+        except Exception as e:
+            print(f"Error fetching positions: {e}")
+            positions, prices = {}, {}
+        current_qty = positions.get(symbol, 0)
+        prices[symbol] = latest_price
+        print(f"Current Position: {current_qty} shares")
         
         # Execution Logic
         if latest_signal == 1 and current_qty == 0:
@@ -129,34 +231,141 @@ def main():
             # Dynamic Position Sizing
             available_cash = float(account.cash)
             # Use the strategy's sizing logic
-            qty_to_buy = strategy.calculate_position_size(latest_price, available_cash, current_holdings=0, volatility=current_volatility)
+            with span("sizing"):
+                qty_to_buy = strategy.calculate_position_size(latest_price, available_cash, current_holdings=0,
+                                                             volatility=current_volatility, atr=decision.get("atr"))
+            with span("risk"):
+                approved, notes = risk.approve(account, {symbol: qty_to_buy}, positions, prices)
+            for note in notes:
+                print(f"Risk: {note}")
+            qty_to_buy = approved[symbol]
             
             if qty_to_buy > 0:
                 print(f"Placing Market Buy Order for {qty_to_buy} shares...")
                 order_data = MarketOrderRequest(symbol=symbol, qty=qty_to_buy, side=OrderSide.BUY, time_in_force=TimeInForce.DAY)
-                trading_client.submit_order(order_data)
+                order = trading_client.submit_order(order_data)
                 print("Buy Order Submitted.")
+                log_orders([{"symbol": symbol, "side": "buy", "qty": qty_to_buy, "order": order, "error": None}])
             else:
                 print("Calculated buy quantity is 0 (Insufficient funds?).")
             
         elif latest_signal == 0 and current_qty > 0:
             print("Signal says SELL.")
-            # Check for PDT rule roughly: did we buy today?
-            # A simple check is to see if position was entered today. 
-            # (Skipping complex PDT check implementation for now, assuming user manages day trades or has >25k)
+            # Closing a position bought today is a day trade (PDT rule, daytrade_count from the account)
+            with span("risk"):
+                opened_today = symbols_opened_today() if risk.pdt_restricted(account) else ()
+                approved, notes = risk.approve(account, {symbol: 0}, positions, prices, opened_today)
+            for note in notes:
+                print(f"Risk: {note}")
+            if approved[symbol] >= current_qty:
+                print("Sell deferred by risk checks.")
+                return current_qty
             
             print("Placing Market Sell Order...")
-            trading_client.close_position(symbol)
+            order = trading_client.close_position(symbol)
             print("Sell Order Submitted (Position Closed).")
+            log_orders([{"symbol": symbol, "side": "sell", "qty": current_qty, "order": order, "error": None}])
             
         else:
             print("No action required based on current position and signal.")
             
     except Exception as e:
         print(f"Error executing trade: {e}")
+
+    return current_qty
+
+def run_ensemble(trading_client, account, runner, decisions=None, risk=None):
+    """
+    Ensemble variant of compute_signal + execute_signal: evaluates every member on
+    every symbol and sends the netted orders. Returns the share targets.
+    """
+    print(f"\n--- Running ensemble of {len(runner.members)} strategies ({runner.mode}) "
+          f"on {len(runner.symbols)} symbols ---")
+    if decisions is None:
+        with span("signal"):
+            decisions = runner.evaluate(held=get_held_symbols(trading_client) if runner.screener else ())
+    if not decisions:
+        print("No data found for strategy calculation.")
+        return {}
+    with span("orders"):
+        targets, results = runner.execute(trading_client, account, decisions, risk=risk)
+    log_orders(results)
+    return targets
+
+def main(ensemble_config=None, timeframe=None, use_checkpoint=True, universe_file=None, top_n=10):
+    # Define path to credentials file
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    creds_path = os.path.join(current_dir, "paper_account_api_key.txt")
+    
+    trading_client, data_client = create_clients(creds_path)
+    if trading_client is None:
+        return
+
+    # Get Account Info
+    account = get_account_status(trading_client)
+    if account is None:
+        return
+
+    # timeframe may be given as text ("5Min"); parsing it loads alpaca-py, so only now
+    with span("imports"):
+        from resample import as_timeframe
+        from bar_store import BarStore
+    timeframe = as_timeframe(timeframe)
+    bar_store = BarStore(data_client, cache_dir=os.path.join(current_dir, "bar_cache"))
+    if ensemble_config:
+        from ensemble import EnsembleRunner
+        runner = EnsembleRunner.from_config(ensemble_config, bar_store, timeframe=timeframe)
+        targets = run_ensemble(trading_client, account, runner)
+        log_performance(account.portfolio_value, account.cash, account.buying_power, sum(targets.values()), "ENSEMBLE",
+                        targets)
+        return
+    if universe_file:
+        # Screen the universe and run Bollinger+RSI on the top N instead of a fixed symbol
+        from ensemble import EnsembleRunner
+        from screener import Screener, load_universe
+        runner = EnsembleRunner([{"name": "bbrsi", "strategy": "bbrsi"}], load_universe(universe_file), bar_store=bar_store,
+                                timeframe=timeframe, screener=Screener(top_n=top_n))
+        targets = run_ensemble(trading_client, account, runner)
+        log_performance(account.portfolio_value, account.cash, account.buying_power, sum(targets.values()), "SCREENED",
+                        targets)
+        return
+
+    # --- Strategy Execution ---
+    with span("imports"):
+        from strategy import BollingerRSIStrategy
+        from checkpoint import CHECKPOINT_FILE, StrategyCheckpoint
+    symbol = "AVGO"
+    strategy = BollingerRSIStrategy(symbol)
+    # Saved strategy state: only bars since the last run are fetched (use_checkpoint=False replays 100 days)
+    checkpoint = StrategyCheckpoint(os.path.join(current_dir, CHECKPOINT_FILE)) if use_checkpoint else None
+    decision = compute_signal(bar_store, strategy, timeframe=timeframe, checkpoint=checkpoint,
+                              held_qty=get_position_qty(trading_client, symbol))
+    if decision is None:
+        return
+    
+    current_qty = execute_signal(trading_client, account, strategy, decision)
         
     # 5. Log Performance
     log_performance(account.portfolio_value, account.cash, account.buying_power, current_qty, symbol)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Run one trading session")
+    parser.add_argument("--ensemble", metavar="CONFIG", help="Trade a strategy ensemble from this JSON configuration")
+    parser.add_argument("--timeframe", default="1Day", help="Bar size the strategy runs on: 1Min, 5Min, 15Min, 1Hour or 1Day")
+    parser.add_argument("--no-checkpoint", action="store_true",
+                        help="Ignore the saved strategy state and rebuild it from 100 days of bars")
+    parser.add_argument("--universe", metavar="FILE",
+                        help="Screen the symbols in this file (one per line) and trade the top ones")
+    parser.add_argument("--top", type=int, default=10, help="How many screened symbols to trade (with --universe)")
+    parser.add_argument("--metrics", metavar="FILE", default=os.environ.get("TRADING_METRICS"),
+                        help="Record per-stage latencies and add them to this file (see instrumentation.py)")
+    parser.add_argument("--profile", metavar="FILE", default=os.environ.get("TRADING_PROFILE"),
+                        help="Run under cProfile and write the stats to this file")
+    parser.add_argument("--metrics-host", default=os.environ.get("TRADING_METRICS_HOST"),
+                        help="Interface for the TRADING_METRICS_PORT endpoint (default 127.0.0.1; 0.0.0.0 for all)")
+    args = parser.parse_args()
+    from instrumentation import configure
+    configure(args.metrics, os.environ.get("TRADING_METRICS_PORT"), args.profile, args.metrics_host)
+    with span("run"):
+        main(args.ensemble, args.timeframe, use_checkpoint=not args.no_checkpoint, universe_file=args.universe,
+             top_n=args.top)
@@ -0,0 +1,221 @@
+from types import SimpleNamespace
+from bar_store import FakeStockDataClient, _to_utc
+import pandas as pd
+import threading
+import math
+import time
+import uuid
+
+class RateLimitError(Exception):
+    """
+    Stand-in for alpaca's APIError on HTTP 429 (exposes the same status_code attribute).
+    """
+    status_code = 429
+
+class MockTradingClient:
+    """
+    In-memory stand-in for the subset of TradingClient used by this project.
+
+    By default orders fill immediately and completely at prices[symbol]. latency
+    adds a sleep to every call (to mimic HTTP round trips), and rate_limit_every=N
+    makes every N-th submit_order / close_position call raise RateLimitError.
+    Values are returned as strings, like the real API models.
+
+    Fills can be delayed and split: an order first fills fill_latency seconds after
+    it was submitted, and each fill takes partial_fill of the remaining quantity
+    (at least one share), at the price current at that time; further fills need
+    the clock to move on by fill_latency again. The clock is wall time unless
+    set_time() drives it, as the replay driver does with bar timestamps.
+    end_of_day() expires what is left of DAY orders.
+    """
+
+    def __init__(self, cash=1000000.0, prices=None, positions=None, latency=0.0, rate_limit_every=None, daytrade_count=0,
+                 fill_latency=0.0, partial_fill=1.0):
+        self.cash = cash
+        self.prices = dict(prices or {})
+        self.positions = dict(positions or {})
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.daytrade_count = daytrade_count
+        self.fill_latency = fill_latency
+        self.partial_fill = partial_fill
+        self.last_equity = None
+        self.now = None
+        self.orders = []
+        # [order, signed qty left, time of the next possible fill, filled value]
+        self._open = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self, throttled=False):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            if throttled and self.rate_limit_every and self.calls % self.rate_limit_every == 0:
+                raise RateLimitError("rate limit exceeded")
+            if self._open:
+                self._process_fills()
+
+    # --- Simulation controls ---
+
+    def clock(self):
+        """
+        Current time in seconds: the simulated time when set, else wall time.
+        """
+        return self.now.timestamp() if self.now is not None else time.time()
+
+    def set_time(self, now, prices=None):
+        """
+        Moves the simulated clock (a datetime / Timestamp) and optionally updates
+        prices, then fills whatever open orders are due.
+        """
+        with self._lock:
+            self.now = pd.Timestamp(now)
+            if prices:
+                self.prices.update(prices)
+            self._process_fills()
+
+    def end_of_day(self):
+        """
+        Expires the unfilled part of open DAY orders and records today's closing
+        equity as last_equity (for the daily loss limit).
+        """
+        with self._lock:
+            for order, _, _, _ in self._open:
+                order.status = "expired" if float(order.filled_qty) == 0 else "partially_filled"
+            self._open = []
+            self.last_equity = self._equity()
+
+    def open_orders(self):
+        with self._lock:
+            return [entry[0] for entry in self._open]
+
+    def _equity(self):
+        return self.cash + sum(qty * self.prices.get(s, 0.0) for s, qty in self.positions.items())
+
+    def _position(self, symbol, qty):
+        price = self.prices.get(symbol, 0.0)
+        return SimpleNamespace(symbol=symbol, qty=str(qty), qty_available=str(qty), side="long",
+                               current_price=str(price), market_value=str(qty * price))
+
+    # --- TradingClient subset ---
+
+    def get_account(self):
+        self._call()
+        equity = self._equity()
+        last_equity = self.last_equity if self.last_equity is not None else equity
+        return SimpleNamespace(cash=str(self.cash), buying_power=str(self.cash), portfolio_value=str(equity),
+                               equity=str(equity), last_equity=str(last_equity), daytrade_count=self.daytrade_count,
+                               pattern_day_trader=False, trading_blocked=False)
+
+    def get_all_positions(self):
+        self._call()
+        with self._lock:
+            return [self._position(s, q) for s, q in self.positions.items() if q]
+
+    def get_open_position(self, symbol):
+        self._call()
+        with self._lock:
+            qty = self.positions.get(symbol, 0)
+        if not qty:
+            raise Exception(f"position does not exist: {symbol}")
+        return self._position(symbol, qty)
+
+    def submit_order(self, order_data):
+        self._call(throttled=True)
+        side = getattr(order_data.side, "value", order_data.side)
+        qty = float(order_data.qty)
+        return self._submit(order_data.symbol, qty if side == "buy" else -qty)
+
+    def close_position(self, symbol):
+        self._call(throttled=True)
+        with self._lock:
+            qty = self.positions.get(symbol, 0)
+        if not qty:
+            raise Exception(f"position does not exist: {symbol}")
+        return self._submit(symbol, -qty)
+
+    def get_order_by_id(self, order_id):
+        self._call()
+        with self._lock:
+            for order in self.orders:
+                if order.id == order_id:
+                    return order
+        raise Exception(f"order not found: {order_id}")
+
+    def _submit(self, symbol, signed_qty):
+        if symbol not in self.prices:
+            raise Exception(f"asset not tradable: {symbol}")
+        with self._lock:
+            if signed_qty < 0:
+                # Like Alpaca, shares already held for open sell orders cannot be sold again
+                pending = sum(-left for order, left, _, _ in self._open if order.symbol == symbol and left < 0)
+                available = self.positions.get(symbol, 0) - pending
+                if -signed_qty > available:
+                    raise Exception(f"insufficient qty available for order (requested: {-signed_qty:g}, "
+                                    f"available: {available:g})")
+            order = SimpleNamespace(id=str(uuid.uuid4()), symbol=symbol, qty=str(abs(signed_qty)), filled_qty="0",
+                                    side="buy" if signed_qty > 0 else "sell", filled_avg_price=None,
+                                    status="accepted", submitted_at=self.now)
+            self.orders.append(order)
+            self._open.append([order, signed_qty, self.clock() + self.fill_latency, 0.0])
+            self._process_fills()
+        return order
+
+    def _process_fills(self):
+        """
+        Fills the open orders that are due (caller holds the lock).
+        """
+        now = self.clock()
+        still_open = []
+        for entry in self._open:
+            order, left, due, value = entry
+            if now < due:
+                still_open.append(entry)
+                continue
+            qty = left
+            if self.partial_fill < 1.0 and abs(left) > 1:
+                qty = math.copysign(max(1.0, math.floor(abs(left) * self.partial_fill)), left)
+            price = self.prices[order.symbol]
+            self.cash -= qty * price
+            new_qty = self.positions.get(order.symbol, 0) + qty
+            if new_qty:
+                self.positions[order.symbol] = new_qty
+            else:
+                self.positions.pop(order.symbol, None)
+
+            filled = float(order.filled_qty) + abs(qty)
+            value += abs(qty) * price
+            left -= qty
+            order.filled_qty = str(filled)
+            order.filled_avg_price = str(value / filled)
+            if left:
+                order.status = "partially_filled"
+                # The next part fills once the clock has moved on
+                still_open.append([order, left, max(now + self.fill_latency, math.nextafter(now, math.inf)), value])
+            else:
+                order.status = "filled"
+        self._open = still_open
+
+class MockDataClient(FakeStockDataClient):
+    """
+    StockHistoricalDataClient stand-in serving bars from {symbol: DataFrame}, never
+    beyond its clock: with now set (e.g. by the replay driver), requests are cut
+    off at now so the live code cannot see future bars. latency sleeps per request.
+    """
+
+    def __init__(self, frames, now=None, latency=0.0):
+        super().__init__(frames)
+        self.now = now
+        self.latency = latency
+
+    def get_stock_bars(self, request_params):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.now is not None:
+            end = request_params.end
+            cutoff = _to_utc(self.now)
+            if end is None or _to_utc(end) > cutoff:
+                request_params = request_params.model_copy(update={"end": cutoff.to_pydatetime()})
+        return super().get_stock_bars(request_params)
@@ -0,0 +1,172 @@
+from alpaca.data.historical import StockHistoricalDataClient
+from alpaca.data.timeframe import TimeFrame
+from alpaca.data.enums import DataFeed
+from utils import load_alpaca_credentials
+from strategy import STRATEGIES
+from bar_store import BarStore
+from backtest import simulate
+from indicators import IndicatorCache
+from analytics import simple_returns, sharpe_ratio, max_drawdown
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import numpy as np
+import argparse
+import itertools
+import random
+import os
+from datetime import datetime, timedelta
+
+# Default search spaces (rsi_oversold is not used by the entry/exit rules, so it is not swept)
+DEFAULT_GRIDS = {
+    "bbrsi": {
+        "bb_window": [10, 15, 20, 25, 30],
+        "bb_std": [1.5, 2.0, 2.5],
+        "rsi_window": [7, 14, 21],
+        "rsi_overbought": [65, 70, 75, 80],
+    },
+    "sma": {
+        "short_window": [5, 10, 20, 30],
+        "long_window": [50, 100, 150, 200],
+    },
+}
+
+# Parameters that determine which rolling windows a configuration needs.
+# Configurations with the same values share one indicator cache in a worker.
+WINDOW_PARAMS = {
+    "bbrsi": ("bb_window", "rsi_window"),
+    "sma": ("short_window",),
+}
+
+def grid_configs(param_grid):
+    """
+    Every combination of the values in param_grid ({name: [values]}).
+    """
+    names = list(param_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[n] for n in names))]
+
+def random_configs(param_grid, n_samples, seed=None):
+    """
+    n_samples distinct configurations drawn uniformly from the grid.
+    """
+    configs = grid_configs(param_grid)
+    if n_samples >= len(configs):
+        return configs
+    return random.Random(seed).sample(configs, n_samples)
+
+def performance_stats(equity, initial_capital, periods_per_year=252):
+    """
+    Total return, annualized Sharpe and max drawdown of an equity curve
+    (see analytics.analyze for the full report).
+    """
+    values = np.asarray(equity, dtype=float)
+    return {
+        "total_return": values[-1] / initial_capital - 1 if len(values) else 0.0,
+        "sharpe": float(sharpe_ratio(simple_returns(values), periods_per_year)),
+        "max_drawdown": float(max_drawdown(values)),
+    }
+
+def evaluate_configs(df, configs, strategy_name="bbrsi", symbol=None, initial_capital=1000000.0,
+                     indicator_cache=None, history=None):
+    """
+    Backtests each configuration on df and returns one stats dict per configuration.
+    indicator_cache (an IndicatorCache) memoizes the rolling windows shared between
+    configurations. If df is a contiguous slice of history, indicators are computed on
+    the full history and sliced, so the slice starts with warmed-up windows and a
+    cache shared across slices computes each window only once.
+    """
+    strategy_cls = STRATEGIES[strategy_name]
+    cache = indicator_cache if indicator_cache is not None else IndicatorCache()
+    source = df if history is None else history
+    close = source['close'].to_numpy()
+    offset = 0 if history is None else history.index.get_loc(df.index[0])
+    rows = []
+    for params in configs:
+        strategy = strategy_cls(symbol, **params)
+        indicators = {k: v[offset:offset + len(df)] for k, v in strategy.compute_indicators(close, cache).items()}
+        signals = strategy.generate_signals(df, indicators=indicators)
+        result = simulate(df, signals, strategy, initial_capital, details=True)
+        row = dict(params)
+        row.update(performance_stats(result['equity'], initial_capital))
+        # Filled round trips (plus a position still open), as in analytics.analyze_simulation;
+        # target changes would count each round trip twice and include unfilled entries
+        row["trades"] = len(result['trades'])
+        rows.append(row)
+    return rows
+
+def _evaluate_group(job):
+    """
+    Worker: evaluates configurations that share the same rolling windows, reusing
+    one indicator cache for all of them.
+    """
+    strategy_name, symbol, df, configs, initial_capital = job
+    return evaluate_configs(df, configs, strategy_name, symbol, initial_capital)
+
+def optimize(df, configs, strategy_name="bbrsi", symbol=None, initial_capital=1000000.0, max_workers=None, rank_by="sharpe"):
+    """
+    Evaluates every configuration on df and returns a DataFrame ranked by rank_by.
+    Work is split by rolling-window group and fanned out across a process pool.
+    """
+    keys = WINDOW_PARAMS[strategy_name]
+    groups = {}
+    for params in configs:
+        groups.setdefault(tuple(params.get(k) for k in keys), []).append(params)
+
+    # Split large groups so every core gets work even when few window sizes are swept
+    workers = max_workers or os.cpu_count() or 1
+    chunk = max(1, -(-len(configs) // (workers * 4)))
+    jobs = []
+    for group in groups.values():
+        for i in range(0, len(group), chunk):
+            jobs.append((strategy_name, symbol, df, group[i:i + chunk], initial_capital))
+
+    rows = []
+    if workers == 1 or len(jobs) == 1:
+        for job in jobs:
+            rows.extend(_evaluate_group(job))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(_evaluate_group, jobs):
+                rows.extend(result)
+
+    results = pd.DataFrame(rows)
+    return results.sort_values(rank_by, ascending=False).reset_index(drop=True)
+
+def run_optimizer(symbol="AVGO", strategy_name="bbrsi", days=365, n_random=None, seed=None, offline=False,
+                  max_workers=None, output_csv="optimization_results.csv"):
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    data_client = None
+    if not offline:
+        creds = load_alpaca_credentials(os.path.join(current_dir, "paper_account_api_key.txt"))
+        data_client = StockHistoricalDataClient(creds["api_key"], creds["secret_key"])
+    bar_store = BarStore(data_client, cache_dir=os.path.join(current_dir, "bar_cache"), offline=offline)
+
+    end_time = datetime.now() - timedelta(minutes=16)
+    start_time = end_time - timedelta(days=days)
+    df = bar_store.get_bars(symbol, start_time, end_time, timeframe=TimeFrame.Day, feed=DataFeed.IEX)
+    if df.empty:
+        print("No data found for the specified period.")
+        return None
+
+    grid = DEFAULT_GRIDS[strategy_name]
+    configs = random_configs(grid, n_random, seed) if n_random else grid_configs(grid)
+    print(f"Evaluating {len(configs)} configurations of {strategy_name} on {len(df)} bars for {symbol}...")
+    results = optimize(df, configs, strategy_name, symbol, max_workers=max_workers)
+
+    results.to_csv(output_csv, index=False)
+    print("\n--- Top 10 Configurations ---")
+    print(results.head(10).to_string(index=False))
+    print(f"\nFull results saved to {output_csv}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grid / random search over strategy parameters")
+    parser.add_argument("--symbol", default="AVGO")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="bbrsi")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--random", type=int, default=None, help="Sample this many configurations instead of the full grid")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument("--offline", action="store_true", help="Use only cached bars, no network access")
+    parser.add_argument("--output", default="optimization_results.csv")
+    args = parser.parse_args()
+    run_optimizer(args.symbol, args.strategy, args.days, args.random, args.seed, args.offline, args.workers, args.output)
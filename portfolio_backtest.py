@@ -0,0 +1,151 @@
+from alpaca.data.historical import StockHistoricalDataClient
+from alpaca.data.timeframe import TimeFrame
+from alpaca.data.enums import DataFeed
+from utils import load_alpaca_credentials
+from strategy import BollingerRSIStrategy
+from bar_store import BarStore
+from analytics import analyze
+from screener import load_universe
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import numpy as np
+import argparse
+import os
+from datetime import datetime, timedelta
+
+def _signals_for_symbol(job):
+    """
+    Worker entry point (must be top-level so it can be pickled).
+    """
+    symbol, df, strategy_cls, strategy_kwargs = job
+    strategy = strategy_cls(symbol, **strategy_kwargs)
+    signals = strategy.generate_signals(df)
+    return symbol, signals[['target_position', 'volatility']]
+
+def generate_universe_signals(frames, strategy_cls=BollingerRSIStrategy, strategy_kwargs=None, max_workers=None):
+    """
+    Runs generate_signals for every symbol across a process pool.
+    Returns {symbol: signals DataFrame}.
+    """
+    strategy_kwargs = strategy_kwargs or {}
+    jobs = [(symbol, df, strategy_cls, strategy_kwargs) for symbol, df in frames.items() if not df.empty]
+    if max_workers == 1 or len(jobs) <= 1:
+        return dict(map(_signals_for_symbol, jobs))
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return dict(pool.map(_signals_for_symbol, jobs, chunksize=max(1, len(jobs) // 64)))
+
+def simulate_portfolio(frames, signals, strategy, initial_capital=1000000.0):
+    """
+    Simulates one shared cash account over many symbols.
+    Each bar: exits are filled first (releasing cash), then new entries are sized with
+    strategy.calculate_position_size against an equal share of current portfolio value,
+    capped by the cash actually available. All entries of a bar are sized in one
+    vectorized call; only entries that find less cash than their share are re-sized.
+    """
+    symbols = [s for s in frames if s in signals]
+    close = pd.DataFrame({s: frames[s]['close'] for s in symbols}).sort_index()
+    index = close.index
+    # Carry the last price over bars where a symbol did not trade (for valuation only)
+    price = close.ffill().to_numpy(dtype=float)
+    tradable = ~np.isnan(close.to_numpy(dtype=float))
+    target = pd.DataFrame({s: signals[s]['target_position'] for s in symbols}).reindex(index).to_numpy(dtype=float)
+    vol = pd.DataFrame({s: signals[s]['volatility'] for s in symbols}).reindex(index).to_numpy(dtype=float)
+    # ATR per symbol when the strategy's sizer uses it
+    extras = {s: strategy.sizer.prepare(frames[s]) for s in symbols}
+    atr = None
+    if any("atr" in e for e in extras.values()):
+        atr = pd.DataFrame({s: pd.Series(extras[s].get("atr", np.nan), index=frames[s].index) for s in symbols})
+        atr = atr.reindex(index).to_numpy(dtype=float)
+
+    n_symbols = len(symbols)
+    cash = initial_capital
+    holdings = np.zeros(n_symbols)
+    equity = np.empty(len(index))
+    trades = 0
+
+    for t in range(len(index)):
+        px = price[t]
+        valued = np.where(np.isnan(px), 0.0, px)
+
+        exits = np.flatnonzero(tradable[t] & (target[t] == 0) & (holdings > 0))
+        if len(exits):
+            cash += float(np.dot(holdings[exits], px[exits]))
+            holdings[exits] = 0
+            trades += len(exits)
+
+        entries = np.flatnonzero(tradable[t] & (target[t] == 1) & (holdings == 0))
+        if len(entries):
+            sleeve = (cash + float(np.dot(holdings, valued))) / n_symbols
+            entry_atr = atr[t, entries] if atr is not None else None
+            sizes = strategy.calculate_position_size(px[entries], sleeve, volatility=vol[t, entries], atr=entry_atr)
+            for k, j in enumerate(entries):
+                shares = sizes[k]
+                if cash < sleeve:
+                    shares = strategy.calculate_position_size(px[j], cash, volatility=vol[t, j],
+                                                              atr=entry_atr[k] if atr is not None else None)
+                cost = shares * px[j]
+                if shares > 0 and cost <= cash:
+                    holdings[j] = shares
+                    cash -= cost
+                    trades += 1
+
+        equity[t] = cash + float(np.dot(holdings, valued))
+
+    return {
+        'equity': pd.Series(equity, index=index),
+        'holdings': dict(zip(symbols, holdings)),
+        'cash': cash,
+        'trades': trades,
+    }
+
+def run_portfolio_backtest(symbols, days=365, initial_capital=1000000.0, offline=False, max_workers=None, bar_store=None):
+    # 1. Load bars for the whole universe (one batched request for the missing range)
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if bar_store is None:
+        data_client = None
+        if not offline:
+            creds = load_alpaca_credentials(os.path.join(current_dir, "paper_account_api_key.txt"))
+            data_client = StockHistoricalDataClient(creds["api_key"], creds["secret_key"])
+        bar_store = BarStore(data_client, cache_dir=os.path.join(current_dir, "bar_cache"), offline=offline)
+
+    end_time = datetime.now() - timedelta(minutes=16)
+    start_time = end_time - timedelta(days=days)
+    print(f"Fetching historical data for {len(symbols)} symbols...")
+    frames = bar_store.get_many(symbols, start_time, end_time, timeframe=TimeFrame.Day, feed=DataFeed.IEX)
+    frames = {s: df for s, df in frames.items() if not df.empty}
+    if not frames:
+        print("No data found for the specified period.")
+        return None
+
+    # 2. Signals per symbol in parallel
+    print(f"Generating signals for {len(frames)} symbols...")
+    signals = generate_universe_signals(frames, max_workers=max_workers)
+
+    # 3. Shared-cash simulation
+    result = simulate_portfolio(frames, signals, BollingerRSIStrategy(None), initial_capital)
+    equity = result['equity']
+
+    print(f"\n--- Portfolio Backtest Results (Capital: ${initial_capital:,.0f}) ---")
+    print(f"Period: {start_time.date()} to {end_time.date()}")
+    print(f"Symbols: {len(frames)} | Trades: {result['trades']}")
+    print(f"Strategy Total Return: {(equity.iloc[-1] / initial_capital - 1)*100:.2f}%")
+    print(f"Final Portfolio Value: ${equity.iloc[-1]:,.2f}")
+    result['report'] = analyze(equity.to_numpy(), initial_capital=initial_capital)
+    print(f"Sharpe: {result['report']['sharpe']:.2f} | Sortino: {result['report']['sortino']:.2f} | "
+          f"Max Drawdown: {result['report']['max_drawdown']*100:.2f}% "
+          f"({result['report']['max_drawdown_duration']} bars)")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the Bollinger+RSI strategy on a universe of symbols")
+    parser.add_argument("--symbols", nargs="*", default=["AVGO"], help="Symbols to include")
+    parser.add_argument("--universe-file", help="Text file with one symbol per line")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument("--offline", action="store_true", help="Use only cached bars, no network access")
+    args = parser.parse_args()
+
+    universe = list(args.symbols)
+    if args.universe_file:
+        universe = load_universe(args.universe_file)
+    run_portfolio_backtest(universe, days=args.days, offline=args.offline, max_workers=args.workers)
@@ -0,0 +1,151 @@
+"""
+Builds higher-timeframe bars from 1-minute bars.
+
+Bars are bucketed in New York time and anchored to the session open, so 5-minute
+bars start at 9:30, 9:35, ... and hourly bars at 9:30, 10:30, ... 15:30 (a
+30-minute last bar), matching how the strategy sees a trading day. Daily bars are
+labelled at midnight New York time, like Alpaca's daily bars. Minutes outside the
+session are dropped; early closes simply produce fewer buckets.
+
+Aggregation runs on sorted NumPy arrays with ufunc.reduceat over group
+boundaries (one pass per column, no pandas groupby).
+"""
+from alpaca.data.timeframe import TimeFrame, TimeFrameUnit
+import pandas as pd
+import numpy as np
+
+NY_TZ = "America/New_York"
+# Minutes after midnight, New York time
+REGULAR_SESSION = (9 * 60 + 30, 16 * 60)
+EXTENDED_SESSION = (4 * 60, 20 * 60)
+
+NS_PER_MINUTE = 60 * 10**9
+NS_PER_DAY = 24 * 60 * NS_PER_MINUTE
+
+PRICE_COLUMNS = ("open", "high", "low", "close", "vwap")
+
+def parse_timeframe(text):
+    """
+    "1Min", "5Min", "1Hour", "1Day" (case-insensitive; "5m", "1h", "1d" also work) -> TimeFrame.
+    """
+    value = text.strip().lower()
+    units = (("min", TimeFrameUnit.Minute), ("m", TimeFrameUnit.Minute), ("hour", TimeFrameUnit.Hour),
+             ("h", TimeFrameUnit.Hour), ("day", TimeFrameUnit.Day), ("d", TimeFrameUnit.Day))
+    for suffix, unit in units:
+        if value.endswith(suffix) and value[:-len(suffix)].isdigit():
+            return TimeFrame(int(value[:-len(suffix)]), unit)
+    raise ValueError(f"Unsupported timeframe '{text}' (use e.g. 1Min, 5Min, 1Hour, 1Day)")
+
+def as_timeframe(value, default="1Day"):
+    """
+    TimeFrame from a TimeFrame, timeframe text, or None (the default).
+    """
+    if value is None:
+        value = default
+    return parse_timeframe(value) if isinstance(value, str) else value
+
+def is_minute_bars(timeframe):
+    return timeframe.value == TimeFrame.Minute.value
+
+def is_intraday(timeframe):
+    return timeframe.unit in (TimeFrameUnit.Minute, TimeFrameUnit.Hour)
+
+def bucket_minutes(timeframe):
+    if timeframe.unit == TimeFrameUnit.Minute:
+        return timeframe.amount
+    if timeframe.unit == TimeFrameUnit.Hour:
+        return timeframe.amount * 60
+    if timeframe.unit == TimeFrameUnit.Day and timeframe.amount == 1:
+        return None
+    raise ValueError(f"Cannot resample minute bars to {timeframe.value}")
+
+def resample_bars(df, timeframe, session=REGULAR_SESSION):
+    """
+    Aggregates 1-minute bars (UTC index, Alpaca columns) to timeframe.
+    session is a (start, end) pair of minutes after midnight New York time, or None
+    to keep every minute (buckets are then anchored at midnight).
+    """
+    n_minutes = bucket_minutes(timeframe)
+    if df.empty:
+        return df.copy()
+
+    # Local wall-clock nanoseconds, so day and minute arithmetic follows New York time
+    index = df.index if df.index.tz is not None else df.index.tz_localize("UTC")
+    local = index.tz_convert(NY_TZ).tz_localize(None).as_unit("ns").asi8
+    day = local // NS_PER_DAY
+    minute = (local - day * NS_PER_DAY) // NS_PER_MINUTE
+
+    anchor = session[0] if session else 0
+    keep = (minute >= session[0]) & (minute < session[1]) if session else np.ones(len(df), dtype=bool)
+    if not keep.all():
+        df, local, day, minute = df[keep], local[keep], day[keep], minute[keep]
+        if df.empty:
+            return df.copy()
+
+    if n_minutes is None:
+        labels = day * NS_PER_DAY
+    else:
+        bucket = (minute - anchor) // n_minutes
+        labels = day * NS_PER_DAY + (anchor + bucket * n_minutes) * NS_PER_MINUTE
+
+    # Sorted input makes every bucket one contiguous run
+    if len(labels) > 1 and (np.diff(labels) < 0).any():
+        order = np.argsort(labels, kind="stable")
+        df, labels = df.iloc[order], labels[order]
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(labels)) + 1))
+    ends = np.concatenate((starts[1:], [len(labels)])) - 1
+
+    out = {}
+    columns = df.columns
+    if "open" in columns:
+        out["open"] = df["open"].to_numpy()[starts]
+    if "high" in columns:
+        out["high"] = np.maximum.reduceat(df["high"].to_numpy(), starts)
+    if "low" in columns:
+        out["low"] = np.minimum.reduceat(df["low"].to_numpy(), starts)
+    if "close" in columns:
+        out["close"] = df["close"].to_numpy()[ends]
+    volume = None
+    if "volume" in columns:
+        volume = np.add.reduceat(df["volume"].to_numpy(dtype=np.float64), starts)
+        out["volume"] = _sum_dtype(volume, df["volume"].dtype)
+    if "trade_count" in columns:
+        counts = np.add.reduceat(df["trade_count"].to_numpy(dtype=np.float64), starts)
+        out["trade_count"] = _sum_dtype(counts, df["trade_count"].dtype)
+    if "vwap" in columns:
+        if volume is not None:
+            weighted = np.add.reduceat(df["vwap"].to_numpy(dtype=np.float64) * df["volume"].to_numpy(dtype=np.float64), starts)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                vwap = np.where(volume > 0, weighted / volume, df["close"].to_numpy(dtype=np.float64)[ends])
+        else:
+            vwap = df["vwap"].to_numpy()[ends]
+        out["vwap"] = vwap.astype(df["vwap"].dtype, copy=False)
+
+    label_index = pd.DatetimeIndex(labels[starts].astype("datetime64[ns]"))
+    label_index = label_index.tz_localize(NY_TZ, ambiguous="NaT", nonexistent="shift_forward").tz_convert("UTC")
+    label_index = label_index.as_unit(index.unit)
+    result = pd.DataFrame(out, index=label_index.rename("timestamp"), columns=[c for c in columns if c in out])
+    return result.loc[~result.index.isna()]
+
+def _sum_dtype(sums, dtype):
+    # Sums of compact integer columns can overflow uint32, so widen them
+    return sums.astype(np.int64) if np.issubdtype(dtype, np.integer) else sums
+
+def compact_bars(df):
+    """
+    Downcasts bars for storage: prices to float32, trade counts to uint32, volume to
+    uint32 when it fits (otherwise int64). Roughly halves the memory of minute bars.
+    The price downcast is lossy (about 7 significant digits, e.g. 1234.5678 is stored as
+    1234.567749); the integer casts only happen when they are exact.
+    """
+    out = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if col in PRICE_COLUMNS:
+            values = values.astype(np.float32)
+        elif col in ("volume", "trade_count") and len(values) and np.all(np.isfinite(values)):
+            rounded = np.round(values)
+            if (rounded == values).all() and values.min() >= 0:
+                values = rounded.astype(np.uint32 if values.max() < 2**32 else np.int64)
+        out[col] = values
+    return pd.DataFrame(out, index=df.index, columns=df.columns)
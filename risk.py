@@ -0,0 +1,199 @@
+"""
+Risk controls for live trading and backtests.
+
+Live: RiskManager.approve() takes the share targets a strategy (or the ensemble)
+wants and returns the targets that pass the account-level limits: daily loss
+limit, per-position and gross exposure caps, per-order notional cap and the
+pattern day trader rule. It only ever holds back increases in risk, except
+that the PDT rule also holds back same-day exits.
+
+Backtest: StopModel.apply() adds stop-loss / take-profit exits to a long/flat
+target series using bar highs and lows. It is vectorized over the whole series
+(segment bookkeeping with cumulative maxima), and the fills it returns are fed
+to simulator.simulate_arrays through exit_prices.
+"""
+import numpy as np
+import math
+
+PDT_EQUITY_THRESHOLD = 25000.0
+# A fourth day trade within five business days flags an account under the threshold
+PDT_MAX_DAY_TRADES = 3
+
+class RiskLimits:
+    """
+    Account-level limits. Fractions are of current equity; None disables a limit.
+    """
+    def __init__(self, max_position_pct=1.0, max_gross_exposure=1.0, max_order_value=None,
+                 daily_loss_limit=None, enforce_pdt=True):
+        self.max_position_pct = max_position_pct
+        self.max_gross_exposure = max_gross_exposure
+        self.max_order_value = max_order_value
+        self.daily_loss_limit = daily_loss_limit
+        self.enforce_pdt = enforce_pdt
+
+def _account_float(account, name, default=0.0):
+    value = getattr(account, name, None)
+    return float(value) if value not in (None, "") else default
+
+class RiskManager:
+    """
+    Pre-trade checks applied to share targets before any order is sent.
+    """
+
+    def __init__(self, limits=None):
+        self.limits = limits or RiskLimits()
+
+    def pdt_restricted(self, account):
+        """
+        True when one more day trade would get the account flagged as a pattern day trader.
+        """
+        equity = _account_float(account, "equity", _account_float(account, "portfolio_value"))
+        day_trades = int(_account_float(account, "daytrade_count"))
+        return self.limits.enforce_pdt and equity < PDT_EQUITY_THRESHOLD and day_trades >= PDT_MAX_DAY_TRADES
+
+    def approve(self, account, targets, positions, prices, opened_today=()):
+        """
+        targets / positions: {symbol: qty}; prices: {symbol: latest price};
+        opened_today: symbols bought today (closing them would be a day trade).
+        Returns (approved targets, list of messages about what was held back).
+        """
+        limits = self.limits
+        equity = _account_float(account, "equity", _account_float(account, "portfolio_value"))
+        approved = dict(targets)
+        notes = []
+
+        # 1. Daily loss limit: no new exposure once today's loss reaches the limit
+        last_equity = _account_float(account, "last_equity")
+        if limits.daily_loss_limit is not None and last_equity > 0 and equity / last_equity - 1 <= -limits.daily_loss_limit:
+            for symbol, target in approved.items():
+                held = positions.get(symbol, 0)
+                if target > held:
+                    approved[symbol] = held
+                    notes.append(f"{symbol}: buy blocked, daily loss {equity / last_equity - 1:.2%} "
+                                 f"beyond limit {limits.daily_loss_limit:.2%}")
+
+        # 2. Per-position cap (existing larger positions are kept, not grown)
+        if limits.max_position_pct is not None:
+            for symbol, target in approved.items():
+                held = positions.get(symbol, 0)
+                cap = math.floor(limits.max_position_pct * equity / prices[symbol]) if prices.get(symbol) else held
+                if target > max(cap, held):
+                    approved[symbol] = max(cap, held)
+                    notes.append(f"{symbol}: target {target} capped at {approved[symbol]} "
+                                 f"({limits.max_position_pct:.0%} of equity)")
+
+        # 3. Per-order notional cap
+        if limits.max_order_value is not None:
+            for symbol, target in approved.items():
+                held = positions.get(symbol, 0)
+                step = math.floor(limits.max_order_value / prices[symbol]) if prices.get(symbol) else 0
+                if target - held > step:
+                    approved[symbol] = held + step
+                    notes.append(f"{symbol}: order capped at {step} shares (${limits.max_order_value:,.0f})")
+
+        # 4. Gross exposure: scale all increases down together
+        if limits.max_gross_exposure is not None:
+            held_value = sum(abs(q) * prices.get(s, 0.0) for s, q in positions.items() if s not in approved)
+            gross = held_value + sum(abs(t) * prices.get(s, 0.0) for s, t in approved.items())
+            excess = gross - limits.max_gross_exposure * equity
+            increases = {s: t - positions.get(s, 0) for s, t in approved.items() if t > positions.get(s, 0)}
+            added = sum(q * prices.get(s, 0.0) for s, q in increases.items())
+            if excess > 0 and added > 0:
+                factor = max(0.0, 1.0 - excess / added)
+                for symbol, increase in increases.items():
+                    approved[symbol] = positions.get(symbol, 0) + math.floor(increase * factor)
+                notes.append(f"buys scaled by {factor:.2f} to keep gross exposure within "
+                             f"{limits.max_gross_exposure:.0%} of equity")
+
+        # 5. Pattern day trader rule: do not close positions opened today
+        if self.pdt_restricted(account):
+            for symbol, target in approved.items():
+                held = positions.get(symbol, 0)
+                if symbol in opened_today and target < held:
+                    approved[symbol] = held
+                    notes.append(f"{symbol}: exit deferred, would be a day trade "
+                                 f"({int(_account_float(account, 'daytrade_count'))} in the last 5 days, "
+                                 f"equity below ${PDT_EQUITY_THRESHOLD:,.0f})")
+        return approved, notes
+
+def symbols_opened_today(journal_path=None, now=None):
+    """
+    Symbols with a buy order recorded in the performance journal since midnight New York time.
+    """
+    import pandas as pd
+    from journal import JOURNAL_FILE, Journal, now_utc
+    import os
+    journal_path = journal_path or JOURNAL_FILE
+    if not os.path.exists(journal_path):
+        return set()
+    now = pd.Timestamp(now) if now is not None else pd.Timestamp(now_utc())
+    now = now.tz_localize("UTC") if now.tzinfo is None else now
+    midnight = now.tz_convert("America/New_York").normalize()
+    with Journal(journal_path) as journal:
+        orders = journal.orders(start=midnight)
+    filled = orders[(orders["side"] == "buy") & (orders["status"] != "rejected")]
+    return set(filled["symbol"])
+
+class StopModel:
+    """
+    Stop-loss and take-profit levels as fractions of the entry price (None disables one).
+    Levels are checked against each bar's low/high. A bar that opens beyond a level
+    fills at the open; a bar touching both levels intrabar is assumed to hit the stop first.
+    """
+    def __init__(self, stop_loss=None, take_profit=None):
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+
+    def apply(self, target, open_, high, low, close, initial=0.0):
+        """
+        Applies the stops to a long/flat target series (1 = long, entered at the
+        close of the bar where the target turns 1). A stopped position stays flat
+        until the strategy exits and enters again.
+        Returns (target, exit_prices): the adjusted targets and an array holding the
+        stop fill price on stop bars, NaN elsewhere.
+        """
+        target = np.asarray(target, dtype=float)
+        close = np.asarray(close, dtype=float)
+        n = len(target)
+        exit_prices = np.full(n, np.nan)
+        if n == 0 or (self.stop_loss is None and self.take_profit is None):
+            return target, exit_prices
+        open_ = np.asarray(open_, dtype=float)
+        high = np.asarray(high, dtype=float)
+        low = np.asarray(low, dtype=float)
+
+        # --- 1. Holding segments: bars held into, and the entry bar of each ---
+        bars = np.arange(n)
+        previous = np.concatenate(([initial], target[:-1]))
+        entries = (target == 1) & (previous != 1)
+        held = previous == 1
+        entry_bar = np.maximum.accumulate(np.where(entries, bars, -1))
+        # Positions carried in from before the series use the first close
+        entry_price = np.where(entry_bar >= 0, close[np.maximum(entry_bar, 0)], close[0])
+
+        # --- 2. Stop / target touches on held bars ---
+        stop_level = entry_price * (1 - self.stop_loss) if self.stop_loss is not None else np.full(n, -np.inf)
+        take_level = entry_price * (1 + self.take_profit) if self.take_profit is not None else np.full(n, np.inf)
+        # An open beyond a level decides the bar; otherwise the stop is assumed to come first
+        gap_up = held & (open_ >= take_level)
+        stop_hit = held & (low <= stop_level) & ~gap_up
+        take_hit = held & (high >= take_level) & ~stop_hit
+        hit = stop_hit | take_hit
+
+        # --- 3. First touch per segment (segments keyed by entry bar, 0 = carried in) ---
+        hit_bars = np.flatnonzero(hit)
+        if not len(hit_bars):
+            return target, exit_prices
+        key = entry_bar + 1
+        _, first = np.unique(key[hit_bars], return_index=True)
+        first_hits = hit_bars[first]
+        first_by_key = np.full(n + 1, n)
+        first_by_key[key[first_hits]] = first_hits
+        first_touch = first_by_key[key]
+
+        stopped = (bars >= first_touch) & (target == 1)
+        new_target = np.where(stopped, 0.0, target)
+
+        fills = np.where(stop_hit, np.minimum(open_, stop_level), np.maximum(open_, take_level))
+        exit_prices[first_hits] = fills[first_hits]
+        return new_target, exit_prices
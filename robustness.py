@@ -0,0 +1,251 @@
+"""
+Monte Carlo / bootstrap robustness of a BollingerRSIStrategy backtest.
+
+One backtest is one equity path. This module builds thousands of alternative
+paths as (paths x bars) matrices and reports confidence intervals of the total
+return, max drawdown, Sharpe ratio and CAGR across them. Methods:
+
+    prices   block bootstrap of the asset's log returns into synthetic price
+             histories; the strategy is re-run on every path (path_signals
+             computes the indicators of all paths at once) and simulated
+    history  the real prices, varying only the execution (below)
+    returns  block bootstrap of the backtest's own bar returns (no re-simulation)
+
+With prices and history, execution is randomized too: every entry and exit is
+acted on 0..max_delay bars late, and every fill pays a random slippage
+(normal around slippage_bps with slippage_jitter_bps, never negative).
+
+Paths are generated and simulated (simulator.simulate_paths) in chunks of
+CHUNK_PATHS, which fan out to a process pool. Each chunk has its own seed from
+the run's seed, so results do not depend on the number of workers.
+"""
+from strategy import BollingerRSIStrategy
+from simulator import simulate_arrays, simulate_paths
+from analytics import simple_returns, sharpe_ratio, max_drawdown, cagr, print_report, write_report
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import argparse
+import time
+import os
+
+METHODS = ("prices", "history", "returns")
+
+CHUNK_PATHS = 1000
+
+def block_bootstrap_indices(n, n_paths, block, rng):
+    """
+    (n_paths x n) indices into a series of length n: random blocks of `block`
+    consecutive bars (wrapping around the end), which keeps short-range
+    autocorrelation such as volatility clusters.
+    """
+    block = max(1, min(block, n))
+    blocks = -(-n // block)
+    starts = rng.integers(0, n, size=(n_paths, blocks))
+    idx = (starts[:, :, None] + np.arange(block)) % n
+    return idx.reshape(n_paths, -1)[:, :n]
+
+def bootstrap_prices(close, n_paths, block, rng):
+    """
+    Synthetic (n_paths x bars) price paths from block-bootstrapped log returns, all
+    starting at close[0].
+    """
+    close = np.asarray(close, dtype=float)
+    log_returns = np.diff(np.log(close))
+    sampled = log_returns[block_bootstrap_indices(len(log_returns), n_paths, block, rng)]
+    paths = np.empty((n_paths, len(close)))
+    paths[:, 0] = close[0]
+    paths[:, 1:] = close[0] * np.exp(np.cumsum(sampled, axis=1))
+    return paths
+
+def bootstrap_equity(equity, n_paths, block, rng):
+    """
+    (n_paths x bars) equity paths from block-bootstrapped bar returns of one equity curve.
+    """
+    equity = np.asarray(equity, dtype=float)
+    returns = simple_returns(equity)
+    sampled = returns[block_bootstrap_indices(len(returns), n_paths, block, rng)]
+    paths = np.empty((n_paths, len(equity)))
+    paths[:, 0] = equity[0]
+    paths[:, 1:] = equity[0] * np.cumprod(1 + sampled, axis=1)
+    return paths
+
+def delay_signals(target, max_delay, rng):
+    """
+    Target matrix (paths x bars) with each entry and exit moved 0..max_delay bars
+    later, independently per trade. Events keep their order; a trade whose exit
+    catches up with its entry disappears, and events pushed past the last bar never happen.
+    """
+    target = np.asarray(target, dtype=float)
+    if max_delay <= 0:
+        return target
+    paths, n = target.shape
+    change = np.diff(target, axis=1, prepend=0.0)
+    path, bar = np.nonzero(change)
+    moved = bar + rng.integers(0, max_delay + 1, size=len(bar))
+    # Running max within each path (offset per path so one global accumulate does it)
+    offset = path * (n + max_delay + 1)
+    moved = np.maximum.accumulate(moved + offset) - offset
+    delta = np.zeros((paths, n + 1))
+    np.add.at(delta, (path, np.minimum(moved, n)), change[path, bar])
+    return np.cumsum(delta[:, :n], axis=1)
+
+def random_slippage(shape, bps, jitter_bps, rng):
+    """
+    Slippage in bps for a fill on each bar of each path, or None if both are 0.
+    """
+    if not bps and not jitter_bps:
+        return None
+    return np.maximum(rng.normal(bps, jitter_bps, size=shape), 0.0)
+
+def path_metrics(equity, initial_capital, periods_per_year=252):
+    """
+    Per-path total_return, max_drawdown, sharpe and cagr of an equity matrix.
+    """
+    return {
+        "total_return": equity[:, -1] / initial_capital - 1,
+        "max_drawdown": max_drawdown(equity),
+        "sharpe": sharpe_ratio(simple_returns(equity), periods_per_year),
+        "cagr": cagr(equity, periods_per_year, initial_capital),
+    }
+
+def _run_chunk(job):
+    """
+    Worker: generates and scores one chunk of paths.
+    """
+    (method, close, base_target, base_volatility, base_equity, params, n_paths, seed, block,
+     max_delay, slippage_bps, slippage_jitter_bps, initial_capital, periods_per_year) = job
+    rng = np.random.default_rng(seed)
+    if method == "returns":
+        equity = bootstrap_equity(base_equity, n_paths, block, rng)
+        return path_metrics(equity, initial_capital, periods_per_year)
+
+    strategy = BollingerRSIStrategy(None, **params)
+    if method == "prices":
+        prices = bootstrap_prices(close, n_paths, block, rng)
+        target, volatility = strategy.path_signals(prices.T)
+        target, volatility = target.T, volatility.T
+    else:
+        prices = np.broadcast_to(close, (n_paths, len(close)))
+        target = np.broadcast_to(base_target, prices.shape)
+        volatility = np.broadcast_to(base_volatility, prices.shape)
+    target = delay_signals(target, max_delay, rng)
+    slippage = random_slippage(prices.shape, slippage_bps, slippage_jitter_bps, rng)
+    result = simulate_paths(prices, target, strategy, volatility, initial_capital, slippage_bps=slippage)
+    metrics = path_metrics(result["equity"], initial_capital, periods_per_year)
+    metrics["trades"] = result["trades"]
+    return metrics
+
+def run_robustness(close, n_paths=10000, method="prices", block=10, max_delay=1, slippage_bps=5.0,
+                   slippage_jitter_bps=5.0, params=None, initial_capital=1000000.0,
+                   periods_per_year=252, seed=None, max_workers=None):
+    """
+    Runs n_paths alternative paths for BollingerRSIStrategy(**params) on the close
+    series and returns {metric: per-path array} plus 'base' (the metrics of the
+    original backtest).
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}' (choose from {', '.join(METHODS)})")
+    params = dict(params or {})
+    close = np.asarray(close, dtype=float)
+    strategy = BollingerRSIStrategy(None, **params)
+    target, volatility = strategy.path_signals(close[:, None])
+    target, volatility = target[:, 0], volatility[:, 0]
+    base_equity = simulate_arrays(close, target, strategy, volatility, initial_capital)["equity"]
+    base = {k: float(v[0]) for k, v in path_metrics(base_equity[None, :], initial_capital, periods_per_year).items()}
+
+    seeds = np.random.SeedSequence(seed).spawn(-(-n_paths // CHUNK_PATHS))
+    jobs = []
+    for i, chunk_seed in enumerate(seeds):
+        size = min(CHUNK_PATHS, n_paths - i * CHUNK_PATHS)
+        jobs.append((method, close, target, volatility, base_equity, params, size, chunk_seed, block,
+                     max_delay, slippage_bps, slippage_jitter_bps, initial_capital, periods_per_year))
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) == 1:
+        chunks = [_run_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            chunks = list(pool.map(_run_chunk, jobs))
+    results = {k: np.concatenate([chunk[k] for chunk in chunks]) for k in chunks[0]}
+    results["base"] = base
+    return results
+
+def confidence_report(results, confidence=0.9):
+    """
+    Flat report: the base backtest, the median and the central `confidence`
+    interval of every metric across paths, and the probability of a loss.
+    """
+    tail = (1 - confidence) / 2 * 100
+    label = f"{confidence * 100:g}"
+    report = {}
+    for metric, value in results["base"].items():
+        values = results[metric]
+        low, median, high = np.percentile(values, [tail, 50, 100 - tail])
+        report[f"{metric}_base"] = value
+        report[f"{metric}_median"] = float(median)
+        report[f"{metric}_ci{label}_low"] = float(low)
+        report[f"{metric}_ci{label}_high"] = float(high)
+    report["prob_loss"] = float(np.mean(results["total_return"] < 0))
+    if "trades" in results:
+        report["trades_median"] = float(np.median(results["trades"]))
+    report["paths"] = len(results["total_return"])
+    return report
+
+def load_close(symbol, days, offline):
+    from alpaca.data.timeframe import TimeFrame
+    from alpaca.data.enums import DataFeed
+    from bar_store import BarStore
+    from datetime import datetime, timedelta
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    data_client = None
+    if not offline:
+        from alpaca.data.historical import StockHistoricalDataClient
+        from utils import load_alpaca_credentials
+        creds = load_alpaca_credentials(os.path.join(current_dir, "paper_account_api_key.txt"))
+        data_client = StockHistoricalDataClient(creds["api_key"], creds["secret_key"])
+    bar_store = BarStore(data_client, cache_dir=os.path.join(current_dir, "bar_cache"), offline=offline)
+    end_time = datetime.now() - timedelta(minutes=16)
+    df = bar_store.get_bars(symbol, end_time - timedelta(days=days), end_time, timeframe=TimeFrame.Day,
+                            feed=DataFeed.IEX)
+    return df['close'].to_numpy(dtype=float)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo / bootstrap confidence intervals for the Bollinger+RSI backtest")
+    parser.add_argument("--symbol", default="AVGO")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--synthetic", type=int, metavar="BARS", help="Use this many synthetic daily bars instead")
+    parser.add_argument("--method", choices=METHODS, default="prices")
+    parser.add_argument("--paths", type=int, default=10000)
+    parser.add_argument("--block", type=int, default=10, help="Bootstrap block length in bars")
+    parser.add_argument("--max-delay", type=int, default=1, help="Act on each signal up to this many bars late")
+    parser.add_argument("--slippage-bps", type=float, default=5.0, help="Mean slippage per fill")
+    parser.add_argument("--slippage-jitter-bps", type=float, default=5.0, help="Std of the slippage per fill")
+    parser.add_argument("--confidence", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument("--offline", action="store_true", help="Use only cached bars, no network access")
+    parser.add_argument("--output", default="robustness_report.json")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        from benchmark import synthetic_bars
+        close = synthetic_bars(args.synthetic, seed=args.seed or 0, freq="D")['close'].to_numpy()
+    else:
+        close = load_close(args.symbol, args.days, args.offline)
+    if len(close) < 2:
+        print("No data found for the specified period.")
+        raise SystemExit(1)
+
+    started = time.perf_counter()
+    results = run_robustness(close, args.paths, args.method, args.block, args.max_delay, args.slippage_bps,
+                             args.slippage_jitter_bps, seed=args.seed, max_workers=args.workers)
+    elapsed = time.perf_counter() - started
+    print(f"{args.paths} {args.method} paths over {len(close)} bars in {elapsed:.2f}s\n")
+    report = confidence_report(results, args.confidence)
+    report.update({"symbol": "SYNTHETIC" if args.synthetic else args.symbol, "method": args.method,
+                   "block": args.block, "max_delay": args.max_delay, "slippage_bps": args.slippage_bps,
+                   "slippage_jitter_bps": args.slippage_jitter_bps, "seed": args.seed})
+    print_report(report)
+    if args.output:
+        write_report(report, args.output)
+        print(f"Report saved to {args.output}")
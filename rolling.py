@@ -0,0 +1,115 @@
+import math
+
+class RollingWindow:
+    """
+    Fixed-size ring buffer with O(1) running mean / sample std.
+    Sums are kept relative to a shift value to avoid cancellation on large prices,
+    and re-synced from the buffer every so often so float drift cannot build up.
+    """
+    RESYNC_EVERY = 1000
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = [0.0] * window
+        self.pos = 0
+        self.count = 0
+        self.shift = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.pushes = 0
+        self.nan_count = 0
+
+    def push(self, value):
+        """
+        Adds a value, evicting the oldest one once the window is full.
+        NaN values occupy a slot but make mean/std undefined, like pandas rolling.
+        """
+        value = float(value)
+        if self.shift is None and not math.isnan(value):
+            self.shift = value
+
+        if self.count == self.window:
+            self._remove(self.buffer[self.pos])
+        else:
+            self.count += 1
+        self.buffer[self.pos] = value
+        self.pos = (self.pos + 1) % self.window
+        self._add(value)
+
+        self.pushes += 1
+        if self.pushes % self.RESYNC_EVERY == 0:
+            self._resync()
+
+    def _add(self, value):
+        if math.isnan(value):
+            self.nan_count += 1
+            return
+        d = value - self.shift
+        self.total += d
+        self.total_sq += d * d
+
+    def _remove(self, value):
+        if math.isnan(value):
+            self.nan_count -= 1
+            return
+        d = value - self.shift
+        self.total -= d
+        self.total_sq -= d * d
+
+    def _resync(self):
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.nan_count = 0
+        for value in self.values():
+            self._add(value)
+
+    def values(self):
+        """
+        Window contents, oldest first.
+        """
+        if self.count < self.window:
+            return self.buffer[:self.count]
+        return self.buffer[self.pos:] + self.buffer[:self.pos]
+
+    def is_full(self):
+        return self.count == self.window and self.nan_count == 0
+
+    def mean(self):
+        if not self.is_full():
+            return float('nan')
+        return self.shift + self.total / self.window
+
+    def partial_mean(self):
+        """
+        Mean over whatever is in the window so far (pandas min_periods=1).
+        """
+        valid = self.count - self.nan_count
+        if valid == 0:
+            return float('nan')
+        return self.shift + self.total / valid
+
+    def std(self):
+        """
+        Sample standard deviation (ddof=1), matching pandas rolling().std().
+        """
+        if not self.is_full() or self.window < 2:
+            return float('nan')
+        n = self.window
+        var = (self.total_sq - self.total * self.total / n) / (n - 1)
+        return math.sqrt(max(var, 0.0))
+
+    def get_state(self):
+        return {"window": self.window, "values": self.values(), "pushes": self.pushes}
+
+    @classmethod
+    def from_state(cls, state):
+        rw = cls(state["window"])
+        # Same buffer and sums (added oldest first) as pushing the values one by one
+        values = [float(value) for value in state["values"]][-rw.window:]
+        rw.count = len(values)
+        rw.buffer[:rw.count] = values
+        rw.pos = rw.count % rw.window
+        rw.shift = next((value for value in values if not math.isnan(value)), None)
+        rw._resync()
+        rw.pushes = state.get("pushes", rw.count)
+        return rw
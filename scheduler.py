@@ -1,60 +1,32 @@
-import time
-import subprocess
+import argparse
+import asyncio
 import os
-from datetime import datetime
-import pytz
+from checkpoint import CHECKPOINT_FILE
+from trading_service import TradingService
+from instrumentation import configure_from_env
 
-def run_trading_bot():
-    print(f"\n--- Starting Trading Bot Execution: {datetime.now()} ---")
-    try:
-        # Run main.py using the same python interpreter
-        result = subprocess.run(["python3", "main.py"], capture_output=True, text=True)
-        print(result.stdout)
-        if result.stderr:
-            print(f"Errors:\n{result.stderr}")
-    except Exception as e:
-        print(f"Failed to run bot: {e}")
-
-def is_trading_time():
+def main(ensemble_config=None):
     """
-    Checks if it is time to run the bot.
-    Target: Market Open (9:30 AM EST) + 5 minutes buffer = 9:35 AM EST.
-    Runs only on weekdays (Mon-Fri).
+    Entry point used by the alpaca-bot systemd service.
+    Runs the in-process asyncio TradingService, which wakes up at market open + 5 minutes
+    (09:35 EST on a regular session) according to the Alpaca market calendar.
     """
-    ny_tz = pytz.timezone('America/New_York')
-    now_ny = datetime.now(ny_tz)
-    
-    # Check if weekday (0=Mon, 4=Fri)
-    if now_ny.weekday() > 4:
-        return False
-        
-    # Check time window (e.g., 9:35 AM - 9:36 AM)
-    # This simple logic assumes the script loop runs frequently enough
-    if now_ny.hour == 9 and now_ny.minute == 35:
-        return True
-        
-    return False
-
-def main():
-    print("Scheduler started. Waiting for trading time (09:35 EST)...")
+    print("Scheduler started. Waiting for trading time (market open + 5 minutes)...")
     print("Press Ctrl+C to stop.")
-    
-    # Track if we already ran today to avoid multiple executions in the same minute
-    last_run_date = None
-    
-    while True:
-        ny_tz = pytz.timezone('America/New_York')
-        now_ny = datetime.now(ny_tz)
-        current_date = now_ny.date()
-        
-        # Check if trading time and haven't ran today
-        if is_trading_time() and last_run_date != current_date:
-            run_trading_bot()
-            last_run_date = current_date
-            print("Execution complete. Waiting for next day...")
-            
-        # Sleep for 30 seconds
-        time.sleep(30)
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    service = TradingService.from_credentials(os.path.join(current_dir, "paper_account_api_key.txt"),
+                                              cache_dir=os.path.join(current_dir, "bar_cache"),
+                                              ensemble_config=ensemble_config,
+                                              checkpoint_file=os.path.join(current_dir, CHECKPOINT_FILE))
+    if service is None:
+        return
+    asyncio.run(service.run())
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Long-running trading service")
+    parser.add_argument("--ensemble", metavar="CONFIG", help="Trade a strategy ensemble from this JSON configuration")
+    args = parser.parse_args()
+    # TRADING_METRICS / TRADING_METRICS_PORT / TRADING_PROFILE (see instrumentation.py)
+    configure_from_env()
+    main(args.ensemble)
@@ -0,0 +1,183 @@
+"""
+Cross-sectional universe screener.
+
+Bars for the whole universe are loaded into one (time x symbol) close-price
+matrix (BarStore.get_matrix) and the Bollinger / RSI / volatility / momentum
+indicators are computed for every symbol at once along the time axis. Each score
+is turned into a cross-sectional percentile rank per bar, the ranks are combined
+with configurable weights and the top N symbols go to the strategy runner
+(EnsembleRunner with a screener, or main.py --universe).
+"""
+from alpaca.data.timeframe import TimeFrame
+from alpaca.data.enums import DataFeed
+import indicators as ind
+import numpy as np
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+def _band_position(close, data):
+    # %B: 0 at the lower band, 1 at the upper band
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (close - data['lower_band']) / (data['upper_band'] - data['lower_band'])
+
+# Score name -> function of (close matrix, indicator matrices, screener)
+SCORES = {
+    "breakout": lambda close, data, s: _band_position(close, data),
+    "rsi": lambda close, data, s: data['rsi'],
+    "momentum": lambda close, data, s: data['momentum'],
+    "volatility": lambda close, data, s: data['volatility'],
+    # BollingerRSIStrategy's entry condition, as 1/0
+    "signal": lambda close, data, s: np.where(np.isnan(data['rsi']), np.nan,
+                                              ((close > data['upper_band']) & (data['rsi'] < s.rsi_overbought)) * 1.0),
+}
+
+# Breakouts with momentum, preferring calmer names
+DEFAULT_SCORES = {"breakout": 1.0, "momentum": 1.0, "volatility": -0.5}
+
+def cross_rank(scores):
+    """
+    Percentile rank (0, 1] of each symbol within its row; NaN scores stay NaN.
+    """
+    scores = np.asarray(scores, dtype=float)
+    # argsort puts NaN last, so valid symbols get ranks 0 .. count-1
+    order = np.argsort(scores, axis=-1, kind="stable")
+    ranks = np.empty(scores.shape)
+    np.put_along_axis(ranks, order, np.broadcast_to(np.arange(scores.shape[-1], dtype=float), scores.shape), axis=-1)
+    valid = ~np.isnan(scores)
+    count = valid.sum(axis=-1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(valid, (ranks + 1) / count, np.nan)
+
+def top_n_mask(score, n):
+    """
+    Boolean matrix marking the n best scores of each row (NaN never selected).
+    """
+    score = np.asarray(score, dtype=float)
+    filled = np.where(np.isnan(score), -np.inf, score)
+    n = min(n, score.shape[-1])
+    mask = np.zeros(score.shape, dtype=bool)
+    if n == 0:
+        return mask
+    best = np.argpartition(-filled, n - 1, axis=-1)[..., :n]
+    np.put_along_axis(mask, best, True, axis=-1)
+    return mask & ~np.isnan(score)
+
+class Screener:
+    """
+    Ranks a universe by a weighted sum of cross-sectional score ranks.
+    scores: {score name: weight} (see SCORES); negative weights prefer low values.
+    """
+
+    def __init__(self, scores=None, top_n=10, bb_window=20, bb_std=2, rsi_window=14, rsi_overbought=70,
+                 vol_window=20, momentum_window=20, min_price=5.0):
+        self.scores = dict(scores or DEFAULT_SCORES)
+        for name in self.scores:
+            if name not in SCORES:
+                raise ValueError(f"Unknown score '{name}' (choose from {', '.join(SCORES)})")
+        self.top_n = top_n
+        self.bb_window = bb_window
+        self.bb_std = bb_std
+        self.rsi_window = rsi_window
+        self.rsi_overbought = rsi_overbought
+        self.vol_window = vol_window
+        self.momentum_window = momentum_window
+        self.min_price = min_price
+
+    def compute_indicators(self, close, cache=None) -> dict:
+        """
+        Indicator matrices for a (time x symbol) close matrix, all along axis 0.
+        """
+        middle, upper, lower = ind.bollinger(close, self.bb_window, self.bb_std, cache=cache)
+        momentum = np.full(close.shape, np.nan)
+        if len(close) > self.momentum_window:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                momentum[self.momentum_window:] = close[self.momentum_window:] / close[:-self.momentum_window] - 1
+        return {
+            'middle_band': middle,
+            'upper_band': upper,
+            'lower_band': lower,
+            'rsi': ind.rsi(close, self.rsi_window, cache=cache),
+            'volatility': ind.volatility(close, self.vol_window, cache=cache),
+            'momentum': momentum,
+        }
+
+    def score(self, close, cache=None):
+        """
+        Combined score matrix (time x symbol). NaN where a score is undefined
+        (not enough history, no bar, e.g. a halted symbol) or the price is below min_price.
+        """
+        close = np.asarray(close, dtype=float)
+        data = self.compute_indicators(close, cache)
+        total = np.zeros(close.shape)
+        for name, weight in self.scores.items():
+            total += weight * cross_rank(SCORES[name](close, data, self))
+        if self.min_price:
+            total[~(close >= self.min_price)] = np.nan
+        return total
+
+    def select(self, symbols, close, top_n=None, cache=None):
+        """
+        [(symbol, score)] of the top_n symbols on the last bar, best first.
+        """
+        if len(close) == 0:
+            return []
+        last = self.score(close, cache)[-1]
+        picked = np.flatnonzero(top_n_mask(last, top_n or self.top_n))
+        picked = picked[np.argsort(-last[picked], kind="stable")]
+        return [(symbols[j], float(last[j])) for j in picked]
+
+    def screen(self, bar_store, universe, end_time=None, lookback_days=100, timeframe=TimeFrame.Day,
+               feed=DataFeed.IEX):
+        """
+        Loads the universe's closes from the bar store and returns select()'s top N.
+        """
+        end_time = end_time or datetime.now() - timedelta(minutes=16)
+        _, symbols, close = bar_store.get_matrix(universe, end_time - timedelta(days=lookback_days), end_time,
+                                                 timeframe, feed)
+        return self.select(symbols, close)
+
+def load_universe(path):
+    """
+    Symbols from a text file, one per line (blank lines and # comments ignored).
+    """
+    with open(path) as f:
+        return [line.split("#")[0].strip().upper() for line in f if line.split("#")[0].strip()]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank a symbol universe and print the top candidates")
+    parser.add_argument("--symbols", nargs="*", default=[], help="Symbols to screen")
+    parser.add_argument("--universe-file", help="Text file with one symbol per line")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--score", action="append", metavar="NAME=WEIGHT",
+                        help=f"Score and weight, repeatable (default: {DEFAULT_SCORES}); names: {', '.join(SCORES)}")
+    parser.add_argument("--days", type=int, default=100, help="Lookback in calendar days")
+    parser.add_argument("--min-price", type=float, default=5.0)
+    parser.add_argument("--offline", action="store_true", help="Use only cached bars, no network access")
+    args = parser.parse_args()
+
+    universe = list(args.symbols)
+    if args.universe_file:
+        universe += load_universe(args.universe_file)
+    scores = None
+    if args.score:
+        scores = {name: float(weight) for name, weight in (item.split("=") for item in args.score)}
+
+    from bar_store import BarStore
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    client = None
+    if not args.offline:
+        from alpaca.data.historical import StockHistoricalDataClient
+        from utils import load_alpaca_credentials
+        creds = load_alpaca_credentials(os.path.join(current_dir, "paper_account_api_key.txt"))
+        client = StockHistoricalDataClient(creds.get("api_key"), creds.get("secret_key"))
+    bar_store = BarStore(client, cache_dir=os.path.join(current_dir, "bar_cache"), offline=args.offline)
+
+    screener = Screener(scores, top_n=args.top, min_price=args.min_price)
+    started = time.perf_counter()
+    picks = screener.screen(bar_store, universe, lookback_days=args.days)
+    elapsed = time.perf_counter() - started
+    print(f"Screened {len(universe)} symbols in {elapsed * 1000:.0f} ms")
+    for rank, (symbol, score) in enumerate(picks, 1):
+        print(f"{rank:>3}. {symbol:<8} {score:8.3f}")
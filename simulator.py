@@ -0,0 +1,202 @@
+import numpy as np
+
+class SlippageModel:
+    """
+    Fixed slippage in basis points: buys fill above the close, sells below.
+    """
+    def __init__(self, bps=0.0):
+        self.bps = bps
+
+    def fill_price(self, price, side):
+        adj = self.bps / 10000.0
+        return price * (1 + adj) if side == "buy" else price * (1 - adj)
+
+class CommissionModel:
+    """
+    Per-share plus percentage-of-notional commission with an optional minimum per order.
+    """
+    def __init__(self, per_share=0.0, pct=0.0, minimum=0.0):
+        self.per_share = per_share
+        self.pct = pct
+        self.minimum = minimum
+
+    def cost(self, shares, price):
+        if shares == 0:
+            return 0.0
+        return max(self.minimum, shares * self.per_share + shares * price * self.pct)
+
+def _step(n, fill_idx, values, initial):
+    """
+    Array of length n that starts at `initial` and jumps to values[k] at fill_idx[k].
+    """
+    idx = np.full(n, -1, dtype=np.int64)
+    if len(fill_idx):
+        idx[np.asarray(fill_idx)] = np.arange(len(fill_idx))
+        idx = np.maximum.accumulate(idx)
+    vals = np.asarray(values, dtype=float)
+    return np.where(idx >= 0, vals[np.maximum(idx, 0)] if len(vals) else initial, initial)
+
+def simulate_arrays(close, target, strategy, volatility=None, initial_capital=1000000.0, slippage=None, commission=None,
+                    exit_prices=None, atr=None, initial_holdings=0):
+    """
+    Long/flat simulation of target positions (1 = long, 0 = cash) on NumPy arrays.
+
+    Same rules as the per-bar loop in backtest.simulate: enter when the target is 1 and
+    nothing is held, sizing with strategy.calculate_position_size against the current
+    portfolio value; exit everything when the target is 0. Only the trades themselves
+    are visited in Python, so the cost is O(bars) in NumPy plus O(trades).
+
+    exit_prices (NaN where unused) overrides the exit price on given bars, e.g. stop
+    fills from risk.StopModel; slippage still applies on top. atr (per bar) is passed to
+    the strategy's sizer for ATR-based sizing. initial_holdings are shares already held
+    before the first bar (e.g. carried over from the previous chunk of a chunked
+    backtest); they are sold at the first flat bar, as a trade with entry_idx None.
+
+    Returns a dict with 'equity', 'cash' and 'holdings' arrays and a 'trades' list of
+    (entry_idx, exit_idx or None, shares, entry_fill, exit_fill or None).
+    """
+    close = np.asarray(close, dtype=float)
+    target = np.asarray(target, dtype=float)
+    n = len(close)
+    longs = np.flatnonzero(target == 1)
+    flats = np.flatnonzero(target == 0)
+
+    cash = initial_capital
+    fill_idx, cash_after, holdings_after = [], [], []
+    trades = []
+    shares, entry, entry_fill = initial_holdings, None, None
+    t = 0
+    while True:
+        if not shares:
+            k = np.searchsorted(longs, t)
+            if k == len(longs):
+                break
+            e = longs[k]
+            price = close[e]
+            vol = volatility[e] if volatility is not None else None
+            bar_atr = atr[e] if atr is not None else None
+            # Holdings are 0 here, so the portfolio value is just cash
+            shares = strategy.calculate_position_size(price, cash, volatility=vol, atr=bar_atr)
+            entry_fill = slippage.fill_price(price, "buy") if slippage else price
+            cost = shares * entry_fill
+            if commission:
+                cost += commission.cost(shares, entry_fill)
+            if shares <= 0 or cost > cash:
+                # The loop would simply retry on the next long bar
+                shares = 0
+                t = e + 1
+                continue
+
+            cash -= cost
+            fill_idx.append(e)
+            cash_after.append(cash)
+            holdings_after.append(shares)
+            entry, t = int(e), e + 1
+
+        m = np.searchsorted(flats, t)
+        if m == len(flats):
+            trades.append((entry, None, shares, entry_fill, None))
+            break
+        x = flats[m]
+        exit_price = exit_prices[x] if exit_prices is not None and not np.isnan(exit_prices[x]) else close[x]
+        exit_fill = slippage.fill_price(exit_price, "sell") if slippage else exit_price
+        cash += shares * exit_fill
+        if commission:
+            cash -= commission.cost(shares, exit_fill)
+        fill_idx.append(x)
+        cash_after.append(cash)
+        holdings_after.append(0)
+        trades.append((entry, int(x), shares, entry_fill, exit_fill))
+        shares = 0
+        t = x + 1
+
+    cash_arr = _step(n, fill_idx, cash_after, initial_capital)
+    holdings_arr = _step(n, fill_idx, holdings_after, float(initial_holdings))
+    equity = cash_arr + holdings_arr * close
+    return {"equity": equity, "cash": cash_arr, "holdings": holdings_arr, "trades": trades}
+
+def _next_index(mask):
+    """
+    (paths, bars + 1) matrix: the first bar >= i where mask is True, or bars if none.
+    """
+    paths, n = mask.shape
+    idx = np.where(mask, np.arange(n), n)
+    idx = np.concatenate((idx, np.full((paths, 1), n)), axis=1)
+    return np.minimum.accumulate(idx[:, ::-1], axis=1)[:, ::-1]
+
+def simulate_paths(close, target, strategy, volatility=None, initial_capital=1000000.0, slippage_bps=None, atr=None):
+    """
+    simulate_arrays for many paths at once. close, target, volatility, atr and
+    slippage_bps (the slippage a fill on that bar pays, e.g. randomized per fill)
+    are (paths x bars) matrices; target may also be one row shared by all paths.
+
+    The paths step through their trades in lockstep: each pass of the loop sizes
+    the next entry and finds the matching exit for every path with a single
+    vectorized sizing call, so the Python loop runs once per trade of the busiest
+    path instead of once per trade of every path. Each row matches simulate_arrays
+    on that path (with a SlippageModel of the same bps).
+
+    Returns a dict with 'equity', 'cash' and 'holdings' matrices and 'trades'
+    (the number of entries per path).
+    """
+    close = np.atleast_2d(np.asarray(close, dtype=float))
+    paths, n = close.shape
+    target = np.broadcast_to(np.asarray(target, dtype=float), close.shape)
+    next_long = _next_index(target == 1)
+    next_flat = _next_index(target == 0)
+
+    cash = np.full(paths, float(initial_capital))
+    trades = np.zeros(paths, dtype=np.int64)
+    t = np.zeros(paths, dtype=np.int64)
+    fill_path, fill_idx, cash_after, holdings_after = [], [], [], []
+    live = np.arange(paths)
+    while len(live):
+        e = next_long[live, t[live]]
+        live, e = live[e < n], e[e < n]
+        if not len(live):
+            break
+        price = close[live, e]
+        vol = volatility[live, e] if volatility is not None else None
+        bar_atr = atr[live, e] if atr is not None else None
+        # Holdings are 0 here, so the portfolio value is just cash
+        shares = np.asarray(strategy.calculate_position_size(price, cash[live], volatility=vol, atr=bar_atr))
+        entry_fill = price * (1 + slippage_bps[live, e] / 10000.0) if slippage_bps is not None else price
+        cost = shares * entry_fill
+        ok = (shares > 0) & (cost <= cash[live])
+        # Like simulate_arrays, a path that cannot enter retries on its next long bar
+        retry = live[~ok]
+        t[retry] = e[~ok] + 1
+        live, e, shares, entry_fill = live[ok], e[ok], shares[ok], entry_fill[ok]
+
+        cash[live] -= cost[ok]
+        trades[live] += 1
+        fill_path.append(live)
+        fill_idx.append(e)
+        cash_after.append(cash[live])
+        holdings_after.append(shares.astype(float))
+
+        x = next_flat[live, e + 1]
+        closing = x < n
+        live, x, shares = live[closing], x[closing], shares[closing]
+        exit_fill = close[live, x] * (1 - slippage_bps[live, x] / 10000.0) if slippage_bps is not None else close[live, x]
+        cash[live] += shares * exit_fill
+        fill_path.append(live)
+        fill_idx.append(x)
+        cash_after.append(cash[live])
+        holdings_after.append(np.zeros(len(live)))
+        t[live] = x + 1
+        live = np.concatenate((retry, live))
+
+    # Fills are numbered in time order within each path; hold the latest one forward
+    idx = np.full((paths, n), -1, dtype=np.int64)
+    cash_arr = np.full((paths, n), float(initial_capital))
+    holdings_arr = np.zeros((paths, n))
+    if fill_idx:
+        fill_path, fill_idx = np.concatenate(fill_path), np.concatenate(fill_idx)
+        idx[fill_path, fill_idx] = np.arange(len(fill_idx))
+        idx = np.maximum.accumulate(idx, axis=1)
+        filled = idx >= 0
+        cash_arr = np.where(filled, np.concatenate(cash_after)[np.maximum(idx, 0)], cash_arr)
+        holdings_arr = np.where(filled, np.concatenate(holdings_after)[np.maximum(idx, 0)], holdings_arr)
+    equity = cash_arr + holdings_arr * close
+    return {"equity": equity, "cash": cash_arr, "holdings": holdings_arr, "trades": trades}
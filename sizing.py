@@ -0,0 +1,214 @@
+"""
+Position sizing models.
+
+Each sizer turns (price, capital, volatility, atr) into a dollar budget and a
+whole number of shares. All inputs may be scalars or NumPy arrays, so the same
+code sizes one live order or every candidate entry of a universe in one call.
+Strategies hold a sizer (BaseStrategy.sizer) and calculate_position_size
+delegates to it.
+
+volatility is the per-bar return std from generate_signals (e.g. 0.02 = 2% a
+day); atr is the Average True Range in price units (see Sizer.prepare).
+"""
+import indicators as ind
+import numpy as np
+
+class Sizer:
+    """
+    Base class: subclasses implement budget(); shares() floors budget / price.
+    """
+    # Bar columns prepare() reads (none by default)
+    columns = ()
+
+    def budget(self, price, capital, volatility=None, atr=None):
+        raise NotImplementedError("Sizer must implement budget")
+
+    def shares(self, price, capital, volatility=None, atr=None):
+        """
+        Whole shares to buy (0 where the budget or price is unusable).
+        Returns an int for scalar inputs, an int64 array otherwise.
+        """
+        price = np.asarray(price, dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shares = np.floor(self.budget(price, capital, volatility, atr) / price)
+        shares = np.where(np.isfinite(shares) & (shares > 0), shares, 0).astype(np.int64)
+        return int(shares) if shares.ndim == 0 else shares
+
+    def prepare(self, df, cache=None) -> dict:
+        """
+        Extra per-bar inputs this sizer needs from OHLC bars ({} by default).
+        """
+        return {}
+
+def _volatility(volatility, shape):
+    if volatility is None:
+        return np.full(shape, np.nan)
+    return np.asarray(volatility, dtype=float)
+
+class FixedFractionSizer(Sizer):
+    """
+    A fixed fraction of capital (95% keeps a reserve for fees/slippage), scaled down
+    by high_volatility_scale when the per-bar volatility exceeds high_volatility.
+    The defaults are the original BaseStrategy.calculate_position_size rule.
+    """
+    def __init__(self, fraction=0.95, high_volatility=0.02, high_volatility_scale=0.8):
+        self.fraction = fraction
+        self.high_volatility = high_volatility
+        self.high_volatility_scale = high_volatility_scale
+
+    def budget(self, price, capital, volatility=None, atr=None):
+        budget = np.asarray(capital, dtype=float) * self.fraction
+        if volatility is None:
+            return budget
+        # NaN volatility (warm-up bars) compares False and keeps the full fraction
+        return np.where(np.asarray(volatility, dtype=float) > self.high_volatility,
+                        budget * self.high_volatility_scale, budget)
+
+class VolatilityTargetSizer(Sizer):
+    """
+    Sizes so the position's annualized volatility matches target_volatility,
+    capped at max_fraction of capital. Without a volatility estimate the cap is used.
+    """
+    def __init__(self, target_volatility=0.15, periods_per_year=252, max_fraction=0.95):
+        self.target_volatility = target_volatility
+        self.periods_per_year = periods_per_year
+        self.max_fraction = max_fraction
+
+    def budget(self, price, capital, volatility=None, atr=None):
+        annual = _volatility(volatility, np.shape(price)) * np.sqrt(self.periods_per_year)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.where(annual > 0, np.minimum(self.target_volatility / annual, self.max_fraction),
+                                self.max_fraction)
+        return np.asarray(capital, dtype=float) * fraction
+
+class ATRRiskSizer(Sizer):
+    """
+    Risks risk_per_trade of capital on a stop placed atr_multiple ATRs away:
+    shares = capital * risk_per_trade / (atr * atr_multiple), capped at max_fraction
+    of capital. No ATR (warm-up bars) means no position.
+    """
+    columns = ('high', 'low', 'close')
+
+    def __init__(self, risk_per_trade=0.01, atr_multiple=2.0, window=14, max_fraction=0.95):
+        self.risk_per_trade = risk_per_trade
+        self.atr_multiple = atr_multiple
+        self.window = window
+        self.max_fraction = max_fraction
+
+    def budget(self, price, capital, volatility=None, atr=None):
+        capital = np.asarray(capital, dtype=float)
+        if atr is None:
+            return np.zeros(np.broadcast(price, capital).shape)
+        stop_distance = np.asarray(atr, dtype=float) * self.atr_multiple
+        with np.errstate(divide="ignore", invalid="ignore"):
+            at_risk = np.where(stop_distance > 0, capital * self.risk_per_trade / stop_distance * price, 0.0)
+        return np.minimum(np.nan_to_num(at_risk), capital * self.max_fraction)
+
+    def prepare(self, df, cache=None):
+        if not set(self.columns).issubset(df.columns):
+            return {}
+        return {"atr": ind.atr(df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy(),
+                               self.window, cache=cache)}
+
+class KellySizer(Sizer):
+    """
+    Fractional Kelly: f* = p - (1 - p) / b for win rate p and payoff ratio b
+    (average win / average loss), times kelly_fraction (half-Kelly by default),
+    clipped to [0, max_fraction].
+    """
+    def __init__(self, win_rate, payoff_ratio, kelly_fraction=0.5, max_fraction=0.95):
+        self.win_rate = win_rate
+        self.payoff_ratio = payoff_ratio
+        self.kelly_fraction = kelly_fraction
+        self.max_fraction = max_fraction
+
+    @classmethod
+    def from_report(cls, report, **kwargs):
+        """
+        Estimates p and b from an analytics report (win_rate, avg_win, avg_loss).
+        """
+        if not report.get("win_rate") or not report.get("avg_win") or not report.get("avg_loss"):
+            return cls(0.0, 1.0, **kwargs)
+        return cls(report["win_rate"], report["avg_win"] / -report["avg_loss"], **kwargs)
+
+    def kelly(self):
+        if self.payoff_ratio <= 0:
+            return 0.0
+        return self.win_rate - (1 - self.win_rate) / self.payoff_ratio
+
+    def budget(self, price, capital, volatility=None, atr=None):
+        fraction = min(max(self.kelly() * self.kelly_fraction, 0.0), self.max_fraction)
+        return np.broadcast_to(np.asarray(capital, dtype=float) * fraction, np.broadcast(price, capital).shape)
+
+class EqualRiskSizer(Sizer):
+    """
+    Equal risk contribution across the entries along the last axis: capital is the
+    budget shared by all of them. With a covariance matrix of their returns the
+    weights solve the ERC problem; otherwise inverse volatility (ERC for
+    uncorrelated assets). A single entry gets max_fraction of capital.
+    """
+    def __init__(self, max_fraction=0.95, covariance=None):
+        self.max_fraction = max_fraction
+        self.covariance = covariance
+
+    def budget(self, price, capital, volatility=None, atr=None):
+        price = np.asarray(price, dtype=float)
+        capital = np.asarray(capital, dtype=float)
+        if price.ndim == 0:
+            return capital * self.max_fraction
+        if self.covariance is not None:
+            weights = erc_weights(self.covariance)
+        else:
+            inverse = 1.0 / _volatility(volatility, price.shape)
+            inverse = np.where(np.isfinite(inverse) & (inverse > 0), inverse, 0.0)
+            total = inverse.sum(axis=-1, keepdims=True)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                weights = np.where(total > 0, inverse / total, 0.0)
+        if capital.ndim:
+            capital = capital[..., None]
+        return capital * self.max_fraction * weights
+
+def erc_weights(covariance, tol=1e-10, max_iter=1000):
+    """
+    Equal-risk-contribution weights for a covariance matrix (cyclical coordinate
+    descent on 0.5 w'Σw - sum(log w) / n, then normalized to sum to 1).
+    """
+    cov = np.asarray(covariance, dtype=float)
+    n = len(cov)
+    if n == 0:
+        return np.array([])
+    diag = np.diag(cov)
+    w = 1.0 / np.sqrt(diag)
+    budget = 1.0 / n
+    for _ in range(max_iter):
+        previous = w.copy()
+        for i in range(n):
+            c = cov[i] @ w - diag[i] * w[i]
+            w[i] = (-c + np.sqrt(c * c + 4 * diag[i] * budget)) / (2 * diag[i])
+        if np.max(np.abs(w - previous)) < tol * np.max(w):
+            break
+    return w / w.sum()
+
+SIZERS = {
+    "fixed": FixedFractionSizer,
+    "vol_target": VolatilityTargetSizer,
+    "atr": ATRRiskSizer,
+    "kelly": KellySizer,
+    "erc": EqualRiskSizer,
+}
+
+def make_sizer(config):
+    """
+    Sizer from a config dict ({"model": "vol_target", **params}), a model name, or None (default).
+    """
+    if config is None:
+        return FixedFractionSizer()
+    if isinstance(config, Sizer):
+        return config
+    if isinstance(config, str):
+        config = {"model": config}
+    params = dict(config)
+    model = params.pop("model")
+    if model not in SIZERS:
+        raise ValueError(f"Unknown sizing model '{model}' (choose from {', '.join(SIZERS)})")
+    return SIZERS[model](**params)
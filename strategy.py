@@ -1,9 +1,44 @@
 import pandas as pd
 import numpy as np
+import math
+import indicators as ind
+from rolling import RollingWindow
+from sizing import make_sizer
+
+def latch_positions(buy, sell, start=0, initial=0.0):
+    """
+    Resolves a long/flat state machine from boolean entry/exit masks without a loop.
+    Bars before `start` are ignored. Returns (target, entries, exits) where target is
+    the float position after each bar and entries/exits mark the bars where the
+    state actually changed. Returns (None, None, None) if an entry and an exit
+    fire on the same bar, since the result then depends on the previous state.
+    2-D (bars x paths) masks latch every column independently along axis 0.
+    """
+    buy = np.asarray(buy, dtype=bool).copy()
+    sell = np.asarray(sell, dtype=bool).copy()
+    buy[:start] = False
+    sell[:start] = False
+    if (buy & sell).any():
+        return None, None, None
+
+    # Each event carries the state it sets; hold the last one forward
+    events = np.where(buy, 1.0, np.where(sell, 0.0, np.nan))
+    bars = np.arange(len(events)).reshape((-1,) + (1,) * (events.ndim - 1))
+    idx = np.where(np.isnan(events), -1, bars)
+    idx = np.maximum.accumulate(idx, axis=0) if len(idx) else idx
+    target = np.where(idx >= 0, np.take_along_axis(events, np.maximum(idx, 0), axis=0), initial)
+
+    # Drop repeated events (e.g. a second breakout while already long)
+    previous = np.concatenate((np.full((1,) + target.shape[1:], initial), target[:-1]))
+    entries = (target == 1.0) & (previous == 0.0)
+    exits = (target == 0.0) & (previous == 1.0)
+    return target, entries, exits
 
 class BaseStrategy:
-    def __init__(self, symbol):
+    def __init__(self, symbol, sizer=None):
         self.symbol = symbol
+        # A sizing.Sizer, a config dict like {"model": "atr", "risk_per_trade": 0.01}, or None
+        self.sizer = make_sizer(sizer)
 
     def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
         """
@@ -12,64 +47,306 @@ class BaseStrategy:
         """
         raise NotImplementedError("Strategy must implement generate_signals")
 
-    def calculate_position_size(self, current_price, available_capital, current_holdings=0, volatility=None):
+    def compute_indicators(self, close, cache=None) -> dict:
         """
-        Dynamic position sizing based on capital and volatility.
-        This is a placeholder for more complex logic.
+        Indicator arrays for a close-price array, memoized in cache (an
+        indicators.IndicatorCache; None computes them without caching).
         """
-        # Default simple logic: use 95% of available capital (reserve 5% for fees/slippage)
-        target_capital = available_capital * 0.95
-        
-        # Adjust based on volatility if provided (lower size for higher volatility)
-        if volatility is not None and volatility > 0:
-            # Example: reduce size if daily volatility > 2%
-            if volatility > 0.02:
-                target_capital *= 0.8
-        
-        target_shares = int(target_capital / current_price)
-        return target_shares
+        raise NotImplementedError("Strategy must implement compute_indicators")
+
+    def update(self, bar) -> dict:
+        """
+        Incremental counterpart of generate_signals: consumes one new bar and
+        returns that bar's signal row as a dict, in O(1).
+        """
+        raise NotImplementedError("Strategy does not support incremental updates")
+
+    def reset_state(self):
+        """
+        Clears any incremental state built up by update().
+        """
+        pass
+
+    def get_state(self) -> dict:
+        """
+        JSON-serializable snapshot of the incremental state.
+        """
+        raise NotImplementedError("Strategy does not support incremental updates")
+
+    def set_state(self, state: dict):
+        raise NotImplementedError("Strategy does not support incremental updates")
+
+    def position_state(self):
+        """
+        Whether the incremental state holds a long position (None for strategies
+        whose target does not depend on a latched position).
+        """
+        return None
+
+    def set_position_state(self, long: bool):
+        """
+        Overrides the latched position, e.g. to match the broker after a restart.
+        """
+        pass
+
+    def warm_up(self, data: pd.DataFrame):
+        """
+        Resets the incremental state and feeds historical bars through update().
+        Returns the signal row for the last bar (None if data is empty).
+        """
+        self.reset_state()
+        result = None
+        for close in data['close'].to_numpy(dtype=float):
+            result = self.update({'close': close})
+        return result
+
+    @staticmethod
+    def _bar_close(bar):
+        # Accepts dicts / pandas rows as well as alpaca Bar objects
+        if hasattr(bar, 'close') and not isinstance(bar, (dict, pd.Series)):
+            return float(bar.close)
+        return float(bar['close'])
+
+    def calculate_position_size(self, current_price, available_capital, current_holdings=0, volatility=None, atr=None):
+        """
+        Dynamic position sizing based on capital and volatility, delegated to self.sizer
+        (sizing.FixedFractionSizer by default: 95% of capital, 80% of that above 2% volatility).
+        Prices, capital and volatility may also be arrays to size many entries at once.
+        """
+        return self.sizer.shares(current_price, available_capital, volatility=volatility, atr=atr)
 
 class BollingerRSIStrategy(BaseStrategy):
-    def __init__(self, symbol, bb_window=20, bb_std=2, rsi_window=14, rsi_overbought=70, rsi_oversold=30):
-        super().__init__(symbol)
+    def __init__(self, symbol, bb_window=20, bb_std=2, rsi_window=14, rsi_overbought=70, rsi_oversold=30, sizer=None):
+        super().__init__(symbol, sizer)
         self.bb_window = bb_window
         self.bb_std = bb_std
         self.rsi_window = rsi_window
         self.rsi_overbought = rsi_overbought
         self.rsi_oversold = rsi_oversold
+        self.reset_state()
 
-    def _calculate_rsi(self, series, window):
-        delta = series.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-        rs = gain / loss
-        return 100 - (100 / (1 + rs))
+    def reset_state(self):
+        self._closes = RollingWindow(self.bb_window)
+        self._gains = RollingWindow(self.rsi_window)
+        self._losses = RollingWindow(self.rsi_window)
+        self._returns = RollingWindow(self.bb_window)
+        self._last_close = None
+        self._bars_seen = 0
+        self._position = 0
+        self._last_target = None
 
-    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
+    def update(self, bar) -> dict:
+        """
+        Streaming version of generate_signals for one bar.
+        Uses the same windowed (simple mean) RSI and sample std as the batch path.
+        """
+        close = self._bar_close(bar)
+        self._closes.push(close)
+
+        # pandas' diff()/pct_change() are NaN on the first bar; the RSI masks turn that into 0
+        if self._last_close is None:
+            delta = float('nan')
+            ret = float('nan')
+        else:
+            delta = close - self._last_close
+            ret = close / self._last_close - 1 if self._last_close != 0 else float('nan')
+        self._gains.push(delta if delta > 0 else 0.0)
+        self._losses.push(-delta if delta < 0 else 0.0)
+        self._returns.push(ret)
+        self._last_close = close
+
+        middle = self._closes.mean()
+        std_dev = self._closes.std()
+        upper = middle + self.bb_std * std_dev
+        lower = middle - self.bb_std * std_dev
+        rsi = self._rsi_from_windows()
+
+        signal_type = ''
+        if self._bars_seen >= max(self.bb_window, self.rsi_window):
+            buy, sell = self._entry_exit_masks(close, upper, lower, rsi)
+            if self._position == 0 and buy:
+                self._position = 1
+                signal_type = 'Buy (BB Breakout + RSI OK)'
+            elif self._position == 1 and sell:
+                self._position = 0
+                signal_type = 'Sell (Trend Broken)'
+        self._bars_seen += 1
+
+        target = float(self._position)
+        positions = float('nan') if self._last_target is None else target - self._last_target
+        self._last_target = target
+        return {
+            'volatility': self._returns.std(),
+            'target_position': target,
+            'signal_type': signal_type,
+            'positions': positions,
+        }
+
+    def _rsi_from_windows(self):
+        gain = self._gains.mean()
+        loss = self._losses.mean()
+        if math.isnan(gain) or math.isnan(loss) or (gain == 0 and loss == 0):
+            return float('nan')
+        if loss == 0:
+            return 100.0
+        return 100 - (100 / (1 + gain / loss))
+
+    def get_state(self) -> dict:
+        return {
+            'closes': self._closes.get_state(),
+            'gains': self._gains.get_state(),
+            'losses': self._losses.get_state(),
+            'returns': self._returns.get_state(),
+            'last_close': self._last_close,
+            'bars_seen': self._bars_seen,
+            'position': self._position,
+            'last_target': self._last_target,
+        }
+
+    def set_state(self, state: dict):
+        self._closes = RollingWindow.from_state(state['closes'])
+        self._gains = RollingWindow.from_state(state['gains'])
+        self._losses = RollingWindow.from_state(state['losses'])
+        self._returns = RollingWindow.from_state(state['returns'])
+        self._last_close = state['last_close']
+        self._bars_seen = state['bars_seen']
+        self._position = state['position']
+        self._last_target = state['last_target']
+
+    def position_state(self):
+        return self._position == 1
+
+    def set_position_state(self, long: bool):
+        self._position = 1 if long else 0
+
+    def compute_indicators(self, close, cache=None) -> dict:
+        middle = ind.rolling_mean(close, self.bb_window, cache=cache)
+        std_dev = ind.rolling_std(close, self.bb_window, cache=cache)
+        return {
+            'middle_band': middle,
+            'std_dev': std_dev,
+            'upper_band': middle + (self.bb_std * std_dev),
+            'lower_band': middle - (self.bb_std * std_dev),
+            'rsi': ind.rsi(close, self.rsi_window, cache=cache),
+            # Volatility (for position sizing later)
+            'volatility': ind.volatility(close, self.bb_window, cache=cache),
+        }
+
+    def generate_signals(self, data: pd.DataFrame, vectorized=True, indicator_cache=None, indicators=None) -> pd.DataFrame:
         """
         Generates Buy/Sell signals based on Bollinger Bands + RSI.
+        vectorized=False runs the original bar-by-bar loop, kept as a reference
+        implementation for parity checks.
+        indicator_cache is an indicators.IndicatorCache shared between strategies that
+        run on the same data, so each rolling window is computed once per window size.
+        indicators overrides the computation with compute_indicators() arrays aligned
+        with data, e.g. slices of arrays computed on a longer history.
         """
-        df = data.copy()
-        signals = pd.DataFrame(index=df.index)
-        
+        signals = pd.DataFrame(index=data.index)
+        close = data['close'].to_numpy(dtype=float)
+
         # --- 1. Calculate Indicators ---
-        
-        # Bollinger Bands
-        df['middle_band'] = df['close'].rolling(window=self.bb_window).mean()
-        df['std_dev'] = df['close'].rolling(window=self.bb_window).std()
-        df['upper_band'] = df['middle_band'] + (self.bb_std * df['std_dev'])
-        df['lower_band'] = df['middle_band'] - (self.bb_std * df['std_dev'])
-        
-        # RSI
-        df['rsi'] = self._calculate_rsi(df['close'], self.rsi_window)
-        
-        # Volatility (for position sizing later)
-        # We need to calculate this on df first, then copy to signals
-        df['volatility'] = df['close'].pct_change().rolling(window=self.bb_window).std()
-        signals['volatility'] = df['volatility']
+        if indicators is None:
+            indicators = self.compute_indicators(data['close'].to_numpy(), indicator_cache)
+        signals['volatility'] = indicators['volatility']
 
         # --- 2. Generate Signals ---
-        
+        if vectorized:
+            self._apply_signals_vectorized(close, indicators, signals)
+        else:
+            # The loop only reads the close and the indicators; no copy of the bars
+            df = pd.DataFrame(indicators, index=data.index)
+            df['close'] = close
+            self._apply_signals_loop(df, signals)
+            
+        signals['positions'] = signals['target_position'].diff()
+        return signals
+
+    def _entry_exit_masks(self, close, upper, lower, rsi):
+        """
+        Raw per-bar entry/exit conditions (see _apply_signals_loop for the rationale).
+        NaN indicators compare as False, exactly like the loop.
+        """
+        buy = (close > upper) & (rsi < self.rsi_overbought)
+        sell = close < lower
+        return buy, sell
+
+    def _apply_signals_vectorized(self, close, indicators, signals):
+        """
+        NumPy version of the "hold until trend broken" state machine.
+        Entry bars latch the position to 1 and exit bars latch it to 0; the
+        position on every other bar is the last latched value (forward fill).
+        """
+        buy, sell = self._entry_exit_masks(close, indicators['upper_band'], indicators['lower_band'], indicators['rsi'])
+        start = max(self.bb_window, self.rsi_window)
+        target, entries, exits = latch_positions(buy, sell, start)
+        if target is None:
+            # Entry and exit fired on the same bar (only possible with bb_std < 0),
+            # which makes the state toggle; fall back to the sequential rules.
+            df = pd.DataFrame(indicators, index=signals.index)
+            df['close'] = close
+            self._apply_signals_loop(df, signals)
+            return
+
+        signals['target_position'] = target
+        signals['signal_type'] = ''
+        signals.loc[entries, 'signal_type'] = 'Buy (BB Breakout + RSI OK)'
+        signals.loc[exits, 'signal_type'] = 'Sell (Trend Broken)'
+
+    def path_signals(self, close):
+        """
+        Target positions and volatility for a (bars x paths) close matrix, every path
+        at once; each column matches generate_signals on that close series.
+        """
+        close = np.asarray(close, dtype=float)
+        indicators = self.compute_indicators(close)
+        buy, sell = self._entry_exit_masks(close, indicators['upper_band'], indicators['lower_band'], indicators['rsi'])
+        start = max(self.bb_window, self.rsi_window)
+        # Paths where an entry and an exit fire on the same bar need the sequential rules
+        conflict = (buy[start:] & sell[start:]).any(axis=0)
+        target = np.zeros(close.shape)
+        clean = ~conflict
+        if clean.any():
+            target[:, clean] = latch_positions(buy[:, clean], sell[:, clean], start)[0]
+        for j in np.flatnonzero(conflict):
+            target[:, j] = self.generate_signals(pd.DataFrame({'close': close[:, j]}))['target_position']
+        return target, indicators['volatility']
+
+    def indicator_windows(self):
+        return (self.bb_window, self.rsi_window)
+
+    def chunk_signals(self, close, skip, offset, initial=0.0):
+        """
+        Target positions and volatility for one chunk of a longer history.
+        close holds `skip` lead-in bars (for the rolling windows, see
+        indicators.aligned_start) followed by the chunk; offset is the position of
+        close[0] in the whole history and initial the target before the chunk.
+        Matches generate_signals on the whole history, sliced to the chunk.
+        Chunks are seen once, so nothing goes into the indicator cache.
+        """
+        indicators = self.compute_indicators(close, cache=False)
+        close = np.asarray(close[skip:], dtype=float)
+        buy, sell = self._entry_exit_masks(close, indicators['upper_band'][skip:], indicators['lower_band'][skip:],
+                                           indicators['rsi'][skip:])
+        start = max(0, max(self.bb_window, self.rsi_window) - offset - skip)
+        target = latch_positions(buy, sell, start, initial)[0]
+        if target is None:
+            # Same sequential rules as _apply_signals_loop, from the carried state
+            target = np.empty(len(close))
+            position = initial
+            for i in range(len(close)):
+                if i >= start:
+                    if position == 0 and buy[i]:
+                        position = 1.0
+                    elif position == 1 and sell[i]:
+                        position = 0.0
+                target[i] = position
+        return target, indicators['volatility'][skip:]
+
+    def _apply_signals_loop(self, df, signals):
+        """
+        Reference implementation: walks the bars one at a time.
+        """
         # Initialize
         signals['target_position'] = 0.0  # 1 = Long, 0 = Cash
         signals['signal_type'] = ''      # Description
@@ -168,10 +445,10 @@ class BollingerRSIStrategy(BaseStrategy):
             # I will add a comment about this adjustment in the code.
             
             buy_signal_bb = price > upper
-            buy_signal_rsi = rsi < 70 # User said < 30, but that contradicts Price > Upper. < 70 allows for uptrend room.
+            buy_signal_rsi = rsi < self.rsi_overbought # User said < 30, but that contradicts Price > Upper. < 70 allows for uptrend room.
             
             sell_signal_bb = price < lower
-            sell_signal_rsi = rsi > 70 # User 2.3
+            sell_signal_rsi = rsi > self.rsi_overbought # User 2.3
             
             # 4.1 Buy Rule: Combined Buy Signal
             if position == 0:
@@ -192,21 +469,27 @@ class BollingerRSIStrategy(BaseStrategy):
                     signals.loc[df.index[i], 'signal_type'] = 'Sell (Trend Broken)'
                 else:
                     signals.loc[df.index[i], 'target_position'] = 1.0 # Hold
-            
-        signals['positions'] = signals['target_position'].diff()
-        return signals
 
 class SimpleMovingAverageStrategy(BaseStrategy):
     # Keeping the old strategy for reference or fallback
-    def __init__(self, symbol, short_window=20, long_window=50):
-        super().__init__(symbol)
+    def __init__(self, symbol, short_window=20, long_window=50, sizer=None):
+        super().__init__(symbol, sizer)
         self.short_window = short_window
         self.long_window = long_window
+        self.reset_state()
 
-    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
+    def compute_indicators(self, close, cache=None) -> dict:
+        return {
+            'short_mavg': ind.rolling_mean(close, self.short_window, min_periods=1, cache=cache),
+            'long_mavg': ind.rolling_mean(close, self.long_window, min_periods=1, cache=cache),
+        }
+
+    def generate_signals(self, data: pd.DataFrame, indicator_cache=None, indicators=None) -> pd.DataFrame:
+        if indicators is None:
+            indicators = self.compute_indicators(data['close'].to_numpy(), indicator_cache)
         signals = pd.DataFrame(index=data.index)
-        signals['short_mavg'] = data['close'].rolling(window=self.short_window, min_periods=1).mean()
-        signals['long_mavg'] = data['close'].rolling(window=self.long_window, min_periods=1).mean()
+        signals['short_mavg'] = indicators['short_mavg']
+        signals['long_mavg'] = indicators['long_mavg']
         
         condition = signals['short_mavg'] > signals['long_mavg']
         signals['signal'] = 0.0
@@ -218,3 +501,50 @@ class SimpleMovingAverageStrategy(BaseStrategy):
         signals['positions'] = signals['target_position'].diff()
         
         return signals
+
+    def reset_state(self):
+        self._short = RollingWindow(self.short_window)
+        self._long = RollingWindow(self.long_window)
+        self._bars_seen = 0
+        self._last_target = None
+
+    def update(self, bar) -> dict:
+        close = self._bar_close(bar)
+        self._short.push(close)
+        self._long.push(close)
+        short_mavg = self._short.partial_mean()
+        long_mavg = self._long.partial_mean()
+
+        target = 1.0 if short_mavg > long_mavg else 0.0
+        signal = target if self._bars_seen >= self.short_window else 0.0
+        self._bars_seen += 1
+
+        positions = float('nan') if self._last_target is None else target - self._last_target
+        self._last_target = target
+        return {
+            'short_mavg': short_mavg,
+            'long_mavg': long_mavg,
+            'signal': signal,
+            'target_position': target,
+            'positions': positions,
+        }
+
+    def get_state(self) -> dict:
+        return {
+            'short': self._short.get_state(),
+            'long': self._long.get_state(),
+            'bars_seen': self._bars_seen,
+            'last_target': self._last_target,
+        }
+
+    def set_state(self, state: dict):
+        self._short = RollingWindow.from_state(state['short'])
+        self._long = RollingWindow.from_state(state['long'])
+        self._bars_seen = state['bars_seen']
+        self._last_target = state['last_target']
+
+# Strategy names accepted by the optimizer, walk-forward and ensemble command lines
+STRATEGIES = {
+    "bbrsi": BollingerRSIStrategy,
+    "sma": SimpleMovingAverageStrategy,
+}
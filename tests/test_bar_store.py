@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+from alpaca.data.timeframe import TimeFrame
+
+from bar_store import BarStore, FakeStockDataClient
+from benchmark import synthetic_bars
+
+def test_cached_minute_bars_equal_the_downloaded_frame(tmp_path):
+    bars = synthetic_bars(5000)
+    store = BarStore(FakeStockDataClient({"TEST": bars}), cache_dir=str(tmp_path))
+    fresh = store.get_bars("TEST", bars.index[0], bars.index[-1], TimeFrame.Minute)
+    cached = BarStore(cache_dir=str(tmp_path), offline=True).get_bars("TEST", bars.index[0], bars.index[-1],
+                                                                       TimeFrame.Minute)
+    pd.testing.assert_frame_equal(cached, bars, check_freq=False)
+    pd.testing.assert_frame_equal(fresh, bars, check_freq=False)
+
+def test_compact_intraday_is_opt_in(tmp_path):
+    bars = synthetic_bars(1000)
+    store = BarStore(FakeStockDataClient({"TEST": bars}), cache_dir=str(tmp_path), compact_intraday=True)
+    cached = store.get_bars("TEST", bars.index[0], bars.index[-1], TimeFrame.Minute)
+    assert cached['close'].dtype == np.float32
+    np.testing.assert_allclose(cached['close'], bars['close'], rtol=1e-6)
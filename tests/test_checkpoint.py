@@ -0,0 +1,86 @@
+from datetime import timedelta
+import json
+
+import numpy as np
+import pytest
+from alpaca.data.timeframe import TimeFrame
+
+from bar_store import BarStore, FakeStockDataClient
+from benchmark import synthetic_bars
+from checkpoint import StrategyCheckpoint, reconcile_position
+from main import compute_signal
+from strategy import BollingerRSIStrategy
+
+@pytest.fixture
+def store(tmp_path):
+    bars = synthetic_bars(400, seed=3, start="2023-01-02", freq="D")
+    return BarStore(FakeStockDataClient({"X": bars}), cache_dir=str(tmp_path / "bar_cache")), bars
+
+def run_end(bars, k):
+    # A run during the session of bar k: naive UTC, like main.py's end_time
+    return bars.index[k].tz_convert(None) + timedelta(hours=12)
+
+def restored(checkpoint):
+    strategy = BollingerRSIStrategy("X")
+    assert checkpoint.restore(strategy, TimeFrame.Day) is not None
+    return strategy
+
+def test_daily_runs_from_the_checkpoint_match_a_full_replay(store, tmp_path):
+    store, bars = store
+    checkpoint = StrategyCheckpoint(str(tmp_path / "checkpoint.json"))
+    first_start = run_end(bars, 200) - timedelta(days=100)
+    for k in range(200, 260):
+        # A new process every run: fresh strategy, state only from the file
+        decision = compute_signal(store, BollingerRSIStrategy("X"), run_end(bars, k), checkpoint=checkpoint)
+        history = store.get_bars("X", first_start, run_end(bars, k), TimeFrame.Day)
+        expected = BollingerRSIStrategy("X").generate_signals(history).iloc[-1]
+        assert decision["signal"] == expected['target_position']
+        assert decision["volatility"] == pytest.approx(expected['volatility'], rel=1e-9)
+        # The newest bar may still be forming: the checkpoint stops one bar short of it
+        assert checkpoint._read()["X:1Day"]["last_bar"] == bars.index[k - 1].isoformat()
+
+def test_the_broker_position_overrides_the_checkpoint(store, tmp_path):
+    store, bars = store
+    checkpoint = StrategyCheckpoint(str(tmp_path / "checkpoint.json"))
+    compute_signal(store, BollingerRSIStrategy("X"), run_end(bars, 200), checkpoint=checkpoint)
+    strategy = restored(checkpoint)
+    strategy.set_position_state(True)
+    checkpoint.save(strategy, TimeFrame.Day, bars.index[199])
+
+    compute_signal(store, BollingerRSIStrategy("X"), run_end(bars, 201), checkpoint=checkpoint, held_qty=0)
+    assert restored(checkpoint).position_state() is False
+    compute_signal(store, BollingerRSIStrategy("X"), run_end(bars, 202), checkpoint=checkpoint, held_qty=10)
+    assert restored(checkpoint).position_state() is True
+
+def test_reconcile_position_only_changes_a_disagreeing_state():
+    strategy = BollingerRSIStrategy("X")
+    assert not reconcile_position(strategy, 0)
+    assert reconcile_position(strategy, 5) and strategy.position_state()
+    assert not reconcile_position(strategy, "5")
+
+def test_checkpoints_are_rejected_for_other_parameters_or_bad_files(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    strategy = BollingerRSIStrategy("X")
+    for close in np.linspace(100, 120, 30):
+        strategy.update({'close': close})
+    StrategyCheckpoint(path).save(strategy, TimeFrame.Day, "2024-01-02T00:00:00+00:00")
+
+    # Another instance reading the same file (e.g. the next run)
+    copy = BollingerRSIStrategy("X")
+    assert StrategyCheckpoint(path).restore(copy, TimeFrame.Day) is not None
+    assert json.dumps(copy.get_state()) == json.dumps(strategy.get_state())
+    assert StrategyCheckpoint(path).restore(BollingerRSIStrategy("X", bb_window=10), TimeFrame.Day) is None
+    assert StrategyCheckpoint(path).restore(BollingerRSIStrategy("X"), TimeFrame.Minute) is None
+
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert StrategyCheckpoint(path).restore(BollingerRSIStrategy("X"), TimeFrame.Day) is None
+
+def test_in_memory_checkpoint_keeps_a_snapshot_of_the_state():
+    checkpoint = StrategyCheckpoint(None)
+    strategy = BollingerRSIStrategy("X")
+    strategy.update({'close': 100.0})
+    checkpoint.save(strategy, TimeFrame.Day, "2024-01-02")
+    saved = json.dumps(strategy.get_state())
+    strategy.update({'close': 101.0})
+    assert json.dumps(restored(checkpoint).get_state()) == saved
@@ -0,0 +1,17 @@
+import numpy as np
+import pytest
+from alpaca.data.timeframe import TimeFrame
+
+from chunked_backtest import ChunkedBacktest, in_memory_backtest, synthetic_store
+from sizing import ATRRiskSizer
+from strategy import BollingerRSIStrategy
+
+@pytest.mark.parametrize("sizer", [None, ATRRiskSizer()])
+def test_chunks_match_the_in_memory_backtest(tmp_path, sizer):
+    store, start, end = synthetic_store(20000, "SYN", str(tmp_path))
+    strategy = BollingerRSIStrategy("SYN", sizer=sizer) if sizer else None
+    result = ChunkedBacktest(store, "SYN", start, end, TimeFrame.Minute, strategy=strategy, chunk_bars=3000).run()
+    expected = in_memory_backtest(store, "SYN", start, end, TimeFrame.Minute, strategy=strategy)
+    assert result['trades']
+    assert np.array_equal(result['equity'], expected['equity'])
+    assert result['trades'] == expected['trades']
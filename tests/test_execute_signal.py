@@ -0,0 +1,28 @@
+from ensemble import EnsembleRunner
+from mock_broker import MockTradingClient
+from risk import RiskLimits, RiskManager
+from strategy import BollingerRSIStrategy
+import main
+
+def book_client():
+    # $500k of BBB already held: a 60% gross exposure cap on $1M equity leaves $100k for AAA
+    return MockTradingClient(cash=500000.0, prices={"AAA": 100.0, "BBB": 100.0}, positions={"BBB": 5000})
+
+def test_buy_is_capped_by_the_rest_of_the_book(tmp_path, monkeypatch):
+    # log_orders writes the journal to the working directory
+    monkeypatch.chdir(tmp_path)
+    client = book_client()
+    decision = {"signal": 1, "price": 100.0, "volatility": 0.01, "atr": None}
+    risk = RiskManager(RiskLimits(max_gross_exposure=0.6))
+    main.execute_signal(client, client.get_account(), BollingerRSIStrategy("AAA"), decision, risk)
+    assert client.positions["AAA"] == 1000
+
+def test_ensemble_prices_held_symbols_no_member_evaluated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = book_client()
+    runner = EnsembleRunner([{"name": "bbrsi", "strategy": "bbrsi"}], ["AAA"], bar_store=object())
+    decisions = {"AAA": {"bbrsi": {"signal": 1.0, "price": 100.0, "volatility": 0.01, "reason": ""}}}
+    risk = RiskManager(RiskLimits(max_gross_exposure=0.6))
+    targets, _ = runner.execute(client, client.get_account(), decisions, risk=risk)
+    assert targets["AAA"] == 1000
+    assert client.positions["AAA"] == 1000
@@ -0,0 +1,62 @@
+import threading
+import time
+
+from alpaca.trading.enums import OrderSide
+
+from execution import OrderExecutor, TokenBucket, compute_order_deltas
+from mock_broker import MockTradingClient
+
+def test_order_deltas_net_targets_against_positions():
+    orders = compute_order_deltas({"A": 10, "B": 0, "C": 5, "E": 2}, {"A": 4, "B": 7, "C": 5, "D": 3, "E": 5})
+    # C is already on target and D is not in the targets: no orders for either
+    assert orders == [("A", OrderSide.BUY, 6, False), ("B", OrderSide.SELL, 7, True), ("E", OrderSide.SELL, 3, False)]
+
+def test_token_bucket_bursts_then_holds_the_rate():
+    bucket = TokenBucket(rate=50, capacity=5)
+    started = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - started < 0.05
+    for _ in range(10):
+        bucket.acquire()
+    # 10 more tokens at 50 per second
+    assert 0.18 <= time.monotonic() - started < 0.5
+
+def test_token_bucket_is_shared_between_threads():
+    bucket = TokenBucket(rate=200, capacity=10)
+    started = time.monotonic()
+    threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(10)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 40 tokens, 10 of them from the initial burst
+    assert time.monotonic() - started >= 30 / 200 - 0.01
+
+def test_rebalance_retries_rate_limited_calls_and_sells_first():
+    symbols = [f"S{i}" for i in range(30)]
+    positions = {s: 10 for s in symbols[:15]}
+    client = MockTradingClient(prices={s: 50.0 for s in symbols}, positions=positions, rate_limit_every=4)
+    executor = OrderExecutor(client, max_workers=8, requests_per_minute=6000, backoff=0.001)
+    targets = {s: 0 for s in symbols[:10]}
+    targets.update({s: 5 for s in symbols[15:]})
+    results = executor.rebalance(targets)
+    assert len(results) == 25 and not [r for r in results if r["error"]]
+    # One positions call and 25 orders, plus the retried 429s
+    assert client.calls > 1 + 25
+    assert {s: q for s, q in client.positions.items() if q} == {**{s: 10 for s in symbols[10:15]},
+                                                                **{s: 5 for s in symbols[15:]}}
+    sides = [order.side for order in client.orders]
+    assert sides == sorted(sides, key=lambda side: side != "sell")
+
+def test_rebalance_reports_errors_without_retrying_them():
+    client = MockTradingClient(prices={"A": 10.0})
+    executor = OrderExecutor(client, requests_per_minute=6000, max_retries=2, backoff=0.001)
+    unknown, = executor.submit_orders([("X", OrderSide.BUY, 1, False)])
+    assert "not tradable" in unknown["error"] and client.calls == 1
+
+    client = MockTradingClient(prices={"A": 10.0}, rate_limit_every=1)
+    executor = OrderExecutor(client, requests_per_minute=6000, max_retries=2, backoff=0.001)
+    throttled, = executor.submit_orders([("A", OrderSide.BUY, 1, False)])
+    # Every call is rate limited: the first try plus max_retries
+    assert "rate limit" in throttled["error"] and client.calls == 1 + 2
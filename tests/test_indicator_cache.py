@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+import indicators as ind
+from benchmark import synthetic_bars
+from strategy import BollingerRSIStrategy
+
+def test_cache_counts_the_frame_behind_a_column_view():
+    df = pd.DataFrame(np.random.default_rng(0).random((100000, 5)), columns=list("abcde"))
+    block = ind._owner(df['a'].to_numpy()).nbytes
+    assert block >= df.memory_usage(index=False).sum()
+
+    cache = ind.IndicatorCache()
+    close = df['a'].to_numpy()
+    ind.rolling_mean(close, 20, cache=cache)
+    ind.rolling_std(close, 20, cache=cache)
+    # Results plus the shared block, counted once
+    assert cache.nbytes == 2 * close.nbytes + block
+
+    small = ind.IndicatorCache(max_bytes=block // 2)
+    ind.rolling_mean(close, 20, cache=small)
+    assert len(small) == 0 and small.nbytes == 0
+
+def test_cache_hits_and_eviction_release_bytes():
+    cache = ind.IndicatorCache(maxsize=2)
+    series = [np.random.default_rng(k).random(1000) for k in range(3)]
+    for x in series:
+        ind.rolling_mean(x, 10, cache=cache)
+    assert len(cache) == 2 and cache.nbytes == 4 * series[0].nbytes
+    ind.rolling_mean(series[2], 10, cache=cache)
+    assert cache.hits == 1
+    cache.clear()
+    assert cache.nbytes == 0
+
+def test_signals_follow_in_place_edits_of_the_frame():
+    df = synthetic_bars(2000)
+    BollingerRSIStrategy("X").generate_signals(df)
+    noise = np.random.default_rng(1).normal(0, 0.5, len(df))
+    df.loc[:, 'close'] = df['close'].to_numpy() + noise
+    again = BollingerRSIStrategy("X").generate_signals(df)
+    pd.testing.assert_frame_equal(again, BollingerRSIStrategy("X").generate_signals(df.copy()))
+
+def test_atr_entries_hold_high_and_low():
+    rng = np.random.default_rng(2)
+    close = 100 + rng.normal(0, 1, 1000).cumsum()
+    high, low = close + rng.random(1000), close - rng.random(1000)
+    cache = ind.IndicatorCache()
+    result = ind.atr(high, low, close, 14, cache=cache)
+    # The result plus all three inputs, which stay alive so their addresses cannot be reused
+    assert cache.nbytes == result.nbytes + high.nbytes + low.nbytes + close.nbytes
+    ind.atr(high, low + 1, close, 14, cache=cache)
+    assert cache.hits == 0 and len(cache) == 2
+    cache.clear()
+    assert cache.nbytes == 0
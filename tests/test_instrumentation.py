@@ -0,0 +1,22 @@
+import urllib.request
+
+import instrumentation
+
+def test_metrics_endpoint_is_local_by_default():
+    server = instrumentation.serve(0)
+    try:
+        host, port = server.server_address
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert response.status == 200
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_metrics_host_can_be_widened():
+    server = instrumentation.serve(0, host="0.0.0.0")
+    try:
+        assert server.server_address[0] == "0.0.0.0"
+    finally:
+        server.shutdown()
+        server.server_close()
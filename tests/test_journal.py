@@ -0,0 +1,52 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from journal import open_journal
+
+LEGACY_CSV = """Timestamp,Equity,Cash,Buying_Power,Symbol,Position_Qty
+2024-01-15 15:55:00,100000.0,50000.0,100000.0,AVGO,10
+2024-07-15 15:55:00,101000.0,51000.0,101000.0,AVGO,0
+"""
+
+@pytest.fixture
+def new_york_clock():
+    # The legacy log holds naive datetime.now() stamps of the machine's zone
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = "America/New_York"
+    time.tzset()
+    yield
+    if previous is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = previous
+    time.tzset()
+
+def test_legacy_csv_timestamps_are_local_time(tmp_path, new_york_clock):
+    csv = tmp_path / "performance_log.csv"
+    csv.write_text(LEGACY_CSV)
+    with open_journal(str(tmp_path / "journal.db"), legacy_csv=str(csv)) as journal:
+        snapshots = journal.snapshots()
+        # EST in January, EDT in July
+        assert list(snapshots.index) == [pd.Timestamp("2024-01-15 20:55", tz="UTC"),
+                                         pd.Timestamp("2024-07-15 19:55", tz="UTC")]
+        journal.export_csv(str(tmp_path / "exported.csv"))
+        journal.export_csv(str(tmp_path / "exported_utc.csv"), tz="UTC")
+    exported = pd.read_csv(tmp_path / "exported.csv")
+    assert list(exported["Timestamp"]) == ["2024-01-15 15:55:00", "2024-07-15 15:55:00"]
+    assert "2024-07-15 19:55:00" in (tmp_path / "exported_utc.csv").read_text()
+
+def test_explicit_zone_overrides_the_local_one(tmp_path, new_york_clock):
+    csv = tmp_path / "performance_log.csv"
+    csv.write_text(LEGACY_CSV)
+    with open_journal(str(tmp_path / "journal.db"), legacy_csv="") as journal:
+        journal.import_csv(str(csv), tz="Europe/London")
+        assert journal.snapshots().index[0] == pd.Timestamp("2024-01-15 15:55", tz="UTC")
+
+def test_readers_do_not_create_a_journal(tmp_path):
+    path = tmp_path / "mistyped.db"
+    with pytest.raises(FileNotFoundError):
+        open_journal(str(path), create=False)
+    assert not path.exists()
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark import synthetic_universe
+from portfolio_backtest import generate_universe_signals, simulate_portfolio
+from sizing import ATRRiskSizer, VolatilityTargetSizer
+from strategy import BollingerRSIStrategy
+
+def universe(seed, n_symbols=5, n_bars=400):
+    # Symbols miss random bars, so the union index has gaps per symbol
+    rng = np.random.default_rng(seed)
+    frames = synthetic_universe(n_symbols, n_bars, seed=seed * 100)
+    return {s: df[rng.random(len(df)) > 0.1] for s, df in frames.items()}
+
+def reference_portfolio(frames, signals, strategy, initial_capital):
+    """
+    Bar by bar, symbol by symbol, with scalar sizing calls: exits first, then
+    entries sized on an equal share of the portfolio value (or the cash left).
+    """
+    symbols = list(frames)
+    index = sorted(set().union(*(df.index for df in frames.values())))
+    atr = {s: strategy.sizer.prepare(df).get("atr") for s, df in frames.items()}
+    cash, holdings, last = initial_capital, dict.fromkeys(symbols, 0), dict.fromkeys(symbols, 0.0)
+    equity = []
+    for ts in index:
+        bars = {s: frames[s].index.get_loc(ts) for s in symbols if ts in frames[s].index}
+        for s, i in bars.items():
+            last[s] = frames[s]['close'].iloc[i]
+        for s, i in bars.items():
+            if signals[s]['target_position'].iloc[i] == 0 and holdings[s] > 0:
+                cash += holdings[s] * last[s]
+                holdings[s] = 0
+        sleeve = (cash + sum(holdings[s] * last[s] for s in symbols)) / len(symbols)
+        for s in symbols:
+            if s not in bars or signals[s]['target_position'].iloc[bars[s]] != 1 or holdings[s]:
+                continue
+            i = bars[s]
+            shares = strategy.calculate_position_size(
+                last[s], sleeve if cash >= sleeve else cash, volatility=signals[s]['volatility'].iloc[i],
+                atr=atr[s][i] if atr[s] is not None else None)
+            if shares > 0 and shares * last[s] <= cash:
+                holdings[s] = shares
+                cash -= shares * last[s]
+        equity.append(cash + sum(holdings[s] * last[s] for s in symbols))
+    return pd.Series(equity, index=pd.DatetimeIndex(index)), holdings, cash
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("sizer", [None, VolatilityTargetSizer(), ATRRiskSizer()])
+def test_shared_cash_simulation_matches_a_scalar_loop(seed, sizer):
+    frames = universe(seed)
+    signals = generate_universe_signals(frames, max_workers=1)
+    strategy = BollingerRSIStrategy(None, sizer=sizer)
+    result = simulate_portfolio(frames, signals, strategy)
+    equity, holdings, cash = reference_portfolio(frames, signals, strategy, 1000000.0)
+    assert result['trades'] > 0
+    np.testing.assert_allclose(result['equity'].to_numpy(), equity.to_numpy(), rtol=1e-12)
+    assert result['holdings'] == pytest.approx(holdings)
+    assert result['cash'] == pytest.approx(cash)
+
+def test_parallel_signals_match_the_serial_ones():
+    frames = universe(7)
+    serial = generate_universe_signals(frames, max_workers=1)
+    parallel = generate_universe_signals(frames, max_workers=2)
+    assert list(parallel) == list(serial)
+    for symbol in serial:
+        pd.testing.assert_frame_equal(parallel[symbol], serial[symbol])
+
+def test_entries_are_resized_to_the_cash_left():
+    index = pd.date_range("2024-01-02", periods=3, freq="D", tz="UTC")
+    frames = {"A": pd.DataFrame({"close": [10.0, 20.0, 20.0]}, index=index),
+              "B": pd.DataFrame({"close": [10.0, 10.0, 10.0]}, index=index)}
+    signals = {"A": pd.DataFrame({"target_position": [1.0, 1.0, 1.0], "volatility": np.nan}, index=index),
+               "B": pd.DataFrame({"target_position": [0.0, 0.0, 1.0], "volatility": np.nan}, index=index)}
+    result = simulate_portfolio(frames, signals, BollingerRSIStrategy(None), initial_capital=1000.0)
+    # A: 95% of a $500 sleeve. After A doubles the sleeve is $735 but only $530 is cash: B gets 95% of that
+    assert result['holdings'] == {"A": 47, "B": 50}
+    assert result['cash'] == pytest.approx(30.0)
+    assert result['equity'].iloc[-1] == pytest.approx(1470.0)
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import robustness
+from robustness import block_bootstrap_indices, bootstrap_equity, bootstrap_prices, delay_signals, run_robustness
+from simulator import SlippageModel, simulate_arrays, simulate_paths
+from strategy import BollingerRSIStrategy
+
+class FixedDelays:
+    """
+    Stand-in for a Generator: hands out the given delays in order.
+    """
+    def __init__(self, delays):
+        self.delays = np.asarray(delays)
+
+    def integers(self, low, high, size):
+        assert len(self.delays) == size and ((self.delays >= low) & (self.delays < high)).all()
+        return self.delays
+
+def random_close(seed, n=400, paths=None):
+    rng = np.random.default_rng(seed)
+    shape = (n,) if paths is None else (paths, n)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.015, shape), axis=-1))
+
+def random_target(seed, paths, n):
+    rng = np.random.default_rng(seed)
+    return np.repeat(rng.integers(0, 2, (paths, n // 4 + 1)), rng.integers(1, 6), axis=1)[:, :n].astype(float)
+
+@pytest.mark.parametrize("n, block", [(100, 10), (101, 7), (5, 20), (50, 1)])
+def test_bootstrap_indices_are_wrapped_blocks(n, block):
+    idx = block_bootstrap_indices(n, 30, block, np.random.default_rng(0))
+    assert idx.shape == (30, n) and idx.min() >= 0 and idx.max() < n
+    block = min(block, n)
+    steps = (np.diff(idx, axis=1) % n)[:, np.arange(1, n) % block != 0]
+    # Within a block the indices run on by one (mod n)
+    assert (steps == 1).all()
+
+def test_bootstrapped_paths_reuse_the_original_returns():
+    close = random_close(1, 250)
+    rng = np.random.default_rng(2)
+    paths = bootstrap_prices(close, 20, 10, rng)
+    assert paths.shape == (20, 250) and (paths[:, 0] == close[0]).all()
+    log_returns = np.diff(np.log(close))
+    assert np.isin(np.round(np.diff(np.log(paths), axis=1), 12), np.round(log_returns, 12)).all()
+
+    equity = bootstrap_equity(close * 1000, 20, 10, rng)
+    assert equity.shape == (20, 250) and (equity[:, 0] == close[0] * 1000).all()
+    assert np.isin(np.round(equity[:, 1:] / equity[:, :-1] - 1, 12), np.round(close[1:] / close[:-1] - 1, 12)).all()
+
+def test_delay_signals_moves_each_event_by_its_own_delay():
+    target = np.array([[0, 1, 1, 1, 0, 0, 1, 1, 0, 0]], dtype=float)
+    # Entry +2, exit +1, entry +0, exit +3
+    delayed = delay_signals(target, 3, FixedDelays([2, 1, 0, 3]))
+    assert list(delayed[0]) == [0, 0, 0, 1, 1, 0, 1, 1, 1, 1]
+
+def test_delayed_exit_catching_up_cancels_the_trade():
+    target = np.array([[0, 1, 0, 0, 1, 0, 0, 0]], dtype=float)
+    # The first exit is not delayed but cannot overtake its entry (+2): both land on bar 3.
+    # The second trade's exit is pushed past the last bar, so it never happens
+    delayed = delay_signals(target, 5, FixedDelays([2, 0, 1, 5]))
+    assert list(delayed[0]) == [0, 0, 0, 0, 0, 1, 1, 1]
+
+@pytest.mark.parametrize("max_delay", [0, 1, 3])
+def test_delayed_targets_stay_within_max_delay_of_the_original(max_delay):
+    target = random_target(4, 50, 300)
+    delayed = delay_signals(target, max_delay, np.random.default_rng(max_delay))
+    assert delayed.shape == target.shape and set(np.unique(delayed)) <= {0.0, 1.0}
+    # Long at t only if the original was long somewhere in [t - max_delay, t], and always long
+    # when the original was long on all of those bars
+    # (flat before the first bar)
+    n = target.shape[1]
+    padded = np.hstack([np.zeros((len(target), max_delay)), target])
+    window = np.stack([padded[:, max_delay - k:max_delay - k + n] for k in range(max_delay + 1)])
+    assert (delayed <= window.max(axis=0)).all()
+    assert (delayed >= window.min(axis=0)).all()
+
+@pytest.mark.parametrize("seed", range(4))
+def test_paths_match_simulate_arrays_row_by_row(seed):
+    close = random_close(seed, 300, paths=40)
+    strategy = BollingerRSIStrategy(None)
+    target, volatility = strategy.path_signals(close.T)
+    target, volatility = delay_signals(target.T, 1, np.random.default_rng(seed)), volatility.T
+    bps = np.random.default_rng(seed).uniform(0, 20, 40)
+    # Small accounts too, where some entries cannot afford a share
+    capital = 2000.0 if seed % 2 else 1000000.0
+    result = simulate_paths(close, target, strategy, volatility, capital,
+                            slippage_bps=np.broadcast_to(bps[:, None], close.shape))
+    for i in range(len(close)):
+        row = simulate_arrays(close[i], target[i], strategy, volatility[i], capital, slippage=SlippageModel(bps[i]))
+        np.testing.assert_allclose(result['equity'][i], row['equity'], rtol=1e-12)
+        assert result['trades'][i] == len(row['trades'])
+
+@pytest.mark.parametrize("params", [{}, {"bb_window": 10, "rsi_window": 7}, {"bb_std": -0.5, "rsi_overbought": 101}])
+def test_path_signals_match_generate_signals(params):
+    close = random_close(5, 300, paths=8)
+    strategy = BollingerRSIStrategy(None, **params)
+    target, volatility = strategy.path_signals(close.T)
+    for j, path in enumerate(close):
+        signals = strategy.generate_signals(pd.DataFrame({'close': path}))
+        np.testing.assert_array_equal(target[:, j], signals['target_position'])
+        np.testing.assert_allclose(volatility[:, j], signals['volatility'], rtol=1e-9)
+
+@pytest.mark.parametrize("method", robustness.METHODS)
+def test_results_depend_on_the_seed_not_the_workers(method, monkeypatch):
+    monkeypatch.setattr(robustness, "CHUNK_PATHS", 40)
+    close = random_close(6, 300)
+    serial = run_robustness(close, 100, method=method, seed=7, max_workers=1)
+    parallel = run_robustness(close, 100, method=method, seed=7, max_workers=2)
+    assert serial["base"] == parallel["base"]
+    for metric in ("total_return", "max_drawdown", "sharpe", "cagr"):
+        assert len(serial[metric]) == 100
+        np.testing.assert_array_equal(serial[metric], parallel[metric])
+    other = run_robustness(close, 100, method=method, seed=8, max_workers=1)
+    assert not np.array_equal(serial["total_return"], other["total_return"])
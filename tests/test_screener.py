@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from alpaca.data.timeframe import TimeFrame
+
+from bar_store import BarStore, FakeStockDataClient
+from benchmark import synthetic_universe
+from screener import SCORES, Screener, cross_rank, top_n_mask
+
+def gappy_close(seed, n_bars=300, n_symbols=12, missing=0.02):
+    # Symbols that list late, halt for a while or trade below min_price
+    rng = np.random.default_rng(seed)
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_bars, n_symbols)), axis=0))
+    close[:rng.integers(0, 200), 0] = np.nan
+    close[100:130, 1] = np.nan
+    close[-1, 2] = np.nan
+    close[rng.random(close.shape) < missing] = np.nan
+    close[:, 3] = rng.uniform(1, 4, n_bars)
+    return close
+
+@pytest.mark.parametrize("seed", range(5))
+def test_cross_rank_is_a_per_row_percentile_rank(seed):
+    rng = np.random.default_rng(seed)
+    # Ties, NaN gaps and an all-NaN row
+    scores = rng.integers(0, 5, (50, 8)).astype(float)
+    scores[rng.random(scores.shape) < 0.2] = np.nan
+    scores[7] = np.nan
+    expected = pd.DataFrame(scores).rank(axis=1, method="first", pct=True).to_numpy()
+    np.testing.assert_allclose(cross_rank(scores), expected)
+
+@pytest.mark.parametrize("n", [0, 1, 3, 8, 20])
+def test_top_n_mask_picks_the_best_valid_scores(n):
+    rng = np.random.default_rng(n)
+    scores = rng.random((40, 8))
+    scores[rng.random(scores.shape) < 0.3] = np.nan
+    mask = top_n_mask(scores, n)
+    for row, picked in zip(scores, mask):
+        valid = np.flatnonzero(~np.isnan(row))
+        best = valid[np.argsort(-row[valid])][:n]
+        assert set(np.flatnonzero(picked)) == set(best)
+
+@pytest.mark.parametrize("seed", range(3))
+def test_matrix_indicators_match_each_symbol_alone(seed):
+    screener = Screener()
+    close = gappy_close(seed)
+    matrix = screener.compute_indicators(close)
+    for j in range(close.shape[1]):
+        column = screener.compute_indicators(np.ascontiguousarray(close[:, j]))
+        for name in matrix:
+            np.testing.assert_allclose(matrix[name][:, j], column[name], rtol=1e-9, atol=1e-12, err_msg=name)
+
+@pytest.mark.parametrize("seed", range(3))
+def test_scores_combine_the_weighted_ranks(seed):
+    weights = {"breakout": 1.0, "momentum": 0.5, "volatility": -0.5, "rsi": 0.25}
+    screener = Screener(weights, min_price=5.0)
+    close = gappy_close(seed)
+    data = screener.compute_indicators(close)
+    expected = sum(weight * pd.DataFrame(SCORES[name](close, data, screener)).rank(axis=1, method="first", pct=True)
+                   for name, weight in weights.items()).to_numpy(copy=True)
+    expected[~(close >= 5.0)] = np.nan
+    np.testing.assert_allclose(screener.score(close), expected)
+
+def test_select_skips_halted_and_cheap_symbols():
+    # Only the halts: a random missing bar within a window would leave that symbol unscored
+    close = gappy_close(0, missing=0)
+    symbols = [f"S{j}" for j in range(close.shape[1])]
+    picks = Screener(top_n=20).select(symbols, close)
+    picked = [symbol for symbol, _ in picks]
+    # S2 has no last bar and S3 trades below $5
+    assert "S2" not in picked and "S3" not in picked
+    assert len(picked) == close.shape[1] - 2
+    assert [score for _, score in picks] == sorted((score for _, score in picks), reverse=True)
+
+def test_screen_reads_the_universe_from_the_bar_store(tmp_path):
+    frames = synthetic_universe(6, 200)
+    # One symbol lists late, another misses bars: the matrix has NaN gaps there
+    frames["S0001"] = frames["S0001"].iloc[120:]
+    frames["S0002"] = frames["S0002"].iloc[::2]
+    store = BarStore(FakeStockDataClient(frames), cache_dir=str(tmp_path))
+    end = frames["S0000"].index[-1]
+    screener = Screener(top_n=3, min_price=0)
+    picks = screener.screen(store, list(frames), end.tz_convert(None), lookback_days=250)
+    index, symbols, close = store.get_matrix(list(frames), end - pd.Timedelta(days=250), end, TimeFrame.Day)
+    assert np.isnan(close[:, symbols.index("S0001")]).sum() == 120
+    assert picks == screener.select(symbols, close)
+    assert len(picks) == 3
@@ -0,0 +1,49 @@
+"""
+The vectorized signal path (latch_positions) must reproduce the reference
+bar-by-bar loop (_apply_signals_loop) exactly.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategy import BollingerRSIStrategy, latch_positions
+
+def random_bars(seed, n=600):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, rng.uniform(0.002, 0.03), n)))
+    # Flat runs: repeated closes give zero std and zero gains/losses
+    for start in rng.integers(0, n - 30, size=3):
+        close[start:start + rng.integers(5, 30)] = close[start]
+    index = pd.date_range("2020-01-01", periods=n, freq="D", tz="UTC", name="timestamp")
+    return pd.DataFrame({"close": close}, index=index)
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize("params", [{}, {"bb_window": 10, "rsi_window": 5, "bb_std": 1.0},
+                                    {"bb_window": 30, "rsi_window": 21, "rsi_overbought": 60}])
+def test_vectorized_matches_loop(seed, params):
+    df = random_bars(seed)
+    strategy = BollingerRSIStrategy("TEST", **params)
+    pd.testing.assert_frame_equal(strategy.generate_signals(df), strategy.generate_signals(df, vectorized=False))
+
+@pytest.mark.parametrize("seed", range(10))
+def test_same_bar_conflict_falls_back_to_loop(seed):
+    # A negative band width puts the upper band below the lower one, so a close
+    # between them is both an entry and an exit
+    df = random_bars(seed)
+    strategy = BollingerRSIStrategy("TEST", bb_std=-0.5, rsi_overbought=101)
+    indicators = strategy.compute_indicators(df['close'].to_numpy())
+    buy, sell = strategy._entry_exit_masks(df['close'].to_numpy(), indicators['upper_band'],
+                                           indicators['lower_band'], indicators['rsi'])
+    assert latch_positions(buy, sell, max(strategy.bb_window, strategy.rsi_window))[0] is None
+
+    vectorized = strategy.generate_signals(df)
+    pd.testing.assert_frame_equal(vectorized, strategy.generate_signals(df, vectorized=False))
+    assert (vectorized['target_position'] == 1).any()
+
+def test_latch_positions_initial_state():
+    buy = np.array([False, True, False, False, False])
+    sell = np.array([False, False, False, True, False])
+    target, entries, exits = latch_positions(buy, sell, initial=1.0)
+    assert target.tolist() == [1.0, 1.0, 1.0, 0.0, 0.0]
+    assert entries.tolist() == [False] * 5
+    assert exits.tolist() == [False, False, False, True, False]
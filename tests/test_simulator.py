@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import simulate
+from benchmark import synthetic_bars
+from simulator import CommissionModel, SlippageModel, simulate_arrays
+from strategy import BollingerRSIStrategy
+
+def random_signals(df, seed):
+    # Random long/flat runs with NaN gaps (no decision) in between
+    rng = np.random.default_rng(seed)
+    target = np.repeat(rng.choice([0.0, 1.0, np.nan], size=len(df) // 5 + 1, p=[0.45, 0.45, 0.1]), 5)[:len(df)]
+    volatility = np.abs(rng.normal(0.02, 0.01, len(df)))
+    return pd.DataFrame({"target_position": target, "volatility": volatility}, index=df.index)
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("capital", [1000000.0, 150.0, 50.0])
+def test_array_simulation_matches_the_per_bar_loop(seed, capital):
+    df = synthetic_bars(1500, seed, freq="D")
+    signals = random_signals(df, seed)
+    strategy = BollingerRSIStrategy("X")
+    fast = simulate(df, signals, strategy, capital)
+    loop = simulate(df, signals, strategy, capital, vectorized=False)
+    np.testing.assert_allclose(fast.to_numpy(), loop.to_numpy(), rtol=1e-12)
+
+def test_costs_and_exit_prices_apply_to_the_fills():
+    close = np.array([100.0, 110.0, 120.0, 130.0])
+    target = np.array([1.0, 1.0, 0.0, 0.0])
+    exit_prices = np.array([np.nan, np.nan, 115.0, np.nan])
+    result = simulate_arrays(close, target, BollingerRSIStrategy("X"), initial_capital=10000.0,
+                             slippage=SlippageModel(bps=10), commission=CommissionModel(per_share=0.01, minimum=1.0),
+                             exit_prices=exit_prices)
+    # 95% of $10,000 at $100: 95 shares, filled 10 bps above the close and 10 bps below the stop price
+    (entry, exit_, shares, entry_fill, exit_fill), = result['trades']
+    assert (entry, exit_, shares) == (0, 2, 95)
+    assert entry_fill == pytest.approx(100.1) and exit_fill == pytest.approx(115 * 0.999)
+    cash = 10000.0 - 95 * 100.1 - 1.0 + 95 * 115 * 0.999 - 1.0
+    assert result['cash'][-1] == pytest.approx(cash)
+    assert list(result['holdings']) == [95, 95, 0, 0]
+
+def test_initial_holdings_close_at_the_first_flat_bar():
+    close = np.array([10.0, 11.0, 12.0])
+    result = simulate_arrays(close, np.array([1.0, 0.0, 1.0]), BollingerRSIStrategy("X"),
+                             initial_capital=100.0, initial_holdings=5)
+    assert result['trades'][0] == (None, 1, 5, None, 11.0)
+    assert list(result['holdings'][:2]) == [5, 0]
+    assert result['equity'][0] == pytest.approx(150.0)
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sizing import (ATRRiskSizer, EqualRiskSizer, FixedFractionSizer, KellySizer, VolatilityTargetSizer,
+                    erc_weights, make_sizer)
+
+def random_covariance(seed, n):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.01, (250, n)) * rng.uniform(0.5, 3, n) + rng.normal(0, 0.01, (250, 1))
+    return np.cov(returns, rowvar=False)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_erc_weights_equalize_risk_contributions(seed):
+    cov = random_covariance(seed, 6)
+    w = erc_weights(cov)
+    contributions = w * (cov @ w)
+    assert w.sum() == pytest.approx(1.0) and (w > 0).all()
+    np.testing.assert_allclose(contributions, contributions.mean(), rtol=1e-6)
+
+def test_erc_weights_without_correlation_are_inverse_volatility():
+    vol = np.array([0.1, 0.2, 0.4])
+    np.testing.assert_allclose(erc_weights(np.diag(vol ** 2)), (1 / vol) / (1 / vol).sum())
+    assert len(erc_weights(np.empty((0, 0)))) == 0
+
+def test_shares_are_zero_for_unusable_prices_and_budgets():
+    sizer = FixedFractionSizer()
+    assert sizer.shares(100.0, 10000.0) == 95 and isinstance(sizer.shares(100.0, 10000.0), int)
+    shares = sizer.shares(np.array([100.0, 0.0, -5.0, np.nan, 100.0]), np.array([1e4, 1e4, 1e4, 1e4, np.nan]))
+    assert shares.dtype == np.int64 and list(shares) == [95, 0, 0, 0, 0]
+
+def test_fixed_fraction_scales_down_only_on_high_volatility():
+    shares = FixedFractionSizer().shares(np.full(3, 100.0), 10000.0, volatility=np.array([0.01, 0.03, np.nan]))
+    assert list(shares) == [95, 76, 95]
+
+def test_volatility_target_falls_back_to_the_cap():
+    sizer = VolatilityTargetSizer(target_volatility=0.15, max_fraction=0.95)
+    # Zero or NaN volatility: the cap. Otherwise target / annualized volatility of capital
+    shares = sizer.shares(np.full(4, 100.0), 100000.0, volatility=np.array([0.0, np.nan, 0.01, 0.1]))
+    assert list(shares[:2]) == [950, 950]
+    assert shares[2] == int(100000 * 0.15 / (0.01 * np.sqrt(252)) / 100)
+    assert shares[3] == int(100000 * 0.15 / (0.1 * np.sqrt(252)) / 100)
+    assert sizer.shares(100.0, 100000.0) == 950
+
+def test_atr_sizer_needs_a_usable_atr():
+    sizer = ATRRiskSizer(risk_per_trade=0.01, atr_multiple=2.0, max_fraction=0.95)
+    assert sizer.shares(100.0, 100000.0) == 0
+    shares = sizer.shares(np.full(4, 100.0), 100000.0, atr=np.array([0.0, np.nan, 2.0, 0.01]))
+    # $1,000 at risk over a $4 stop is 250 shares; a tiny ATR hits the 95% cap
+    assert list(shares) == [0, 0, 250, 950]
+
+def test_atr_sizer_prepare_needs_high_low_close():
+    sizer = ATRRiskSizer(window=3)
+    assert sizer.prepare(pd.DataFrame({"close": [1.0, 2.0, 3.0]})) == {}
+    bars = pd.DataFrame({"high": [2.0, 3.0, 4.0, 5.0], "low": [1.0, 2.0, 3.0, 4.0], "close": [1.5, 2.5, 3.5, 4.5]})
+    atr = sizer.prepare(bars)["atr"]
+    assert np.isnan(atr[:2]).all() and atr[3] == pytest.approx(1.5)
+
+def test_kelly_never_goes_short_or_above_the_cap():
+    assert KellySizer(0.3, 1.0).shares(100.0, 10000.0) == 0
+    assert KellySizer(0.6, 0.0).shares(100.0, 10000.0) == 0
+    # f* = 0.5 - 0.5 / 2 = 0.25, half-Kelly 0.125
+    assert KellySizer(0.5, 2.0).shares(100.0, 10000.0) == 12
+    assert KellySizer(0.99, 100.0, kelly_fraction=1.0).shares(100.0, 10000.0) == 95
+    assert KellySizer.from_report({"win_rate": 0.5, "avg_win": None, "avg_loss": -1.0}).shares(100.0, 1e4) == 0
+    assert KellySizer.from_report({"win_rate": 0.6, "avg_win": 2.0, "avg_loss": -1.0}).payoff_ratio == 2.0
+
+def test_equal_risk_drops_entries_without_volatility():
+    sizer = EqualRiskSizer(max_fraction=1.0)
+    shares = sizer.shares(np.full(4, 10.0), 1000.0, volatility=np.array([0.01, 0.02, 0.0, np.nan]))
+    assert list(shares) == [66, 33, 0, 0]
+    assert list(sizer.shares(np.full(2, 10.0), 1000.0, volatility=np.full(2, np.nan))) == [0, 0]
+    assert EqualRiskSizer().shares(10.0, 1000.0) == 95
+
+def test_make_sizer_configs():
+    assert isinstance(make_sizer(None), FixedFractionSizer)
+    assert make_sizer({"model": "atr", "window": 10}).window == 10
+    assert isinstance(make_sizer("erc"), EqualRiskSizer)
+    with pytest.raises(ValueError):
+        make_sizer("martingale")
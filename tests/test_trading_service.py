@@ -0,0 +1,58 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import pytz
+
+from bar_store import FakeStockDataClient
+from benchmark import synthetic_bars
+from journal import open_journal
+from mock_broker import MockTradingClient
+from trading_service import NY_TZ, TradingService
+
+class CalendarClient(MockTradingClient):
+    # 2024-07-03 closes early, 2024-07-04 is a holiday
+    SESSIONS = [(date(2024, 7, 3), "09:30", "13:00"), (date(2024, 7, 5), "09:30", "16:00"),
+                (date(2024, 7, 8), "09:30", "16:00")]
+
+    def get_calendar(self, request):
+        return [SimpleNamespace(date=day, open=datetime.fromisoformat(f"{day} {start}"),
+                                close=datetime.fromisoformat(f"{day} {end}"))
+                for day, start, end in self.SESSIONS if request.start <= day <= request.end]
+
+def service(tmp_path, trading_client=None, data_client=None, **kwargs):
+    return TradingService(trading_client or CalendarClient(), data_client, cache_dir=str(tmp_path / "bar_cache"),
+                          checkpoint_file=None, **kwargs)
+
+def eastern(text):
+    return NY_TZ.localize(datetime.fromisoformat(text))
+
+def test_next_trigger_follows_the_market_calendar(tmp_path):
+    trading = service(tmp_path)
+    assert trading.next_trigger(eastern("2024-07-03 08:00")) == eastern("2024-07-03 09:35")
+    # Started late: run right away, unless the (early) close has passed
+    assert trading.next_trigger(eastern("2024-07-03 11:00")) == eastern("2024-07-03 11:00")
+    assert trading.next_trigger(eastern("2024-07-03 13:30")) == eastern("2024-07-05 09:35")
+    trading.last_run_date = date(2024, 7, 3)
+    assert trading.next_trigger(eastern("2024-07-03 10:00")) == eastern("2024-07-05 09:35")
+
+def test_session_prewarms_then_orders_at_the_trigger(tmp_path, monkeypatch):
+    # log_performance writes the journal to the working directory
+    monkeypatch.chdir(tmp_path)
+    bars = synthetic_bars(300, start=(datetime.now(pytz.utc) - timedelta(days=300)).date().isoformat(), freq="D")
+    data_client = FakeStockDataClient({"AVGO": bars})
+    trading_client = MockTradingClient(prices={"AVGO": float(bars['close'].iloc[-1])})
+    fetched, ordered = [], []
+    get_stock_bars, get_account = data_client.get_stock_bars, trading_client.get_account
+    data_client.get_stock_bars = lambda request: fetched.append(datetime.now(NY_TZ)) or get_stock_bars(request)
+    trading_client.get_account = lambda: ordered.append(datetime.now(NY_TZ)) or get_account()
+
+    trading = service(tmp_path, trading_client, data_client, prewarm=timedelta(seconds=0.3))
+    trigger = datetime.now(NY_TZ) + timedelta(seconds=0.5)
+    asyncio.run(trading.run_session(trigger))
+
+    # Bars are fetched before the trigger; the account is read (and the order sent) right at it
+    assert fetched and fetched[-1] < trigger
+    assert trigger <= ordered[0] < trigger + timedelta(seconds=0.25)
+    with open_journal("performance_journal.db", create=False) as journal:
+        assert len(journal.snapshots()) == 1
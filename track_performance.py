@@ -1,54 +1,100 @@
+from journal import JOURNAL_FILE, LEGACY_LOG_FILE, open_journal
+from analytics import analyze, analyze_journal, infer_periods_per_year, print_report, write_report
+from utils import load_pyplot
 import pandas as pd
-import matplotlib.pyplot as plt
+import argparse
 import os
 
-def plot_performance():
-    log_file = "performance_log.csv"
+def load_performance_log(log_file=JOURNAL_FILE, start=None, end=None):
+    """
+    Account snapshots indexed by timestamp, from the performance journal or, for a
+    .csv path, from a legacy performance_log.csv. start/end limit the time range.
+    """
+    if log_file.endswith(".csv"):
+        df = pd.read_csv(log_file)
+        df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+        df.set_index('Timestamp', inplace=True)
+        return df.loc[start:end] if start is not None or end is not None else df
+    with open_journal(log_file, create=False) as journal:
+        return journal.snapshots(start, end)
+
+def save_performance_chart(df, output_img="live_performance.png"):
+    """
+    Equity curve with the position size on a second axis (the only stage that needs matplotlib).
+    """
+    plt = load_pyplot()
+    fig, ax1 = plt.subplots(figsize=(12, 6))
     
+    # Plot Equity Curve
+    color = 'tab:blue'
+    ax1.set_xlabel('Date')
+    ax1.set_ylabel('Equity ($)', color=color)
+    ax1.plot(df.index, df['Equity'], color=color, marker='o', label='Equity')
+    ax1.tick_params(axis='y', labelcolor=color)
+    ax1.grid(True)
+    
+    # Plot Position Size on secondary axis (optional, to see exposure)
+    ax2 = ax1.twinx()  
+    color = 'tab:orange'
+    ax2.set_ylabel('Position Qty', color=color)  
+    ax2.plot(df.index, df['Position_Qty'], color=color, linestyle='--', alpha=0.5, label='Holdings')
+    ax2.tick_params(axis='y', labelcolor=color)
+    
+    plt.title('Live Trading Performance Tracking')
+    fig.tight_layout()  
+    
+    plt.savefig(output_img)
+    print(f"Performance chart saved to {output_img}")
+
+def plot_performance(log_file=JOURNAL_FILE, start=None, end=None, plot=True):
+    """
+    Prints the performance summary and analytics report; plot=False skips the chart
+    (headless runs never import matplotlib).
+    """
     if not os.path.exists(log_file):
         print(f"No log file found at {log_file}. Run main.py first to generate data.")
+        if os.path.exists(LEGACY_LOG_FILE):
+            print(f"A legacy log exists: --log {LEGACY_LOG_FILE} reads it (main.py imports it into the journal).")
         return
 
     try:
-        df = pd.read_csv(log_file)
-        df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-        df.set_index('Timestamp', inplace=True)
+        df = load_performance_log(log_file, start, end)
+        if df.empty:
+            print("No performance records in the selected range.")
+            return
         
         # Calculate Returns
         initial_equity = df['Equity'].iloc[0]
         df['Return %'] = ((df['Equity'] - initial_equity) / initial_equity) * 100
         
-        # Plot
-        fig, ax1 = plt.subplots(figsize=(12, 6))
-        
-        # Plot Equity Curve
-        color = 'tab:blue'
-        ax1.set_xlabel('Date')
-        ax1.set_ylabel('Equity ($)', color=color)
-        ax1.plot(df.index, df['Equity'], color=color, marker='o', label='Equity')
-        ax1.tick_params(axis='y', labelcolor=color)
-        ax1.grid(True)
-        
-        # Plot Position Size on secondary axis (optional, to see exposure)
-        ax2 = ax1.twinx()  
-        color = 'tab:orange'
-        ax2.set_ylabel('Position Qty', color=color)  
-        ax2.plot(df.index, df['Position_Qty'], color=color, linestyle='--', alpha=0.5, label='Holdings')
-        ax2.tick_params(axis='y', labelcolor=color)
-        
-        plt.title('Live Trading Performance Tracking')
-        fig.tight_layout()  
-        
-        output_img = "live_performance.png"
-        plt.savefig(output_img)
-        print(f"Performance chart saved to {output_img}")
+        if plot:
+            save_performance_chart(df)
         
         # Print Summary
         print("\n--- Performance Summary ---")
         print(df.tail(1)[['Equity', 'Return %', 'Position_Qty']])
 
+        # Full metrics; the journal also has fills for per-trade P&L
+        if log_file.endswith(".csv"):
+            report = analyze(df['Equity'].to_numpy(), df['Position_Qty'].fillna(0).to_numpy(),
+                             periods_per_year=infer_periods_per_year(df.index))
+        else:
+            with open_journal(log_file, create=False) as journal:
+                report = analyze_journal(journal, start, end)
+        print("\n--- Analytics ---")
+        print_report(report)
+        report_file = "live_performance_report.json"
+        write_report(report, report_file)
+        print(f"Report saved to {report_file}")
+
     except Exception as e:
         print(f"Error plotting performance: {e}")
 
 if __name__ == "__main__":
-    plot_performance()
+    parser = argparse.ArgumentParser(description="Plot live performance from the performance journal")
+    parser.add_argument("--log", default=JOURNAL_FILE, help="Journal database, or a legacy performance_log.csv")
+    parser.add_argument("--start", help="Only records at or after this time (UTC)")
+    parser.add_argument("--end", help="Only records at or before this time (UTC)")
+    parser.add_argument("--no-plot", action="store_true", help="Headless run: summary and JSON report only")
+    args = parser.parse_args()
+    plot_performance(args.log, args.start, args.end, plot=not args.no_plot)
@@ -0,0 +1,134 @@
+from alpaca.trading.requests import GetCalendarRequest
+from strategy import BollingerRSIStrategy
+from bar_store import BarStore
+from ensemble import EnsembleRunner
+from checkpoint import CHECKPOINT_FILE, StrategyCheckpoint
+from instrumentation import span, observe, flush
+from main import (create_clients, get_account_status, get_position_qty, get_held_symbols, compute_signal,
+                  execute_signal, log_performance, run_ensemble)
+from datetime import datetime, timedelta
+import asyncio
+import pytz
+import time
+
+NY_TZ = pytz.timezone('America/New_York')
+
+class TradingService:
+    """
+    Long-running trading loop. Clients, the bar cache and the strategy are created
+    once and stay warm; each session the service wakes up shortly before the
+    trigger (market open + offset) to fetch bars and compute the signal, then
+    sleeps until the trigger and only checks the account and sends the order.
+    """
+
+    def __init__(self, trading_client, data_client, symbol="AVGO", open_offset=timedelta(minutes=5),
+                 prewarm=timedelta(minutes=2), cache_dir="bar_cache", ensemble_config=None,
+                 checkpoint_file=CHECKPOINT_FILE):
+        self.trading_client = trading_client
+        self.symbol = symbol
+        self.open_offset = open_offset
+        self.prewarm = prewarm
+        self.strategy = BollingerRSIStrategy(symbol)
+        self.bar_store = BarStore(data_client, cache_dir=cache_dir)
+        # Strategy state survives restarts; None rebuilds it from history every session
+        self.checkpoint = StrategyCheckpoint(checkpoint_file) if checkpoint_file else None
+        # With an ensemble configuration the service trades the ensemble instead of self.strategy
+        self.ensemble = EnsembleRunner.from_config(ensemble_config, self.bar_store) if ensemble_config else None
+        self.last_run_date = None
+
+    @classmethod
+    def from_credentials(cls, creds_path, **kwargs):
+        trading_client, data_client = create_clients(creds_path)
+        if trading_client is None:
+            return None
+        return cls(trading_client, data_client, **kwargs)
+
+    def next_trigger(self, now=None):
+        """
+        Next session open + offset according to the market calendar (holidays and
+        early closes included), skipping a session that already ran.
+        """
+        now = now or datetime.now(NY_TZ)
+        sessions = self.trading_client.get_calendar(
+            GetCalendarRequest(start=now.date(), end=now.date() + timedelta(days=10)))
+        for session in sessions:
+            # Calendar times are naive Eastern time
+            trigger = NY_TZ.localize(session.open) + self.open_offset
+            close = NY_TZ.localize(session.close)
+            if session.date == self.last_run_date or now >= close:
+                continue
+            # Started late (e.g. service restart after 9:35): run right away
+            return max(trigger, now)
+        return None
+
+    async def _sleep_until(self, when):
+        """
+        Coarse sleep followed by a short precise one, so the wake-up lands within
+        a few milliseconds of the target even after long waits.
+        """
+        while True:
+            remaining = (when - datetime.now(NY_TZ)).total_seconds()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining - 1 if remaining > 2 else remaining)
+
+    @staticmethod
+    def _report_latency(started):
+        latency = time.perf_counter() - started
+        print(f"Trigger to order latency: {latency * 1000:.0f} ms")
+        observe("session.trigger_to_order", latency)
+
+    async def run_session(self, trigger):
+        # Pre-warm: the bars used at the trigger end 16 minutes earlier, so they can be fetched ahead of time
+        await self._sleep_until(trigger - self.prewarm)
+        end_time = trigger.astimezone(pytz.utc).replace(tzinfo=None) - timedelta(minutes=16)
+        with span("session.prewarm"):
+            if self.ensemble is not None:
+                held = await asyncio.to_thread(get_held_symbols, self.trading_client) if self.ensemble.screener else ()
+                decisions = await asyncio.to_thread(self.ensemble.evaluate, end_time, held)
+            else:
+                held_qty = await asyncio.to_thread(get_position_qty, self.trading_client, self.symbol)
+                decision = await asyncio.to_thread(compute_signal, self.bar_store, self.strategy, end_time,
+                                                   checkpoint=self.checkpoint, held_qty=held_qty)
+
+        await self._sleep_until(trigger)
+        started = time.perf_counter()
+        print(f"\n--- Starting Trading Bot Execution: {datetime.now(NY_TZ)} ---")
+        account = await asyncio.to_thread(get_account_status, self.trading_client)
+        if account is None:
+            return
+        if self.ensemble is not None:
+            targets = await asyncio.to_thread(run_ensemble, self.trading_client, account, self.ensemble, decisions)
+            self._report_latency(started)
+            await asyncio.to_thread(log_performance, account.portfolio_value, account.cash,
+                                    account.buying_power, sum(targets.values()), "ENSEMBLE", targets)
+            return
+        if decision is None:
+            return
+        current_qty = await asyncio.to_thread(execute_signal, self.trading_client, account, self.strategy, decision)
+        self._report_latency(started)
+        await asyncio.to_thread(log_performance, account.portfolio_value, account.cash,
+                                account.buying_power, current_qty, self.symbol)
+
+    async def run(self):
+        print("Trading service started. Press Ctrl+C to stop.")
+        while True:
+            try:
+                trigger = await asyncio.to_thread(self.next_trigger)
+            except Exception as e:
+                print(f"Error reading market calendar: {e}")
+                await asyncio.sleep(60)
+                continue
+            if trigger is None:
+                await asyncio.sleep(3600)
+                continue
+
+            print(f"Next execution scheduled at {trigger}")
+            try:
+                await self.run_session(trigger)
+            except Exception as e:
+                print(f"Session failed: {e}")
+            self.last_run_date = trigger.date()
+            # Per-stage latencies of this session go to the metrics file (if one is configured)
+            flush()
+            print("Execution complete. Waiting for next session...")
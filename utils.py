@@ -37,3 +37,13 @@ def load_alpaca_credentials(filepath):
                     credentials["secret_key"] = value
                     
     return credentials
+
+def load_pyplot():
+    """
+    Imports matplotlib.pyplot on demand, with the non-interactive Agg backend
+    (charts are only ever saved to files, and servers have no display).
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
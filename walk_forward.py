@@ -0,0 +1,157 @@
+from alpaca.data.historical import StockHistoricalDataClient
+from alpaca.data.timeframe import TimeFrame
+from alpaca.data.enums import DataFeed
+from utils import load_alpaca_credentials
+from bar_store import BarStore
+from backtest import simulate
+from optimizer import STRATEGIES, DEFAULT_GRIDS, grid_configs, evaluate_configs, performance_stats
+from indicators import IndicatorCache
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import argparse
+import os
+from datetime import datetime, timedelta
+
+def walk_forward_windows(n_bars, train_bars, test_bars, step_bars=None):
+    """
+    Rolling (train_start, train_end, test_end) bar offsets; test runs [train_end, test_end).
+    By default windows advance by test_bars so the test periods tile the history.
+    """
+    step = step_bars or test_bars
+    windows = []
+    start = 0
+    while start + train_bars + test_bars <= n_bars:
+        windows.append((start, start + train_bars, start + train_bars + test_bars))
+        start += step
+    return windows
+
+def _run_windows(job):
+    """
+    Worker: reoptimizes on each train window and evaluates the winner on the
+    following test window. Indicators are computed once on the full history and
+    sliced for every window (one IndicatorCache per job), so overlapping windows
+    never recompute them and each window starts with warmed-up indicators.
+    """
+    df, windows, configs, strategy_name, symbol, initial_capital, rank_by = job
+    cache = IndicatorCache()
+    close = df['close'].to_numpy()
+
+    results = []
+    for train_start, train_end, test_end in windows:
+        train = df.iloc[train_start:train_end]
+        test = df.iloc[train_end:test_end]
+        ranked = sorted(evaluate_configs(train, configs, strategy_name, symbol, initial_capital, cache, history=df),
+                        key=lambda row: row[rank_by], reverse=True)
+        best = {k: ranked[0][k] for k in configs[0]}
+
+        # Signals run over the history up to the test end so the position state is
+        # already established when the test window opens, as it would be live
+        strategy = STRATEGIES[strategy_name](symbol, **best)
+        indicators = {k: v[:test_end] for k, v in strategy.compute_indicators(close, cache).items()}
+        signals = strategy.generate_signals(df.iloc[:test_end], indicators=indicators).iloc[train_end:]
+        equity = simulate(test, signals, strategy, initial_capital)
+        results.append({
+            "train_start": train.index[0],
+            "test_start": test.index[0],
+            "test_end": test.index[-1],
+            "params": best,
+            "in_sample": ranked[0],
+            "out_of_sample": performance_stats(equity, initial_capital),
+            "equity": equity,
+        })
+    return results
+
+def walk_forward(df, train_bars=252, test_bars=63, step_bars=None, configs=None, strategy_name="bbrsi",
+                 symbol=None, initial_capital=1000000.0, max_workers=None, rank_by="sharpe"):
+    """
+    Walk-forward evaluation over df. Windows are split across a process pool.
+    Returns (per-window summary DataFrame, stitched out-of-sample equity Series).
+    """
+    configs = configs or grid_configs(DEFAULT_GRIDS[strategy_name])
+    windows = walk_forward_windows(len(df), train_bars, test_bars, step_bars)
+    if not windows:
+        raise ValueError(f"Need at least {train_bars + test_bars} bars, got {len(df)}")
+
+    # Contiguous chunks keep overlapping windows in the same worker's cache
+    workers = min(max_workers or os.cpu_count() or 1, len(windows))
+    size = -(-len(windows) // workers)
+    jobs = [(df, windows[i:i + size], configs, strategy_name, symbol, initial_capital, rank_by)
+            for i in range(0, len(windows), size)]
+
+    results = []
+    if len(jobs) == 1:
+        results = _run_windows(jobs[0])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in pool.map(_run_windows, jobs):
+                results.extend(chunk)
+
+    # Chain the test windows: each one starts from the previous window's ending value
+    pieces = []
+    capital = initial_capital
+    for result in results:
+        scaled = result["equity"] / initial_capital * capital
+        # Overlapping test windows (step < test) only contribute their new bars
+        if pieces:
+            scaled = scaled[scaled.index > pieces[-1].index[-1]]
+        if len(scaled):
+            pieces.append(scaled)
+            capital = scaled.iloc[-1]
+    stitched = pd.concat(pieces)
+
+    summary = pd.DataFrame([{
+        "train_start": r["train_start"],
+        "test_start": r["test_start"],
+        "test_end": r["test_end"],
+        **r["params"],
+        "is_sharpe": r["in_sample"]["sharpe"],
+        "oos_return": r["out_of_sample"]["total_return"],
+        "oos_sharpe": r["out_of_sample"]["sharpe"],
+        "oos_max_drawdown": r["out_of_sample"]["max_drawdown"],
+    } for r in results])
+    return summary, stitched
+
+def run_walk_forward(symbol="AVGO", strategy_name="bbrsi", days=365 * 4, train_bars=252, test_bars=63,
+                     offline=False, max_workers=None, output_csv="walk_forward_results.csv"):
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    data_client = None
+    if not offline:
+        creds = load_alpaca_credentials(os.path.join(current_dir, "paper_account_api_key.txt"))
+        data_client = StockHistoricalDataClient(creds["api_key"], creds["secret_key"])
+    bar_store = BarStore(data_client, cache_dir=os.path.join(current_dir, "bar_cache"), offline=offline)
+
+    end_time = datetime.now() - timedelta(minutes=16)
+    start_time = end_time - timedelta(days=days)
+    df = bar_store.get_bars(symbol, start_time, end_time, timeframe=TimeFrame.Day, feed=DataFeed.IEX)
+    if df.empty:
+        print("No data found for the specified period.")
+        return None
+
+    print(f"Walk-forward on {len(df)} bars for {symbol} (train {train_bars}, test {test_bars})...")
+    summary, stitched = walk_forward(df, train_bars, test_bars, strategy_name=strategy_name,
+                                     symbol=symbol, max_workers=max_workers)
+    summary.to_csv(output_csv, index=False)
+
+    initial_capital = 1000000.0
+    stats = performance_stats(stitched, initial_capital)
+    print("\n--- Walk-Forward Results (out-of-sample) ---")
+    print(summary.to_string(index=False))
+    print(f"\nStitched OOS Return: {stats['total_return']*100:.2f}%")
+    print(f"Stitched OOS Sharpe: {stats['sharpe']:.2f}")
+    print(f"Stitched OOS Max Drawdown: {stats['max_drawdown']*100:.2f}%")
+    print(f"\nWindow details saved to {output_csv}")
+    return summary, stitched
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward (rolling out-of-sample) evaluation")
+    parser.add_argument("--symbol", default="AVGO")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="bbrsi")
+    parser.add_argument("--days", type=int, default=365 * 4, help="Calendar days of history to use")
+    parser.add_argument("--train-bars", type=int, default=252)
+    parser.add_argument("--test-bars", type=int, default=63)
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument("--offline", action="store_true", help="Use only cached bars, no network access")
+    parser.add_argument("--output", default="walk_forward_results.csv")
+    args = parser.parse_args()
+    run_walk_forward(args.symbol, args.strategy, args.days, args.train_bars, args.test_bars,
+                     args.offline, args.workers, args.output)